@@ -0,0 +1,180 @@
+"""
+Offline, CPU-only text analytics of stored comments: language, sentiment score, toxicity and spam flags.
+
+The model is deliberately lightweight: character-class counts for the language and regular-expression
+lexicons (Russian and English stems, emoji) for the rest, evaluated with vectorized pandas string operations
+over whole chunks. Chunks are analysed in a process pool while the next batch is read from Postgres, and
+results are bulk-upserted into comment_analysis together with the stage's watermark, so a restarted run
+continues where the last one committed.
+
+    python -m app.analysis_module.comment_analysis [--follow] [--rebuild]
+"""
+import argparse
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import exists, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL_VERSION = 'lexicon-1'
+WATERMARK_NAME = 'comment_analysis'
+
+COMMENT_ANALYSIS_BATCH = int(os.getenv("COMMENT_ANALYSIS_BATCH", 20000))
+COMMENT_ANALYSIS_WORKERS = int(os.getenv("COMMENT_ANALYSIS_WORKERS", os.cpu_count() or 1))
+COMMENT_ANALYSIS_POLL_INTERVAL = float(os.getenv("COMMENT_ANALYSIS_POLL_INTERVAL", 60))
+# Ids are drawn when a row is inserted, not when it commits: a long ingestion transaction can commit rows below
+# the watermark. Every run re-scans this many ids under it and skips what is already analysed.
+COMMENT_ANALYSIS_LOOKBACK = int(os.getenv("COMMENT_ANALYSIS_LOOKBACK", 100000))
+
+_URL = r'https?://|www\.|t\.me/|\b[\w.-]+\.(?:com|ru|net|org|io|me|gg|su)\b'
+_SPAM = (r'подпиш|переходи|заработ|промокод|скидк|телеграм|whatsapp|ватсап|'
+         r'subscribe|check out my|free money|giveaway|promo code|discount')
+_TOXIC = (r'\b(?:ху[йеёя]|пизд|еб[ауоил]|ёб|бля|сук[аи]|мраз|твар[ьи]|урод|дебил|идиот|дур[аео]к|туп[аоы]|чмо|'
+          r'fuck|shit|bitch|idiot|moron|stupid|retard|dumb|loser|asshole)')
+_POSITIVE = (r'\b(?:спасиб|класс|круто|крут[аоы]|отличн|супер|хорош|прекрасн|люблю|нрав|лучш|молод|шикарн|'
+             r'thank|great|awesome|amazing|love|best|good|nice|excellent|perfect|cool)|[❤😍👍🔥😊🥰👏]')
+_NEGATIVE = (r'\b(?:плох|ужас|отстой|скучн|ненави|худш|разочар|бред|фигн|позор|'
+             r'bad|awful|terrible|boring|hate|worst|disappoint|trash|sucks|horrible)|[👎😡🤮💩😠]')
+
+
+def analyse_texts(texts: list[str | None]) -> list[tuple[str, float, bool, bool]]:
+    """
+    Scores a chunk of comment texts at once.
+
+    Returns:
+        (language, sentiment, toxic, spam) per text, in order.
+    """
+    series = pd.Series(texts, dtype='object').fillna('').str.lower()
+    cyrillic = series.str.count(r'[а-яё]').to_numpy()
+    ukrainian = series.str.count(r'[іїєґ]').to_numpy()
+    latin = series.str.count(r'[a-z]').to_numpy()
+    positive = series.str.count(_POSITIVE).to_numpy()
+    negative = series.str.count(_NEGATIVE).to_numpy()
+    toxic = series.str.contains(_TOXIC).to_numpy()
+    spam = (series.str.contains(_URL) | series.str.contains(_SPAM)).to_numpy()
+
+    language = np.select(
+        [cyrillic + latin + ukrainian == 0, ukrainian > 0, cyrillic >= latin, latin > 0],
+        ['und', 'uk', 'ru', 'en'], default='other')
+    # Latin text without English function words is most likely another language
+    english = series.str.contains(r'\b(?:the|and|is|are|you|this|that|it|of|to|in|for|what|not)\b').to_numpy()
+    language = np.where((language == 'en') & ~english & (latin > 20), 'other', language)
+    votes = positive + negative
+    sentiment = np.divide(positive - negative, votes, out=np.zeros(len(series)), where=votes > 0)
+    return list(zip(language.tolist(), sentiment.tolist(), toxic.tolist(), spam.tolist()))
+
+
+def get_watermark(session=None) -> int:
+    with db_sessions.session_scope(session) as session:
+        return session.query(db_architecture.PipelineWatermark.lastId).filter(
+            db_architecture.PipelineWatermark.name == WATERMARK_NAME).scalar() or 0
+
+
+def _read_batch(after_id: int, batch_size: int) -> list:
+    comment = db_architecture.Comment
+    analysis = db_architecture.CommentAnalysis
+    with db_sessions.session_scope() as session:
+        return session.execute(
+            select(comment.id, comment.commentId, comment.videoId, comment.textOriginal).where(
+                comment.id > after_id, ~exists().where(analysis.commentId == comment.commentId)).order_by(
+                comment.id).limit(batch_size)).all()
+
+
+def _save_results(batch: list, results: list, last_id: int):
+    rows = [{'commentId': row.commentId, 'videoId': row.videoId, 'language': language, 'sentiment': sentiment,
+             'toxic': toxic, 'spam': spam, 'modelVersion': ANALYSIS_MODEL_VERSION}
+            for row, (language, sentiment, toxic, spam) in zip(batch, results)]
+    statement = insert(db_architecture.CommentAnalysis)
+    watermark = insert(db_architecture.PipelineWatermark).values(name=WATERMARK_NAME, lastId=last_id)
+    with db_sessions.session_scope() as session:
+        session.execute(statement.on_conflict_do_update(index_elements=['commentId'], set_={
+            column: statement.excluded[column] for column in ('language', 'sentiment', 'toxic', 'spam',
+                                                              'modelVersion')} | {'analyzedAt': func.now()}), rows)
+        session.execute(watermark.on_conflict_do_update(index_elements=['name'], set_={
+            'lastId': func.greatest(db_architecture.PipelineWatermark.lastId, watermark.excluded.lastId),
+            'updatedAt': func.now()}))
+
+
+def _submit(pool: ProcessPoolExecutor, batch: list, workers: int) -> list:
+    texts = [row.textOriginal for row in batch]
+    return [pool.submit(analyse_texts, chunk.tolist()) for chunk in np.array_split(np.array(texts, dtype=object),
+                                                                                   min(workers, len(texts)))]
+
+
+def analyse_new_comments(batch_size: int = COMMENT_ANALYSIS_BATCH, workers: int = COMMENT_ANALYSIS_WORKERS,
+                         pool: ProcessPoolExecutor | None = None) -> int:
+    """
+    Analyses every comment above the watermark (minus the lookback) that has no analysis yet.
+
+    The pool scores batch N while batch N + 1 is read and batch N - 1 is written.
+
+    Returns:
+        Number of analysed comments.
+    """
+    own_pool = pool is None
+    pool = pool or ProcessPoolExecutor(max_workers=workers)
+    after_id = max(get_watermark() - COMMENT_ANALYSIS_LOOKBACK, 0)
+    analysed = 0
+    pending = None
+    try:
+        while True:
+            batch = _read_batch(after_id, batch_size)
+            submitted = (batch, _submit(pool, batch, workers)) if batch else None
+            if pending is not None:
+                pending_batch, futures = pending
+                results = [result for future in futures for result in future.result()]
+                _save_results(pending_batch, results, pending_batch[-1].id)
+                analysed += len(pending_batch)
+            if submitted is None:
+                break
+            pending = submitted
+            after_id = batch[-1].id
+    finally:
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+    if analysed:
+        logger.info('Analysed {count} comments'.format(count=analysed))
+    return analysed
+
+
+def rebuild():
+    """Forgets every result, e.g. after changing the lexicons; the next run analyses all comments again."""
+    with db_sessions.session_scope() as session:
+        session.execute(text('TRUNCATE comment_analysis'))
+        session.query(db_architecture.PipelineWatermark).filter(
+            db_architecture.PipelineWatermark.name == WATERMARK_NAME).delete()
+
+
+def run_comment_analysis(stop_event: threading.Event | None = None, workers: int = COMMENT_ANALYSIS_WORKERS):
+    stop_event = stop_event or threading.Event()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while not stop_event.is_set():
+            try:
+                analyse_new_comments(workers=workers, pool=pool)
+            except Exception:
+                logger.exception('Comment analysis failed')
+            stop_event.wait(COMMENT_ANALYSIS_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--follow', action='store_true', help='keep analysing newly ingested comments')
+    parser.add_argument('--rebuild', action='store_true', help='drop all results and analyse everything again')
+    parser.add_argument('--workers', type=int, default=COMMENT_ANALYSIS_WORKERS)
+    args = parser.parse_args()
+    if args.rebuild:
+        rebuild()
+    if args.follow:
+        run_comment_analysis(workers=args.workers)
+    else:
+        analyse_new_comments(workers=args.workers)
@@ -0,0 +1,175 @@
+import logging
+import os
+import socket
+import threading
+
+from ..handlers import request_handlers
+from ..models_module import ingest_events
+from ..models_module import job_queue
+from ..models_module import tag_analytics
+from ..monitoring_module import metrics
+from ..monitoring_module import tracing
+from ..parsing_module import get_info
+from ..parsing_module import quota_scheduler
+from ..parsing_module import transcripts
+
+logger = logging.getLogger(__name__)
+
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", 5))
+# Fetch the transcript of every crawled video; transcripts.py can also backfill them separately
+CRAWL_TRANSCRIPTS = os.getenv("CRAWL_TRANSCRIPTS", "true").lower() in ("1", "true", "yes")
+# Tag aggregates are refreshed once a worker has stored this many videos, and whenever the queue runs dry
+TAG_REFRESH_VIDEOS = int(os.getenv("TAG_REFRESH_VIDEOS", 100))
+# Longest pause after a job found no API key with quota left, before the worker claims the next one
+WORKER_QUOTA_BACKOFF = float(os.getenv("WORKER_QUOTA_BACKOFF", 600))
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+class JobHeartbeat:
+    """
+    Refreshes a claimed job's lease from a background thread while the job runs, so slow stages (quota waits,
+    channel enumeration, transcript fetches) never outlive JOB_LEASE_SECONDS and let another worker reclaim it.
+
+    Runners call ``check()`` between stages; it raises JobLostError once a heartbeat found the job taken over.
+    """
+
+    def __init__(self, job_id: int, worker_id: str, interval: float = job_queue.JOB_HEARTBEAT_SECONDS):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self._lost = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                job_queue.heartbeat_job(self.job_id, self.worker_id)
+            except job_queue.JobLostError as error:
+                self._lost = error
+                return
+            except Exception:
+                # A database hiccup; the lease has slack for the next attempt
+                logger.exception('Heartbeat for crawl job {job_id} failed'.format(job_id=self.job_id))
+
+    def check(self):
+        if self._lost is not None:
+            raise self._lost
+
+
+def run_channel_job(job, worker_id: str, usage: quota_scheduler.QuotaUsage, heartbeat: JobHeartbeat):
+    channel_id = request_handlers.get_existing_channel_id(job.target)
+    get_info.get_channel_info(channel_id)
+    for video_id in request_handlers.iter_channel_video_ids(channel_id, job.videoCount or 0, job.newVideosOnly):
+        heartbeat.check()
+        job_queue.enqueue_job('video', video_id, parent_id=job.id, priority=job.priority,
+                              incremental=job.incremental)
+    job_queue.complete_job(job.id, worker_id, quota_spent=usage.take_unreported())
+    return 0
+
+
+def run_video_job(job, worker_id: str, usage: quota_scheduler.QuotaUsage, heartbeat: JobHeartbeat) -> int:
+    """Returns the number of videos stored, 0 or 1."""
+    stored = 0
+    # A resumed job has already stored the video row before its first checkpoint
+    if job.pageToken is None:
+        stored = len(get_info.get_videos_details([job.target]))
+        heartbeat.check()
+        if CRAWL_TRANSCRIPTS:
+            # No-op when the video was not stored or its transcript was already fetched
+            transcripts.ingest_transcripts([job.target])
+
+    heartbeat.check()
+
+    def checkpoint(next_page_token: str | None, inserted: int):
+        job_queue.checkpoint_job(job.id, worker_id, next_page_token, inserted, usage.take_unreported())
+
+    get_info.fetch_comments(job.target, job.incremental, page_token=job.pageToken, on_page=checkpoint)
+    job_queue.complete_job(job.id, worker_id, videos_done=1, quota_spent=usage.take_unreported())
+    return stored
+
+
+JOB_RUNNERS = {
+    'channel': run_channel_job,
+    'video': run_video_job,
+}
+
+
+@tracing.span('crawl_job')
+def run_job(job, worker_id: str) -> int:
+    """Runs a claimed job; returns the number of videos it stored."""
+    with quota_scheduler.priority(job.priority), quota_scheduler.track_usage() as usage, \
+            JobHeartbeat(job.id, worker_id) as heartbeat:
+        stored = JOB_RUNNERS[job.kind](job, worker_id, usage, heartbeat)
+    ingest_events.notify(job.kind)
+    return stored
+
+
+def refresh_tag_analytics():
+    try:
+        tag_analytics.refresh()
+    except Exception:
+        # The next refresh picks the videos up, nothing is lost
+        logger.exception('Tag analytics refresh failed')
+
+
+def run_worker(worker_id: str | None = None, stop_event: threading.Event | None = None):
+    """
+    Claims and runs crawl jobs until ``stop_event`` is set. Any number of these loops can run in parallel
+    across threads, processes or hosts; SKIP LOCKED gives every job exactly one owner.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    logger.info('Crawl worker {worker_id} started'.format(worker_id=worker_id))
+    # Videos stored since this worker last refreshed the tag aggregates
+    unrefreshed = 0
+    while not stop_event.is_set():
+        job = job_queue.claim_job(worker_id)
+        if job is None:
+            if unrefreshed:
+                refresh_tag_analytics()
+                unrefreshed = 0
+            stop_event.wait(WORKER_POLL_INTERVAL)
+            continue
+        job_id = job.id
+        logger.info('Worker {worker_id} claimed {job}'.format(worker_id=worker_id, job=job))
+        try:
+            unrefreshed += run_job(job, worker_id)
+            if unrefreshed >= TAG_REFRESH_VIDEOS:
+                refresh_tag_analytics()
+                unrefreshed = 0
+        except job_queue.JobLostError as error:
+            logger.warning(str(error))
+        except quota_scheduler.QuotaWaitTimeout as error:
+            # Every key is spent: retrying now would only burn the job's attempts
+            logger.warning('Crawl job {job_id} postponed: {error}'.format(job_id=job_id, error=error))
+            try:
+                job_queue.release_job(job_id, worker_id, repr(error))
+            except job_queue.JobLostError as lost:
+                logger.warning(str(lost))
+            stop_event.wait(min(error.wait or WORKER_POLL_INTERVAL, WORKER_QUOTA_BACKOFF))
+        except Exception as error:
+            # The video may have been stored before the failure
+            unrefreshed += job.kind == 'video'
+            logger.exception('Crawl job {job_id} failed'.format(job_id=job_id))
+            try:
+                job_queue.fail_job(job_id, worker_id, repr(error))
+            except job_queue.JobLostError as lost:
+                logger.warning(str(lost))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    metrics.serve()
+    run_worker()
@@ -2,32 +2,65 @@ import os
 import re
 
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-import requests
+from ..models_module import copy_loader
+from ..models_module import ingest_events
+from ..models_module import tag_analytics
+from ..models_module import work_with_models
 from ..parsing_module import get_info
+from ..parsing_module import quota_scheduler
+from ..parsing_module import transcripts
+from ..parsing_module import youtube_client
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
-YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/'
-youtube = build('youtube', 'v3', developerKey=API_KEY)
 
-
-def get_latest_videos(channel_id, max_results):
-    request = youtube.search().list(part='id', channelId=channel_id, order='date', maxResults=max_results)
-    response = request.execute()
-    if max_results == 0 or response['pageInfo']['totalResults'] < max_results:
-        max_results = response['pageInfo']['totalResults']
-    video_ids = [item['id']['videoId'] for item in response['items'] if item['id']['kind'] == 'youtube#video']
-    next_page_token = response.get('nextPageToken', None)
-
-    while len(video_ids) < max_results and next_page_token:
-        request = youtube.search().list(part='id', channelId=channel_id, order='date', maxResults=max_results,
-                                        pageToken=next_page_token)
-        response = request.execute()
-        video_ids += [item['id']['videoId'] for item in response['items'] if item['id']['kind'] == 'youtube#video']
-        next_page_token = response.get('nextPageToken', None)
-    return video_ids
+PLAYLIST_ITEMS_PER_PAGE = 50
+
+
+def get_uploads_playlist_id(channel_id: str) -> str:
+    playlist_id = work_with_models.get_uploads_playlist_id(channel_id)
+    if playlist_id:
+        return playlist_id
+    # The uploads playlist id is the channel id with the "UC" prefix replaced by "UU"
+    return 'UU' + channel_id[2:]
+
+
+def iter_channel_video_ids(channel_id: str, max_results: int = 0, stop_at_known: bool = False):
+    """
+    Yields the channel's video ids newest first by paging its uploads playlist (1 quota unit per 50 ids).
+
+    Args:
+        channel_id: YouTube channel id.
+        max_results: stop after this many ids; 0 enumerates the whole channel.
+        stop_at_known: stop at the first video that is already stored, for incremental crawls.
+    """
+    playlist_id = get_uploads_playlist_id(channel_id)
+    yielded = 0
+    page_token = None
+    while True:
+        try:
+            response = youtube_client.call('playlistItems.list', part='contentDetails', playlistId=playlist_id,
+                                           maxResults=PLAYLIST_ITEMS_PER_PAGE, pageToken=page_token)
+        except youtube_client.YouTubeApiError as error:
+            print(f"Ошибка запроса: {error.status}")
+            return
+        video_ids = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+        known = work_with_models.filter_existing_video_ids(video_ids) if stop_at_known else set()
+        for video_id in video_ids:
+            if video_id in known:
+                return
+            yield video_id
+            yielded += 1
+            if max_results and yielded >= max_results:
+                return
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+
+
+def get_latest_videos(channel_id, max_results, stop_at_known: bool = False):
+    return list(iter_channel_video_ids(channel_id, max_results, stop_at_known))
 
 
 def get_channel_handle_by_url(channel_url: str) -> str | None:
@@ -43,11 +76,10 @@ def get_channel_handle_by_url(channel_url: str) -> str | None:
 
 
 def get_channel_id(channel_handle: str):
-    api_url = 'https://www.googleapis.com/youtube/v3/channels'
+    api_url = f'{youtube_client.YOUTUBE_API_URL}channels'
     params = {'part': 'contentDetails',
-              'forHandle': '@' + channel_handle,
-              'key': API_KEY}
-    response = requests.get(api_url, params=params)
+              'forHandle': '@' + channel_handle}
+    response = quota_scheduler.get('channels.list', api_url, params)
 
     if response.status_code == 200:
         data = response.json()
@@ -61,20 +93,64 @@ def get_channel_id(channel_handle: str):
         return None
 
 
-def get_info_from_last_videos_in_channel(channel_url: str, video_count: int):
+def get_existing_channel_id(channel_url: str) -> str:
     channel_handle = get_channel_handle_by_url(channel_url)
-    channel_id = get_channel_id(channel_handle)
+    channel_id = get_channel_id(channel_handle) if channel_handle else None
+    if channel_id is None:
+        raise ValueError(f'Channel not found for {channel_url}')
+    return channel_id
+
+
+def get_info_from_last_videos_in_channel(channel_url: str, video_count: int, new_videos_only: bool = False,
+                                         incremental: bool = False) -> list[str]:
+    """Crawls the channel in this thread; /channel/ enqueues a job for the crawl workers instead."""
+    channel_id = get_existing_channel_id(channel_url)
     get_info.get_channel_info(channel_id)
 
-    video_ids = get_latest_videos(channel_id, video_count)
+    video_ids = get_latest_videos(channel_id, video_count, new_videos_only)
     print(*video_ids)
     print(len(video_ids))
 
-    for video_id in video_ids:
-        get_info.get_video_details(video_id)
-        get_info.fetch_comments(video_id)
-
-
-def get_video_info(video_id):
-    get_info.get_video_details(video_id)
-    get_info.fetch_comments(video_id)
+    saved = get_info.get_videos_details(video_ids)
+    for video_id in saved:
+        get_info.fetch_comments(video_id, incremental)
+    tag_analytics.refresh()
+    ingest_events.notify('channel')
+    return saved
+
+
+def get_video_info(video_id, incremental: bool = False, priority: int = quota_scheduler.PRIORITY_INTERACTIVE):
+    with quota_scheduler.priority(priority):
+        if get_info.get_videos_details([video_id]):
+            tag_analytics.refresh()
+        get_info.fetch_comments(video_id, incremental)
+    ingest_events.notify('video')
+
+
+def backfill_channel(channel_url: str, video_count: int = 0, with_subtitles: bool = True):
+    channel_id = get_existing_channel_id(channel_url)
+
+    transcript_states = []
+    stats_snapshots = []
+    with copy_loader.CopyLoader() as loader:
+        loader.add_channel(get_info.fetch_channel_details(channel_id), channel_id)
+        video_ids = get_latest_videos(channel_id, video_count)
+        loaded_video_ids = []
+        for video_id, video_info in get_info.fetch_videos_details(video_ids).items():
+            if video_info is None:
+                continue
+            loader.add_video(video_info, video_info['snippet']['channelId'], video_id)
+            stats_snapshots.append(work_with_models.map_video_stats(video_info, video_id))
+            loaded_video_ids.append(video_id)
+            for response in get_info.iter_comment_pages(video_id):
+                loader.add_comments(get_info.map_comment_page(response) + get_info.expand_replies(response, video_id))
+        if with_subtitles:
+            for state, segments in transcripts.fetch_transcripts(loaded_video_ids):
+                loader.add_subtitles(state['videoId'], segments)
+                transcript_states.append(state)
+    work_with_models.save_transcript_states(transcript_states)
+    # The COPY merge skips known videos, their statistics are still recorded; every video row exists by now
+    work_with_models.save_video_stats(stats_snapshots)
+    tag_analytics.refresh()
+    ingest_events.notify('channel')
+    return loader.copied, loader.merged
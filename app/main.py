@@ -1,15 +1,127 @@
-from fastapi import FastAPI
-from .handlers.request_handlers import get_info_from_last_videos_in_channel
-from .handlers.request_handlers import get_video_info
+import os
+import threading
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from .handlers import crawl_worker
+from .models_module import existence_cache
+from .models_module import job_queue
+from .models_module import search
+from .models_module import work_with_models
+from .monitoring_module import metrics
+from .parsing_module import dislike_enrichment
+from .parsing_module import quota_scheduler
+from .parsing_module import response_cache
+from .parsing_module import stats_refresher
+
+# Crawl workers started inside the API process; set to 0 when workers run as separate processes
+API_CRAWL_WORKERS = int(os.getenv("API_CRAWL_WORKERS", 2))
+# Statistics refresher thread inside the API process; disable when it runs as a separate process
+API_STATS_REFRESHER = os.getenv("API_STATS_REFRESHER", "true").lower() in ("1", "true", "yes")
+# Dislike count backfill inside the API process; disable when it runs as a separate process
+API_DISLIKE_ENRICHMENT = os.getenv("API_DISLIKE_ENRICHMENT", "true").lower() in ("1", "true", "yes")
 
 app = FastAPI()
+stop_workers = threading.Event()
+metrics.register_queue_depth()
+
+
+@app.on_event("startup")
+def warm_existence_cache():
+    threading.Thread(target=existence_cache.warm_all, name='existence-cache-warm', daemon=True).start()
+
+
+@app.on_event("startup")
+def start_crawl_workers():
+    for number in range(API_CRAWL_WORKERS):
+        threading.Thread(target=crawl_worker.run_worker, kwargs={'stop_event': stop_workers},
+                         name=f'crawl-worker-{number}', daemon=True).start()
+
+
+@app.on_event("startup")
+def start_stats_refresher():
+    if API_STATS_REFRESHER:
+        threading.Thread(target=stats_refresher.run_stats_refresher, kwargs={'stop_event': stop_workers},
+                         name='stats-refresher', daemon=True).start()
+
+
+@app.on_event("startup")
+def start_dislike_enrichment():
+    if API_DISLIKE_ENRICHMENT:
+        threading.Thread(target=dislike_enrichment.run_dislike_enrichment, kwargs={'stop_event': stop_workers},
+                         name='dislike-enrichment', daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_crawl_workers():
+    stop_workers.set()
 
 
 @app.get("/channel/")
-async def root(youtube_channel_url: str, video_count: int = 0):
-    get_info_from_last_videos_in_channel(youtube_channel_url, video_count)
+def root(youtube_channel_url: str, video_count: int = 0, new_videos_only: bool = False, incremental: bool = False):
+    job_id = job_queue.enqueue_job('channel', youtube_channel_url, priority=quota_scheduler.PRIORITY_BACKGROUND,
+                                   video_count=video_count, new_videos_only=new_videos_only, incremental=incremental)
+    return {'job_id': job_id}
 
 
 @app.get("/video_id/")
-async def root(video_id: str):
-    get_video_info(video_id)
+def root(video_id: str, incremental: bool = False):
+    job_id = job_queue.enqueue_job('video', video_id, priority=quota_scheduler.PRIORITY_INTERACTIVE,
+                                   incremental=incremental)
+    return {'job_id': job_id}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: int):
+    progress = job_queue.get_job_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return progress
+
+
+@app.get("/videos/{video_id}/stats")
+def video_stats(video_id: str, window_hours: float = 24):
+    latest = work_with_models.get_latest_video_stats([video_id]).get(video_id)
+    if latest is None:
+        raise HTTPException(status_code=404, detail='No statistics for this video')
+    delta = work_with_models.get_video_stats_delta(datetime.utcnow() - timedelta(hours=window_hours),
+                                                   video_ids=[video_id])
+    return {'latest': latest, 'delta': delta[0] if delta else None}
+
+
+@app.get("/channels/{channel_id}/trending")
+def channel_trending(channel_id: str, window_hours: float = 24, limit: int = 20):
+    return work_with_models.get_video_stats_delta(datetime.utcnow() - timedelta(hours=window_hours),
+                                                  channel_id=channel_id, limit=limit)
+
+
+@app.get("/search/")
+def search_text(q: str, scope: str = 'comments', channel_id: str | None = None, video_id: str | None = None,
+                published_after: datetime | None = None, published_before: datetime | None = None,
+                order: str = 'relevance', limit: int = 20, cursor: str | None = None):
+    try:
+        return search.search(q, scope, channel_id, video_id, published_after, published_before, order, limit, cursor)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+@app.get("/cache/stats/")
+async def cache_stats():
+    return existence_cache.get_stats()
+
+
+@app.get("/quota/stats/")
+async def quota_stats():
+    return quota_scheduler.scheduler.get_stats()
+
+
+@app.get("/api-cache/stats/")
+async def api_cache_stats():
+    return response_cache.cache.get_stats()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Sync route: the crawl queue gauge queries Postgres, which must not block the event loop
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
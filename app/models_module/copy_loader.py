@@ -0,0 +1,203 @@
+import io
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+from ..models_module import existence_cache
+from ..models_module import work_with_models
+from ..monitoring_module import metrics
+
+logger = logging.getLogger(__name__)
+
+COPY_FLUSH_ROWS = 20000
+# Flushed batches waiting for the writer; bounds memory when Postgres is slower than parsing
+COPY_QUEUE_SIZE = 4
+
+# Parents first, so a batch never references rows that are still buffered
+TABLES = {
+    'channels': (db_architecture.Channel, 'channelId'),
+    'videos': (db_architecture.Video, 'videoId'),
+    'comments': (db_architecture.Comment, 'commentId'),
+    'subtitles': (db_architecture.Subtitle, None),
+}
+
+
+def _columns(table: str) -> list[str]:
+    model, _ = TABLES[table]
+    # Search vectors are filled in by triggers on the target table
+    return [column.name for column in model.__table__.columns
+            if column.name != 'id' and not isinstance(column.type, TSVECTOR)]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _array_literal(values: list) -> str:
+    items = []
+    for value in values:
+        if value is None:
+            items.append('NULL')
+        else:
+            items.append('"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(items) + '}'
+
+
+def encode_value(value) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (list, tuple)):
+        return _escape(_array_literal(value))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return _escape(str(value))
+
+
+def encode_row(row: dict, columns: list[str]) -> str:
+    return '\t'.join(encode_value(row.get(column)) for column in columns) + '\n'
+
+
+def _merge_sql(table: str, stage: str, columns: list[str]) -> str:
+    _, key = TABLES[table]
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    if key is None:
+        # Subtitles have no natural key: a video's transcript is loaded once and never merged row by row.
+        # add_subtitles keeps a transcript within one batch, so this never sees half of a video
+        return (f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} s '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t."videoId" = s."videoId")')
+    conflict = work_with_models.comment_conflict_columns() if table == 'comments' else (key,)
+    conflict_list = ', '.join(f'"{column}"' for column in conflict)
+    return (f'INSERT INTO {table} ({column_list}) SELECT DISTINCT ON ("{key}") {column_list} FROM {stage} '
+            f'ON CONFLICT ({conflict_list}) DO NOTHING')
+
+
+class CopyLoader:
+    """
+    Streams mapped rows into Postgres with COPY FROM STDIN into a temporary staging table followed by
+    INSERT ... SELECT ... ON CONFLICT into the target table.
+
+    Rows are encoded by the calling thread while a background writer thread runs COPY and the merge,
+    so parsing and writing overlap. Use as a context manager; leaving the block flushes everything.
+
+    Attributes:
+        flush_rows (int): Buffered rows per table that trigger a flush.
+        copied (dict): Rows sent through COPY per table.
+        merged (dict): Rows actually inserted into each target table.
+    """
+
+    def __init__(self, flush_rows: int = COPY_FLUSH_ROWS):
+        self.flush_rows = flush_rows
+        self.copied = {table: 0 for table in TABLES}
+        self.merged = {table: 0 for table in TABLES}
+        self._columns = {table: _columns(table) for table in TABLES}
+        self._buffers = {table: [] for table in TABLES}
+        self._queue = queue.Queue(maxsize=COPY_QUEUE_SIZE)
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, name='copy-loader', daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_channel(self, channel_info: dict, channel_id: str):
+        self._add('channels', work_with_models.map_channel(channel_info, channel_id))
+
+    def add_video(self, video_info: dict, channel_id: str, video_id: str):
+        self._add('videos', work_with_models.map_video(video_info, channel_id, video_id))
+
+    def add_comments(self, comments: list[tuple[dict, str]]):
+        for comment, comment_id in comments:
+            self._add('comments', work_with_models.map_comment(comment, comment_id))
+
+    def add_subtitles(self, video_id: str, transcript: list[dict]):
+        # Flushing only after the whole transcript is buffered keeps it in one batch, see _merge_sql
+        for segment in transcript:
+            self._append('subtitles', dict(videoId=video_id, text=segment.get('text'),
+                                           start=segment.get('start'), duration=segment.get('duration')))
+        self._flush_if_full('subtitles')
+
+    def flush(self, table: str | None = None):
+        for name in TABLES:
+            if self._buffers[name]:
+                self._queue.put((name, self._buffers[name]))
+                self._buffers[name] = []
+            if name == table:
+                break
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_writer_error()
+        logger.info('COPY loader finished: copied {copied}, merged {merged}'.format(
+            copied=self.copied, merged=self.merged))
+
+    def _add(self, table: str, row: dict):
+        self._append(table, row)
+        self._flush_if_full(table)
+
+    def _append(self, table: str, row: dict):
+        self._raise_writer_error()
+        _, key = TABLES[table]
+        self._buffers[table].append((encode_row(row, self._columns[table]), row[key] if key else None))
+
+    def _flush_if_full(self, table: str):
+        if len(self._buffers[table]) >= self.flush_rows:
+            self.flush(table)
+
+    def _raise_writer_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self):
+        connection = db_sessions.engine.raw_connection()
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    break
+                if self._error is not None:
+                    continue
+                try:
+                    self._write_batch(connection, *batch)
+                except Exception as error:
+                    connection.rollback()
+                    self._error = error
+        finally:
+            connection.close()
+
+    def _write_batch(self, connection, table: str, rows: list[tuple[str, str | None]]):
+        columns = self._columns[table]
+        stage = f'stage_{table}'
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        started = time.perf_counter()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f'CREATE TEMP TABLE {stage} ON COMMIT DROP AS '
+                           f'SELECT {column_list} FROM {table} WITH NO DATA')
+            cursor.copy_expert(f'COPY {stage} ({column_list}) FROM STDIN',
+                               io.StringIO(''.join(line for line, _ in rows)))
+            cursor.execute(_merge_sql(table, stage, columns))
+            merged = cursor.rowcount
+            connection.commit()
+        finally:
+            cursor.close()
+        metrics.db_write_latency.labels(f'copy_{table}').observe(time.perf_counter() - started)
+        metrics.db_write_batch_size.labels(f'copy_{table}').observe(len(rows))
+        if table == 'comments':
+            metrics.comments_ingested.inc(merged)
+        self.copied[table] += len(rows)
+        self.merged[table] += merged
+        if table in existence_cache.CACHES:
+            existence_cache.CACHES[table].add_many(key for _, key in rows)
@@ -0,0 +1,150 @@
+"""
+Aggregations behind the Dash dashboard.
+
+Every function returns at most DASHBOARD_MAX_POINTS rows however large the tables are: time series are
+bucketed in SQL into at most that many intervals, rankings are limited. Results are memoized for
+DASHBOARD_CACHE_TTL seconds and dropped early by `invalidate` when ingestion reports new data.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from cachetools import TTLCache, cached
+from sqlalchemy import Float, cast, func, literal
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+from ..models_module import tag_analytics
+
+DASHBOARD_MAX_POINTS = int(os.getenv("DASHBOARD_MAX_POINTS", 2000))
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 300))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", 512))
+
+# During a crawl every finished job reports new data; clears are coalesced to at most one per interval
+DASHBOARD_INVALIDATE_INTERVAL = float(os.getenv("DASHBOARD_INVALIDATE_INTERVAL", 30))
+
+_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+_cache_lock = threading.Lock()
+_last_clear = float('-inf')
+_clear_pending = False
+
+
+def _clear():
+    global _last_clear, _clear_pending
+    with _cache_lock:
+        _cache.clear()
+        _last_clear = time.monotonic()
+        _clear_pending = False
+
+
+def invalidate(kind: str | None = None):
+    """Drops every memoized aggregate, now or once the current interval ends; wired to ingest_events.listen."""
+    global _clear_pending
+    with _cache_lock:
+        if _clear_pending:
+            return
+        delay = _last_clear + DASHBOARD_INVALIDATE_INTERVAL - time.monotonic()
+        if delay > 0:
+            _clear_pending = True
+            timer = threading.Timer(delay, _clear)
+            timer.daemon = True
+            timer.start()
+            return
+    _clear()
+
+
+def memoized(func_):
+    return cached(_cache, key=lambda *args, **kwargs: (func_.__name__, args, tuple(sorted(kwargs.items()))),
+                  lock=_cache_lock)(func_)
+
+
+def _bucket(column, start: datetime, end: datetime, max_points: int):
+    """Floors ``column`` to buckets sized so that [start, end] spans at most ``max_points`` of them."""
+    seconds = max(int((end - start).total_seconds() / max_points) + 1, 1)
+    epoch = func.extract('epoch', column)
+    return func.to_timestamp(func.floor(epoch / seconds) * seconds).label('bucket')
+
+
+@memoized
+def get_channels() -> list[dict]:
+    channel = db_architecture.Channel
+    with db_sessions.session_scope() as session:
+        return [row._asdict() for row in session.query(channel.channelId, channel.title).order_by(channel.title)]
+
+
+@memoized
+def get_channel_growth(channel_id: str, start: datetime, end: datetime,
+                       max_points: int = DASHBOARD_MAX_POINTS) -> list[dict]:
+    """Subscribers, views and video count from the channel's statistics snapshots, latest value per bucket."""
+    snapshot = db_architecture.ChannelStatsSnapshot
+    bucket = _bucket(snapshot.capturedAt, start, end, max_points)
+    with db_sessions.session_scope() as session:
+        rows = session.query(bucket, func.max(snapshot.subscribersCount).label('subscribersCount'),
+                             func.max(snapshot.viewCount).label('viewCount'),
+                             func.max(snapshot.videoCount).label('videoCount')).filter(
+            snapshot.channelId == channel_id, snapshot.capturedAt.between(start, end)).group_by(
+            bucket).order_by(bucket)
+        return [row._asdict() for row in rows]
+
+
+@memoized
+def get_comment_volume(channel_id: str, start: datetime, end: datetime,
+                       max_points: int = DASHBOARD_MAX_POINTS) -> list[dict]:
+    """Comments and replies published per time bucket on the channel's videos."""
+    comment = db_architecture.Comment
+    video = db_architecture.Video
+    bucket = _bucket(comment.publishedAt, start, end, max_points)
+    with db_sessions.session_scope() as session:
+        rows = session.query(bucket, func.count().label('comments'),
+                             func.count(comment.parentId).label('replies')).join(
+            video, video.videoId == comment.videoId).filter(
+            video.channelId == channel_id, comment.publishedAt.between(start, end)).group_by(bucket).order_by(bucket)
+        return [row._asdict() for row in rows]
+
+
+@memoized
+def get_top_commenters(channel_id: str, start: datetime, end: datetime, limit: int = 20) -> list[dict]:
+    comment = db_architecture.Comment
+    video = db_architecture.Video
+    with db_sessions.session_scope() as session:
+        rows = session.query(comment.authorChannelId, func.max(comment.authorDisplayName).label('authorDisplayName'),
+                             func.count().label('comments'),
+                             func.coalesce(func.sum(comment.likeCount), 0).label('likes')).join(
+            video, video.videoId == comment.videoId).filter(
+            video.channelId == channel_id, comment.publishedAt.between(start, end),
+            comment.authorChannelId.isnot(None)).group_by(comment.authorChannelId).order_by(
+            func.count().desc()).limit(limit)
+        return [row._asdict() for row in rows]
+
+
+@memoized
+def get_engagement(channel_id: str, start: datetime, end: datetime,
+                   max_points: int = DASHBOARD_MAX_POINTS) -> list[dict]:
+    """
+    Per-video engagement from the Return YouTube Dislike data: like share, rating and likes per 1000 views.
+
+    Channels with more videos than ``max_points`` in the window keep their most viewed ones.
+    """
+    video = db_architecture.Video
+    votes = video.likesFromApi + video.dislikesFromApi
+    with db_sessions.session_scope() as session:
+        rows = session.query(
+            video.videoId, video.title, video.publishedAt, video.viewsCount, video.ratingFromApi,
+            (cast(video.likesFromApi, Float) / func.nullif(votes, 0)).label('likeShare'),
+            (cast(video.likesFromApi, Float) * literal(1000) / func.nullif(video.viewsCount, 0)).label(
+                'likesPerThousandViews'),
+        ).filter(video.channelId == channel_id, video.publishedAt.between(start, end)).order_by(
+            video.viewsCount.desc().nulls_last()).limit(max_points)
+        return [row._asdict() for row in rows]
+
+
+def default_window(days: int = 365) -> tuple[datetime, datetime]:
+    # Rounded to the hour so that repeated page loads share memoized results
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return end - timedelta(days=days), end
+
+
+get_top_tags = memoized(tag_analytics.get_top_tags)
+get_co_occurring_tags = memoized(tag_analytics.get_co_occurring_tags)
+get_category_trends = memoized(tag_analytics.get_category_trends)
@@ -1,9 +1,11 @@
 from sqlalchemy import (
-    BigInteger, Column, ForeignKey, Boolean, String, Time, Double, DateTime, ARRAY
+    BigInteger, Column, ForeignKey, Boolean, String, Time, Double, Date, DateTime, ARRAY, Integer, Index,
+    LargeBinary, UniqueConstraint, func, text
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
-from ..models_module.db_sessions import engine
 
 Base = declarative_base()
 
@@ -114,6 +116,9 @@ class Video(Base):
         likesCount (BigInteger): Like count for the video.
         favoriteCount (BigInteger): Favorite count for the video.
         comment_count (BigInteger): Comment count for the video.
+        votesFetchedAt (DateTime): When likes, dislikes and rating were last taken from the Return YouTube
+            Dislike API; None until the enrichment stage first reaches the video.
+        searchVector (TSVECTOR): Full-text lexemes of title, tags and description, set by a trigger.
 
     Relationships:
         channel (Channel): The `Channel` object associated with the video.
@@ -122,6 +127,11 @@ class Video(Base):
     """
 
     __tablename__ = 'videos'
+    __table_args__ = (
+        Index('ix_videos_searchVector', 'searchVector', postgresql_using='gin'),
+        Index('ix_videos_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_videos_votesFetchedAt', 'votesFetchedAt'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     videoId = Column(String, nullable=False, unique=True)
@@ -152,8 +162,10 @@ class Video(Base):
     likesFromApi = Column(BigInteger, nullable=True)
     dislikesFromApi = Column(BigInteger, nullable=True)
     ratingFromApi = Column(Double, nullable=True)
+    votesFetchedAt = Column(DateTime, nullable=True)
     favoriteCount = Column(BigInteger, nullable=True)
     commentCount = Column(BigInteger, nullable=True)
+    searchVector = deferred(Column(TSVECTOR, nullable=True))
 
     # Relationships
     channel = relationship('Channel', back_populates='videos')
@@ -177,18 +189,23 @@ class Subtitle(Base):
         text (str): Subtitle text.
         start (Double): Start time of the subtitle in seconds.
         duration (Double): Duration of the subtitle in seconds.
+        searchVector (TSVECTOR): Full-text lexemes of the text, set by a trigger.
 
     Relationships:
         video (Video): The `Video` object associated with the subtitle.
     """
 
     __tablename__ = 'subtitles'
+    __table_args__ = (
+        Index('ix_subtitles_searchVector', 'searchVector', postgresql_using='gin'),
+    )
 
-    id = Column(BigInteger, primary_key=True)
-    videoId = Column(String, ForeignKey('videos.videoId'), nullable=False)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    videoId = Column(String, ForeignKey('videos.videoId'), nullable=False, index=True)
     text = Column(String)
     start = Column(Double)
     duration = Column(Double)
+    searchVector = deferred(Column(TSVECTOR, nullable=True))
 
     # Relationships
     video = relationship('Video', back_populates='subtitles')
@@ -217,6 +234,7 @@ class Comment(Base):
            moderationStatus (str): Moderation status of the comment.
            publishedAt (Time): Timestamp for when the comment was published.
            updatedAt (Time): Timestamp for when the comment was last updated.
+           searchVector (TSVECTOR): Full-text lexemes of textOriginal, set by a trigger.
 
        Relationships:
            video (Video): Relationship with the `Video` class.
@@ -226,6 +244,14 @@ class Comment(Base):
        """
 
     __tablename__ = 'comments'
+    __table_args__ = (
+        # Per-video and per-author listings in time order, reply lookups and time-range scans
+        Index('ix_comments_videoId_publishedAt', 'videoId', 'publishedAt'),
+        Index('ix_comments_authorChannelId_publishedAt', 'authorChannelId', 'publishedAt'),
+        Index('ix_comments_parentId', 'parentId', postgresql_where=text('"parentId" IS NOT NULL')),
+        Index('ix_comments_publishedAt', 'publishedAt'),
+        Index('ix_comments_searchVector', 'searchVector', postgresql_using='gin'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     commentId = Column(String, nullable=False, unique=True)
@@ -244,6 +270,7 @@ class Comment(Base):
     likeCount = Column(BigInteger)
     publishedAt = Column(DateTime)
     updatedAt = Column(DateTime)
+    searchVector = deferred(Column(TSVECTOR, nullable=True))
 
     # Relationships
     video = relationship('Video', back_populates='comments')
@@ -260,4 +287,403 @@ class Comment(Base):
                 f"updatedAt='{self.updatedAt}')>")
 
 
-Base.metadata.create_all(engine)
+class CommentSyncState(Base):
+    """
+    Per-video high-water mark for incremental comment syncs.
+
+    Attributes:
+        id (BigInteger): Primary key identifier for the sync state.
+        videoId (str): Foreign key reference to the synced video.
+        highWaterMark (DateTime): Latest publishedAt/updatedAt of the top-level comments ingested so far.
+        lastSyncedAt (DateTime): When the video's comments were last synced.
+    """
+
+    __tablename__ = 'comment_sync_state'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    videoId = Column(String, ForeignKey('videos.videoId'), nullable=False, unique=True)
+    highWaterMark = Column(DateTime, nullable=True)
+    lastSyncedAt = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (f"<CommentSyncState(id={self.id}, videoId={self.videoId}, highWaterMark='{self.highWaterMark}', "
+                f"lastSyncedAt='{self.lastSyncedAt}')>")
+
+
+class TranscriptState(Base):
+    """
+    Outcome of the last transcript fetch for a video, so videos without transcripts are not retried on every crawl.
+
+    Attributes:
+        id (BigInteger): Primary key identifier for the transcript state.
+        videoId (str): Foreign key reference to the video.
+        status (str): 'available', 'unavailable' (disabled or no track) or 'failed' (transient, retried).
+        language (str): Language code of the stored track.
+        isGenerated (bool): Whether the stored track is YouTube's automatic captions.
+        segmentCount (int): Number of segments stored in `subtitles`.
+        error (str): Last error for 'unavailable' and 'failed' videos.
+        fetchedAt (DateTime): When the transcript was last fetched.
+    """
+
+    __tablename__ = 'transcript_state'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    videoId = Column(String, ForeignKey('videos.videoId'), nullable=False, unique=True)
+    status = Column(String, nullable=False)
+    language = Column(String, nullable=True)
+    isGenerated = Column(Boolean, nullable=True)
+    segmentCount = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    fetchedAt = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (f"<TranscriptState(id={self.id}, videoId={self.videoId}, status='{self.status}', "
+                f"language='{self.language}')>")
+
+
+class VideoStatsSnapshot(Base):
+    """
+    Append-only time series of a video's volatile statistics.
+
+    The primary key (videoId, capturedAt) serves per-video history and latest-value lookups; the BRIN index
+    on capturedAt serves time-window scans across all videos at a fraction of a B-tree's size, since rows
+    are appended in capture order.
+
+    Attributes:
+        videoId (str): The video the statistics belong to.
+        capturedAt (DateTime): When the statistics were fetched.
+        viewsCount (BigInteger): Views at capture time.
+        likesCount (BigInteger): Likes at capture time.
+        commentCount (BigInteger): Comments at capture time.
+    """
+
+    __tablename__ = 'video_stats_snapshots'
+    __table_args__ = (
+        Index('ix_video_stats_snapshots_capturedAt_brin', 'capturedAt', postgresql_using='brin'),
+    )
+
+    videoId = Column(String, ForeignKey('videos.videoId'), primary_key=True)
+    capturedAt = Column(DateTime, primary_key=True)
+    viewsCount = Column(BigInteger, nullable=True)
+    likesCount = Column(BigInteger, nullable=True)
+    commentCount = Column(BigInteger, nullable=True)
+
+    def __repr__(self):
+        return (f"<VideoStatsSnapshot(videoId={self.videoId}, capturedAt='{self.capturedAt}', "
+                f"viewsCount={self.viewsCount})>")
+
+
+class ChannelStatsSnapshot(Base):
+    """
+    Append-only time series of a channel's volatile statistics.
+
+    Attributes:
+        channelId (str): The channel the statistics belong to.
+        capturedAt (DateTime): When the statistics were fetched.
+        viewCount (BigInteger): Total channel views at capture time.
+        subscribersCount (BigInteger): Subscribers at capture time.
+        videoCount (BigInteger): Public videos at capture time.
+    """
+
+    __tablename__ = 'channel_stats_snapshots'
+    __table_args__ = (
+        Index('ix_channel_stats_snapshots_capturedAt_brin', 'capturedAt', postgresql_using='brin'),
+    )
+
+    channelId = Column(String, ForeignKey('channels.channelId'), primary_key=True)
+    capturedAt = Column(DateTime, primary_key=True)
+    viewCount = Column(BigInteger, nullable=True)
+    subscribersCount = Column(BigInteger, nullable=True)
+    videoCount = Column(BigInteger, nullable=True)
+
+    def __repr__(self):
+        return (f"<ChannelStatsSnapshot(channelId={self.channelId}, capturedAt='{self.capturedAt}', "
+                f"subscribersCount={self.subscribersCount})>")
+
+
+class StatsRefreshState(Base):
+    """
+    When the statistics of a video or channel are next due for a refresh.
+
+    Attributes:
+        kind (str): 'video' or 'channel'.
+        targetId (str): videoId or channelId.
+        publishedAt (DateTime): Publication time, which sets how quickly refreshes decay.
+        lastRefreshedAt (DateTime): When the statistics were last fetched.
+        nextRefreshAt (DateTime): When the statistics are next due.
+    """
+
+    __tablename__ = 'stats_refresh_state'
+    __table_args__ = (
+        Index('ix_stats_refresh_state_due', 'kind', 'nextRefreshAt'),
+    )
+
+    kind = Column(String, primary_key=True)
+    targetId = Column(String, primary_key=True)
+    publishedAt = Column(DateTime, nullable=True)
+    lastRefreshedAt = Column(DateTime, nullable=True)
+    nextRefreshAt = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (f"<StatsRefreshState(kind='{self.kind}', targetId={self.targetId}, "
+                f"nextRefreshAt='{self.nextRefreshAt}')>")
+
+
+class TagStats(Base):
+    """
+    Number of stored videos carrying each tag, maintained incrementally by tag_analytics.
+
+    Attributes:
+        tag (str): Lower-cased tag.
+        videoCount (BigInteger): Videos carrying the tag.
+        lastPublishedAt (DateTime): Publication time of the newest such video.
+    """
+
+    __tablename__ = 'tag_stats'
+    __table_args__ = (
+        Index('ix_tag_stats_videoCount', 'videoCount'),
+    )
+
+    tag = Column(String, primary_key=True)
+    videoCount = Column(BigInteger, nullable=False, default=0)
+    lastPublishedAt = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<TagStats(tag='{self.tag}', videoCount={self.videoCount})>"
+
+
+class TagPair(Base):
+    """
+    Number of stored videos carrying both tags of a pair; each pair is stored once with tagA < tagB.
+
+    Attributes:
+        tagA (str): Lexicographically smaller tag.
+        tagB (str): Lexicographically larger tag.
+        videoCount (BigInteger): Videos carrying both tags.
+    """
+
+    __tablename__ = 'tag_pairs'
+    __table_args__ = (
+        # Lookups by either side of the pair
+        Index('ix_tag_pairs_tagB', 'tagB'),
+    )
+
+    tagA = Column(String, primary_key=True)
+    tagB = Column(String, primary_key=True)
+    videoCount = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TagPair(tagA='{self.tagA}', tagB='{self.tagB}', videoCount={self.videoCount})>"
+
+
+class TagCategoryDaily(Base):
+    """
+    Videos per tag, category and publication day, for tag trends within a category.
+
+    Attributes:
+        tag (str): Lower-cased tag.
+        categoryId (str): YouTube video category, '' when unknown.
+        day (Date): Publication day of the videos.
+        videoCount (BigInteger): Videos published that day in the category carrying the tag.
+    """
+
+    __tablename__ = 'tag_category_daily'
+    __table_args__ = (
+        Index('ix_tag_category_daily_category_day', 'categoryId', 'day'),
+    )
+
+    tag = Column(String, primary_key=True)
+    categoryId = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    videoCount = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<TagCategoryDaily(tag='{self.tag}', categoryId='{self.categoryId}', day='{self.day}', "
+                f"videoCount={self.videoCount})>")
+
+
+class TagAnalyticsVideo(Base):
+    """
+    Videos already counted in the tag aggregates, so each video is added exactly once.
+
+    Attributes:
+        videoId (str): The counted video.
+    """
+
+    __tablename__ = 'tag_analytics_videos'
+
+    videoId = Column(String, ForeignKey('videos.videoId'), primary_key=True)
+
+    def __repr__(self):
+        return f"<TagAnalyticsVideo(videoId={self.videoId})>"
+
+
+class CommentAnalysis(Base):
+    """
+    Offline text analytics of a comment's textOriginal, written by the comment analysis stage.
+
+    Not a foreign key to comments: once comments is partitioned, commentId alone is no longer unique there.
+
+    Attributes:
+        commentId (str): The analysed comment.
+        videoId (str): Video the comment belongs to.
+        language (str): 'ru', 'uk', 'en', 'other' or 'und' when the text has no letters.
+        sentiment (Double): From -1 (negative) to 1 (positive), 0 when no sentiment words were found.
+        toxic (bool): The text contains insults or obscenities.
+        spam (bool): The text looks like advertising: links, contacts or calls to subscribe.
+        modelVersion (str): Version of the analysis that produced the row.
+        analyzedAt (DateTime): When the row was written.
+    """
+
+    __tablename__ = 'comment_analysis'
+    __table_args__ = (
+        Index('ix_comment_analysis_videoId', 'videoId'),
+    )
+
+    commentId = Column(String, primary_key=True)
+    videoId = Column(String, nullable=False)
+    language = Column(String, nullable=False)
+    sentiment = Column(Double, nullable=False)
+    toxic = Column(Boolean, nullable=False)
+    spam = Column(Boolean, nullable=False)
+    modelVersion = Column(String, nullable=False)
+    analyzedAt = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return (f"<CommentAnalysis(commentId={self.commentId}, language='{self.language}', "
+                f"sentiment={self.sentiment}, toxic={self.toxic}, spam={self.spam})>")
+
+
+class PipelineWatermark(Base):
+    """
+    Progress of an offline processing stage over an append-only table.
+
+    Attributes:
+        name (str): The stage, e.g. 'comment_analysis'.
+        lastId (BigInteger): Highest source row id the stage has processed.
+        updatedAt (DateTime): When the watermark last moved.
+    """
+
+    __tablename__ = 'pipeline_watermarks'
+
+    name = Column(String, primary_key=True)
+    lastId = Column(BigInteger, nullable=False, default=0)
+    updatedAt = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<PipelineWatermark(name='{self.name}', lastId={self.lastId})>"
+
+
+class ApiResponseCache(Base):
+    """
+    YouTube Data API response bodies with their ETags, for conditional re-requests.
+
+    Attributes:
+        key (str): SHA-256 of the endpoint and its parameters without the API key.
+        endpoint (str): API method, e.g. 'videos.list'.
+        etag (str): ETag header the body was served with.
+        body (LargeBinary): Raw response body.
+        size (int): Body size in bytes.
+        storedAt (DateTime): When the API last confirmed the body, by a 200 or a 304.
+        accessedAt (DateTime): Last lookup, for least-recently-used pruning.
+    """
+
+    __tablename__ = 'api_response_cache'
+    __table_args__ = (
+        Index('ix_api_response_cache_accessedAt', 'accessedAt'),
+    )
+
+    key = Column(String, primary_key=True)
+    endpoint = Column(String, nullable=False)
+    etag = Column(String, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    storedAt = Column(DateTime, nullable=False, server_default=func.now())
+    accessedAt = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<ApiResponseCache(key='{self.key}', endpoint='{self.endpoint}', size={self.size})>"
+
+
+class ApiKeyUsage(Base):
+    """
+    YouTube Data API quota units handed out per key and Pacific day, shared by every process using the key.
+
+    Attributes:
+        keyId (str): SHA-256 of the API key; the keys themselves are never stored.
+        quotaDay (Date): Pacific date the units count against; quotas reset at midnight Pacific.
+        unitsReserved (BigInteger): Units reserved by schedulers for the day, at most the daily quota.
+        updatedAt (DateTime): Last reservation.
+    """
+
+    __tablename__ = 'api_key_usage'
+
+    keyId = Column(String, primary_key=True)
+    quotaDay = Column(Date, primary_key=True)
+    unitsReserved = Column(BigInteger, nullable=False, default=0)
+    updatedAt = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return (f"<ApiKeyUsage(keyId='{self.keyId[:8]}', quotaDay='{self.quotaDay}', "
+                f"unitsReserved={self.unitsReserved})>")
+
+
+class CrawlJob(Base):
+    """
+    Durable crawl job claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED.
+
+    A channel job enumerates the channel's uploads and enqueues one child video job per video; a video job
+    stores the video and its comments, checkpointing the next commentThreads page token after every page.
+
+    Attributes:
+        id (BigInteger): Primary key identifier for the job.
+        kind (str): 'channel' or 'video'.
+        target (str): Channel URL for channel jobs, video ID for video jobs.
+        parentId (BigInteger): Channel job that enqueued this video job.
+        status (str): 'pending', 'running', 'done' or 'failed'.
+        priority (int): Lower values are claimed first.
+        owner (str): Worker currently holding the job.
+        heartbeatAt (DateTime): Last time the owner reported progress; stale running jobs are reclaimed.
+        attempts (int): Number of times the job has been claimed.
+        pageToken (str): commentThreads page to resume from.
+        videoCount (int): Channel jobs only, number of latest videos to crawl, 0 for all.
+        newVideosOnly (bool): Channel jobs only, stop enumerating at the first stored video.
+        incremental (bool): Sync comments incrementally.
+        videosDone (BigInteger): Videos finished by this job.
+        commentsIngested (BigInteger): Comment rows inserted by this job.
+        quotaSpent (BigInteger): YouTube Data API quota units consumed by this job.
+        error (str): Last error message.
+        createdAt (DateTime): When the job was enqueued.
+        finishedAt (DateTime): When the job reached 'done' or 'failed'.
+    """
+
+    __tablename__ = 'crawl_jobs'
+    __table_args__ = (
+        UniqueConstraint('parentId', 'target'),
+        Index('ix_crawl_jobs_claim', 'status', 'priority', 'id'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    target = Column(String, nullable=False)
+    parentId = Column(BigInteger, ForeignKey('crawl_jobs.id'), nullable=True, index=True)
+    status = Column(String, nullable=False, default='pending')
+    priority = Column(Integer, nullable=False, default=10)
+    owner = Column(String, nullable=True)
+    heartbeatAt = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    pageToken = Column(String, nullable=True)
+    videoCount = Column(Integer, nullable=True)
+    newVideosOnly = Column(Boolean, nullable=False, default=False)
+    incremental = Column(Boolean, nullable=False, default=False)
+    videosDone = Column(BigInteger, nullable=False, default=0)
+    commentsIngested = Column(BigInteger, nullable=False, default=0)
+    quotaSpent = Column(BigInteger, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    createdAt = Column(DateTime, nullable=False, server_default=func.now())
+    finishedAt = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (f"<CrawlJob(id={self.id}, kind='{self.kind}', target='{self.target}', status='{self.status}', "
+                f"owner='{self.owner}', pageToken='{self.pageToken}')>")
+
@@ -1,7 +1,9 @@
 import os
+from contextlib import contextmanager
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy.orm import sessionmaker
 
 load_dotenv()
@@ -12,9 +14,43 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# 0 leaves the server default (no timeout)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
 
-engine = create_engine(f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{DB_NAME}')
+DATABASE_URL = f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{DB_NAME}'
 
-Session = sessionmaker(bind=engine)
+_pool_options = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+                     pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING)
 
-session = Session()
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'} if DB_STATEMENT_TIMEOUT_MS else {},
+    **_pool_options)
+
+# Objects stay readable after their session closes, so helpers can return them to callers
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+
+@contextmanager
+def session_scope(session: OrmSession | None = None):
+    """
+    One unit of work: a session that commits on success, rolls back on error and returns its connection
+    to the pool. When ``session`` is given the caller owns the transaction and it is used as is.
+    """
+    if session is not None:
+        yield session
+        return
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+EXISTENCE_CACHE_LRU_SIZE = int(os.getenv("EXISTENCE_CACHE_LRU_SIZE", 100_000))
+EXISTENCE_CACHE_ERROR_RATE = float(os.getenv("EXISTENCE_CACHE_ERROR_RATE", 0.01))
+EXISTENCE_CACHE_WARM_BATCH = 50_000
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings using double hashing of a single blake2b digest.
+
+    Attributes:
+        size (int): Number of bits in the filter.
+        hash_count (int): Number of bit positions set per item.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = EXISTENCE_CACHE_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class ExistenceCache:
+    """
+    Membership layer in front of the check_exists_* queries.
+
+    Ids seen recently live in an exact LRU set; anything else is checked with one IN query per batch.
+
+    With ``trust_negatives`` every id known to the database is also added to a Bloom filter, and once the
+    cache is warmed a negative filter answer skips the database entirely. The filter only learns of rows
+    written by this process, so a negative may be stale when other processes (API, workers, refresher) write
+    the same table. That is only acceptable where a wrong "new" is harmless: comments, whose inserts are
+    guarded by ON CONFLICT. For channels and videos a wrong "new" means re-crawling and spending quota, so
+    their caches confirm every miss in the database and keep only the LRU.
+
+    Attributes:
+        column: Model column holding the YouTube id, e.g. ``Comment.commentId``.
+        trust_negatives (bool): Whether Bloom negatives may skip the database.
+        warmed (bool): Whether the filter has been loaded from the database; until then negatives go to the DB.
+        stats (dict): lru_hits, bloom_negatives, db_checks, db_positives counters.
+    """
+
+    def __init__(self, column, capacity: int, lru_size: int = EXISTENCE_CACHE_LRU_SIZE,
+                 trust_negatives: bool = True):
+        self.column = column
+        self.capacity = capacity
+        self.lru_size = lru_size
+        self.trust_negatives = trust_negatives
+        self.warmed = False
+        self.stats = {'lru_hits': 0, 'bloom_negatives': 0, 'db_checks': 0, 'db_positives': 0}
+        self._lru = OrderedDict()
+        self._bloom = None
+        self._lock = threading.Lock()
+
+    @property
+    def bloom(self) -> BloomFilter:
+        # Allocated on first use so importing the module stays cheap
+        if self._bloom is None:
+            self._bloom = BloomFilter(self.capacity)
+        return self._bloom
+
+    def _remember(self, item: str):
+        self._lru[item] = None
+        self._lru.move_to_end(item)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def add(self, item: str):
+        self.add_many([item])
+
+    def _add(self, item: str):
+        if self.trust_negatives:
+            self.bloom.add(item)
+        self._remember(item)
+
+    def add_many(self, items):
+        with self._lock:
+            for item in items:
+                self._add(item)
+
+    def contains(self, item: str, session=None) -> bool:
+        return item in self.filter_existing([item], session)
+
+    def filter_existing(self, items: list[str], session=None) -> set[str]:
+        existing = set()
+        candidates = []
+        with self._lock:
+            for item in items:
+                if item in self._lru:
+                    self._lru.move_to_end(item)
+                    self.stats['lru_hits'] += 1
+                    existing.add(item)
+                elif self.warmed and self.trust_negatives and item not in self.bloom:
+                    self.stats['bloom_negatives'] += 1
+                else:
+                    candidates.append(item)
+        if candidates:
+            with db_sessions.session_scope(session) as session:
+                rows = session.query(self.column).filter(self.column.in_(set(candidates))).all()
+            confirmed = {item for (item,) in rows}
+            # Counters share the LRU's lock, worker threads check concurrently
+            with self._lock:
+                self.stats['db_checks'] += len(candidates)
+                self.stats['db_positives'] += len(confirmed)
+                for item in confirmed:
+                    self._add(item)
+            existing |= confirmed
+        return existing
+
+    def warm(self):
+        loaded = 0
+        with db_sessions.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=EXISTENCE_CACHE_WARM_BATCH).execute(
+                select(self.column))
+            for partition in result.partitions():
+                with self._lock:
+                    for (item,) in partition:
+                        self.bloom.add(item)
+                loaded += len(partition)
+        self.warmed = True
+        logger.info('Warmed existence cache for {column}: {loaded} ids'.format(column=self.column, loaded=loaded))
+        if loaded > self.capacity:
+            logger.warning('Existence cache for {column} is over capacity ({loaded} > {capacity}); '
+                           'raise its capacity to keep the false positive rate down'.format(
+                               column=self.column, loaded=loaded, capacity=self.capacity))
+
+
+channels = ExistenceCache(db_architecture.Channel.channelId,
+                          int(os.getenv("EXISTENCE_CACHE_CHANNELS", 1_000_000)), trust_negatives=False)
+videos = ExistenceCache(db_architecture.Video.videoId,
+                        int(os.getenv("EXISTENCE_CACHE_VIDEOS", 5_000_000)), trust_negatives=False)
+comments = ExistenceCache(db_architecture.Comment.commentId,
+                          int(os.getenv("EXISTENCE_CACHE_COMMENTS", 10_000_000)))
+
+CACHES = {'channels': channels, 'videos': videos, 'comments': comments}
+
+
+def warm_all():
+    # Caches that confirm every miss in the database have no use for a filter
+    for cache in CACHES.values():
+        if cache.trust_negatives:
+            cache.warm()
+
+
+def get_stats() -> dict:
+    stats = {}
+    for name, cache in CACHES.items():
+        with cache._lock:
+            stats[name] = dict(cache.stats, warmed=cache.warmed, lru_entries=len(cache._lru))
+    return stats
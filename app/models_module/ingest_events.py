@@ -0,0 +1,57 @@
+"""
+Cross-process "new data was ingested" signal over Postgres LISTEN/NOTIFY.
+
+Writers call `notify` after committing a unit of ingestion; readers holding caches (the dashboard) run
+`listen` in a background thread and drop what they cached. Notifications are best effort: a reader that
+is disconnected misses them, so caches must also expire on their own.
+"""
+import logging
+import select
+import threading
+from collections.abc import Callable
+
+from sqlalchemy import text
+
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHANNEL = 'ingest'
+LISTEN_RECONNECT_SECONDS = 5
+
+
+def notify(kind: str):
+    """Tells listeners that ``kind`` data ('videos', 'comments', 'stats', ...) changed."""
+    try:
+        with db_sessions.session_scope() as session:
+            session.execute(text('SELECT pg_notify(:channel, :kind)'), {'channel': INGEST_CHANNEL, 'kind': kind})
+    except Exception:
+        # Never fail an ingestion because a cache could not be told about it
+        logger.exception('Could not send ingest notification')
+
+
+def listen(callback: Callable[[str], None], stop_event: threading.Event | None = None):
+    """Calls ``callback(kind)`` for every notification until ``stop_event`` is set; reconnects on errors."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        connection = None
+        try:
+            connection = db_sessions.engine.raw_connection()
+            connection.driver_connection.autocommit = True
+            connection.cursor().execute(f'LISTEN {INGEST_CHANNEL}')
+            # Anything ingested while not listening is unknown, so start from a clean slate
+            callback('reconnect')
+            while not stop_event.is_set():
+                if select.select([connection.driver_connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.driver_connection.poll()
+                while connection.driver_connection.notifies:
+                    callback(connection.driver_connection.notifies.pop(0).payload)
+        except Exception:
+            logger.exception('Ingest listener failed, reconnecting')
+            stop_event.wait(LISTEN_RECONNECT_SECONDS)
+        finally:
+            if connection is not None:
+                # An autocommit connection subscribed to a channel must not go back to the pool
+                connection.invalidate()
+                connection.close()
@@ -0,0 +1,148 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 600))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# Running jobs refresh their lease this often, well inside JOB_LEASE_SECONDS
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", JOB_LEASE_SECONDS / 4))
+
+
+class JobLostError(Exception):
+    """Raised when a worker's lease on a job expired and the job was claimed by another worker."""
+
+
+def enqueue_job(kind: str, target: str, parent_id: int | None = None, priority: int = 10,
+                video_count: int | None = None, new_videos_only: bool = False, incremental: bool = False) -> int | None:
+    stmt = insert(db_architecture.CrawlJob).values(
+        kind=kind, target=target, parentId=parent_id, status='pending', priority=priority, attempts=0,
+        videoCount=video_count, newVideosOnly=new_videos_only, incremental=incremental,
+        videosDone=0, commentsIngested=0, quotaSpent=0)
+    # Re-running an interrupted channel job must not duplicate the video jobs it already enqueued
+    stmt = stmt.on_conflict_do_nothing(index_elements=['parentId', 'target']).returning(db_architecture.CrawlJob.id)
+    with db_sessions.session_scope() as session:
+        return session.execute(stmt).scalar()
+
+
+def claim_job(worker_id: str) -> db_architecture.CrawlJob | None:
+    job_table = db_architecture.CrawlJob
+    stale = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    with db_sessions.session_scope() as session:
+        job = session.query(job_table).filter(
+            or_(job_table.status == 'pending',
+                (job_table.status == 'running') & (job_table.heartbeatAt < stale))
+        ).order_by(job_table.priority, job_table.id).with_for_update(skip_locked=True).limit(1).first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.owner = worker_id
+        job.heartbeatAt = datetime.utcnow()
+        job.attempts += 1
+    return job
+
+
+def _update_owned(session, job_id: int, worker_id: str, **values):
+    job_table = db_architecture.CrawlJob
+    result = session.execute(
+        update(job_table).where(job_table.id == job_id, job_table.owner == worker_id, job_table.status == 'running')
+        .values(heartbeatAt=datetime.utcnow(), **values))
+    if result.rowcount == 0:
+        raise JobLostError(f'Job {job_id} is no longer owned by {worker_id}')
+
+
+def heartbeat_job(job_id: int, worker_id: str):
+    with db_sessions.session_scope() as session:
+        _update_owned(session, job_id, worker_id)
+
+
+def checkpoint_job(job_id: int, worker_id: str, page_token: str | None, comments_ingested: int = 0,
+                   quota_spent: int = 0):
+    job_table = db_architecture.CrawlJob
+    with db_sessions.session_scope() as session:
+        _update_owned(session, job_id, worker_id, pageToken=page_token,
+                      commentsIngested=job_table.commentsIngested + comments_ingested,
+                      quotaSpent=job_table.quotaSpent + quota_spent)
+
+
+def complete_job(job_id: int, worker_id: str, videos_done: int = 0, quota_spent: int = 0):
+    job_table = db_architecture.CrawlJob
+    # The job and its parent's counter move together or not at all
+    with db_sessions.session_scope() as session:
+        _update_owned(session, job_id, worker_id, status='done', pageToken=None, finishedAt=datetime.utcnow(),
+                      videosDone=job_table.videosDone + videos_done, quotaSpent=job_table.quotaSpent + quota_spent)
+        parent_id = session.query(job_table.parentId).filter(job_table.id == job_id).scalar()
+        if parent_id is not None and videos_done:
+            session.execute(update(job_table).where(job_table.id == parent_id).values(
+                videosDone=job_table.videosDone + videos_done))
+
+
+def fail_job(job_id: int, worker_id: str, error: str):
+    job_table = db_architecture.CrawlJob
+    with db_sessions.session_scope() as session:
+        attempts = session.query(job_table.attempts).filter(job_table.id == job_id).scalar()
+        if attempts is not None and attempts >= JOB_MAX_ATTEMPTS:
+            _update_owned(session, job_id, worker_id, status='failed', error=error, finishedAt=datetime.utcnow())
+        else:
+            # Back to the queue; the page token checkpoint is kept so the retry resumes where this one stopped
+            _update_owned(session, job_id, worker_id, status='pending', owner=None, error=error)
+
+
+def release_job(job_id: int, worker_id: str, error: str):
+    """Returns a job that could not run for want of quota to the queue without counting the attempt."""
+    job_table = db_architecture.CrawlJob
+    with db_sessions.session_scope() as session:
+        _update_owned(session, job_id, worker_id, status='pending', owner=None, error=error,
+                      attempts=job_table.attempts - 1)
+
+
+def get_job(job_id: int, session=None) -> db_architecture.CrawlJob | None:
+    with db_sessions.session_scope(session) as session:
+        return session.get(db_architecture.CrawlJob, job_id)
+
+
+def get_job_progress(job_id: int) -> dict | None:
+    job_table = db_architecture.CrawlJob
+    with db_sessions.session_scope() as session:
+        job = get_job(job_id, session)
+        if job is None:
+            return None
+        total, done, failed, comments, quota = session.query(
+            func.count(job_table.id),
+            func.count(job_table.id).filter(job_table.status == 'done'),
+            func.count(job_table.id).filter(job_table.status == 'failed'),
+            func.coalesce(func.sum(job_table.commentsIngested), 0),
+            func.coalesce(func.sum(job_table.quotaSpent), 0),
+        ).filter(job_table.parentId == job_id).one()
+    status = job.status
+    # A channel job is finished enumerating long before its video jobs are
+    if status == 'done' and done + failed < total:
+        status = 'running'
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'target': job.target,
+        'status': status,
+        'attempts': job.attempts,
+        'videos_total': total if job.kind == 'channel' else 1,
+        'videos_done': job.videosDone,
+        'videos_failed': failed,
+        'comments_ingested': job.commentsIngested + comments,
+        'quota_spent': job.quotaSpent + quota,
+        'error': job.error,
+        'created_at': job.createdAt,
+        'finished_at': job.finishedAt,
+    }
+
+
+def count_active_jobs() -> dict[str, int]:
+    """Pending and running jobs; the status prefix of ix_crawl_jobs_claim keeps this cheap on a long history."""
+    job_table = db_architecture.CrawlJob
+    with db_sessions.session_scope() as session:
+        counts = dict(session.query(job_table.status, func.count(job_table.id)).filter(
+            job_table.status.in_(['pending', 'running'])).group_by(job_table.status).all())
+    return {status: counts.get(status, 0) for status in ('pending', 'running')}
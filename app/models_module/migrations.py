@@ -0,0 +1,230 @@
+import logging
+from collections.abc import Callable
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+# Serialises concurrent `migrate` runs, e.g. several containers starting at once
+MIGRATION_LOCK_ID = 7_013_001
+
+
+class Migration(NamedTuple):
+    """
+    One schema change, applied at most once per database.
+
+    Attributes:
+        version (int): Position in MIGRATIONS; recorded in schema_migrations once applied.
+        name (str): Human readable summary for the logs.
+        apply (Callable): Receives the connection to run the change on.
+        transactional (bool): False for statements Postgres refuses inside a transaction block,
+            such as CREATE INDEX CONCURRENTLY; those run on an autocommit connection.
+    """
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    transactional: bool = True
+
+
+def _create_schema(connection: Connection):
+    # The trigram index on videos.title needs the operator class before create_all
+    connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    db_architecture.Base.metadata.create_all(connection)
+
+
+def _transcript_storage(connection: Connection):
+    # Databases created before Subtitle.id was declared autoincrement may lack the sequence default
+    connection.execute(text('CREATE SEQUENCE IF NOT EXISTS subtitles_id_seq OWNED BY subtitles.id'))
+    connection.execute(text("ALTER TABLE subtitles ALTER COLUMN id SET DEFAULT nextval('subtitles_id_seq')"))
+    connection.execute(text("SELECT setval('subtitles_id_seq', COALESCE((SELECT max(id) FROM subtitles), 0) + 1, "
+                            "false)"))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS "ix_subtitles_videoId" ON subtitles ("videoId")'))
+    db_architecture.TranscriptState.__table__.create(connection, checkfirst=True)
+
+
+def _stats_snapshots(connection: Connection):
+    for model in (db_architecture.VideoStatsSnapshot, db_architecture.ChannelStatsSnapshot,
+                  db_architecture.StatsRefreshState):
+        model.__table__.create(connection, checkfirst=True)
+    # The counters stored so far are the first point of every series
+    connection.execute(text(
+        'INSERT INTO video_stats_snapshots ("videoId", "capturedAt", "viewsCount", "likesCount", "commentCount") '
+        'SELECT "videoId", now() AT TIME ZONE \'utc\', "viewsCount", "likesCount", "commentCount" FROM videos '
+        'ON CONFLICT DO NOTHING'))
+    connection.execute(text(
+        'INSERT INTO channel_stats_snapshots ("channelId", "capturedAt", "viewCount", "subscribersCount", '
+        '"videoCount") SELECT "channelId", now() AT TIME ZONE \'utc\', "viewCount", "subscribersCount", '
+        '"videoCount" FROM channels ON CONFLICT DO NOTHING'))
+
+
+def create_index_concurrently(connection: Connection, name: str, definition: str):
+    """
+    Builds an index without blocking writes. A build interrupted earlier leaves an INVALID index behind,
+    which IF NOT EXISTS would silently keep, so that one is dropped and rebuilt.
+    """
+    valid = connection.execute(text(
+        'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'),
+        {'name': name}).scalar()
+    if valid:
+        return
+    if valid is not None:
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+    logger.info('Building index {name}'.format(name=name))
+    connection.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" {definition}'))
+
+
+# Mirrors Comment.__table_args__; definitions are formatted with the table they are built on
+COMMENT_INDEXES = {
+    'ix_comments_videoId_publishedAt': 'ON {table} ("videoId", "publishedAt")',
+    'ix_comments_authorChannelId_publishedAt': 'ON {table} ("authorChannelId", "publishedAt")',
+    'ix_comments_parentId': 'ON {table} ("parentId") WHERE "parentId" IS NOT NULL',
+    'ix_comments_publishedAt': 'ON {table} ("publishedAt")',
+}
+
+
+def _comment_indexes(connection: Connection):
+    for name, definition in COMMENT_INDEXES.items():
+        create_index_concurrently(connection, name, definition.format(table='comments'))
+
+
+# Text search configurations every search vector is built with; queries must use the same ones
+SEARCH_CONFIGS = ('russian', 'english')
+
+
+def _bilingual_vector(expression: str, weight: str) -> str:
+    return ' || '.join(f"setweight(to_tsvector('{config}', coalesce({expression}, '')), '{weight}')"
+                       for config in SEARCH_CONFIGS)
+
+
+# Columns whose changes rebuild the vector, and the vector built from the NEW row
+SEARCH_VECTORS = {
+    'comments': (('textOriginal',), _bilingual_vector('NEW."textOriginal"', 'A')),
+    'videos': (('title', 'tags', 'description'), ' || '.join([
+        _bilingual_vector('NEW.title', 'A'),
+        _bilingual_vector("array_to_string(NEW.tags, ' ')", 'B'),
+        _bilingual_vector('NEW.description', 'C')])),
+    'subtitles': (('text',), _bilingual_vector('NEW.text', 'A')),
+}
+
+SEARCH_INDEXES = {
+    'comments': {'ix_comments_searchVector': 'ON {table} USING gin ("searchVector")'},
+    'videos': {'ix_videos_searchVector': 'ON {table} USING gin ("searchVector")',
+               'ix_videos_title_trgm': 'ON {table} USING gin (title gin_trgm_ops)'},
+    'subtitles': {'ix_subtitles_searchVector': 'ON {table} USING gin ("searchVector")'},
+}
+
+SEARCH_BACKFILL_BATCH = 50000
+
+
+def create_search_trigger(connection: Connection, table: str, on_table: str | None = None):
+    """Keeps ``searchVector`` current on every insert and on updates of the columns it is built from."""
+    on_table = on_table or table
+    columns, vector = SEARCH_VECTORS[table]
+    connection.execute(text(
+        f'CREATE OR REPLACE FUNCTION {table}_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$ '
+        f'BEGIN NEW."searchVector" := {vector}; RETURN NEW; END $$'))
+    connection.execute(text(f'DROP TRIGGER IF EXISTS {table}_search_vector ON {on_table}'))
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    connection.execute(text(
+        f'CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF {column_list} ON {on_table} '
+        f'FOR EACH ROW EXECUTE FUNCTION {table}_search_vector()'))
+
+
+def _full_text_search(connection: Connection):
+    connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    for table, (columns, _) in SEARCH_VECTORS.items():
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "searchVector" tsvector'))
+        create_search_trigger(connection, table)
+        # Touching a source column fires the trigger; small id ranges keep each UPDATE's locks short-lived
+        max_id = connection.execute(text(f'SELECT COALESCE(max(id), 0) FROM {table}')).scalar()
+        for start in range(0, max_id, SEARCH_BACKFILL_BATCH):
+            connection.execute(text(
+                f'UPDATE {table} SET "{columns[0]}" = "{columns[0]}" '
+                f'WHERE id > :start AND id <= :end AND "searchVector" IS NULL'),
+                {'start': start, 'end': start + SEARCH_BACKFILL_BATCH})
+        logger.info('Search vectors filled for {table}'.format(table=table))
+        for name, definition in SEARCH_INDEXES[table].items():
+            create_index_concurrently(connection, name, definition.format(table=table))
+
+
+def _tag_analytics(connection: Connection):
+    for model in (db_architecture.TagStats, db_architecture.TagPair, db_architecture.TagCategoryDaily,
+                  db_architecture.TagAnalyticsVideo):
+        model.__table__.create(connection, checkfirst=True)
+
+
+def _comment_analysis(connection: Connection):
+    for model in (db_architecture.CommentAnalysis, db_architecture.PipelineWatermark):
+        model.__table__.create(connection, checkfirst=True)
+
+
+def _response_cache(connection: Connection):
+    db_architecture.ApiResponseCache.__table__.create(connection, checkfirst=True)
+
+
+def _video_votes_enrichment(connection: Connection):
+    # Existing rows stay NULL, so the enrichment stage refreshes every stored video once
+    connection.execute(text('ALTER TABLE videos ADD COLUMN IF NOT EXISTS "votesFetchedAt" timestamp'))
+    create_index_concurrently(connection, 'ix_videos_votesFetchedAt', 'ON videos ("votesFetchedAt")')
+
+
+def _shared_quota(connection: Connection):
+    db_architecture.ApiKeyUsage.__table__.create(connection, checkfirst=True)
+
+
+MIGRATIONS = [
+    Migration(1, 'create schema', _create_schema),
+    Migration(2, 'transcript storage', _transcript_storage),
+    Migration(3, 'statistics snapshots', _stats_snapshots),
+    Migration(4, 'comment access path indexes', _comment_indexes, transactional=False),
+    Migration(5, 'full-text search', _full_text_search, transactional=False),
+    Migration(6, 'tag analytics aggregates', _tag_analytics),
+    Migration(7, 'comment text analytics', _comment_analysis),
+    Migration(8, 'API response cache', _response_cache),
+    Migration(9, 'decoupled dislike enrichment', _video_votes_enrichment, transactional=False),
+    Migration(10, 'API key quota shared across processes', _shared_quota),
+]
+
+
+def migrate(engine: Engine = db_sessions.engine) -> list[int]:
+    """
+    Applies every migration the database has not seen yet, in version order.
+
+    Returns:
+        Versions applied by this call.
+    """
+    applied_now = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+        try:
+            connection.execute(text('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                                    'version integer PRIMARY KEY, name text NOT NULL, '
+                                    '"appliedAt" timestamp NOT NULL DEFAULT now())'))
+            applied = set(connection.execute(text('SELECT version FROM schema_migrations')).scalars())
+            for migration in sorted(MIGRATIONS, key=lambda item: item.version):
+                if migration.version in applied:
+                    continue
+                logger.info('Applying migration {version}: {name}'.format(
+                    version=migration.version, name=migration.name))
+                record = text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)')
+                if migration.transactional:
+                    with engine.begin() as transaction:
+                        migration.apply(transaction)
+                        transaction.execute(record, {'version': migration.version, 'name': migration.name})
+                else:
+                    migration.apply(connection)
+                    connection.execute(record, {'version': migration.version, 'name': migration.name})
+                applied_now.append(migration.version)
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+    return applied_now
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logger.info('Applied migrations: {versions}'.format(versions=migrate() or 'none, schema is up to date'))
@@ -0,0 +1,198 @@
+"""
+Incremental export of videos and comments into a Hive-partitioned Parquet dataset for offline analysis.
+
+Rows are streamed through a server-side cursor in chunks of EXPORT_CHUNK_SIZE and converted column by column
+into Arrow tables with a fixed schema derived from the models, so every file of a table has the same schema.
+ARRAY columns become Arrow lists. Files are laid out as
+
+    <output>/<table>/channelId=<id>/month=<YYYY-MM>/part-<first id>-<n>.parquet
+
+and can be read back with ``pyarrow.dataset.dataset(path, partitioning='hive')`` or ``pandas.read_parquet``.
+Comments are partitioned by the channel of their video.
+
+Every write produces one file for each channel and month it contains. Ids follow insertion order, so a chunk
+spans most active channels, and writing every chunk would leave a partition with one small file per chunk.
+Chunks are therefore buffered until EXPORT_FLUSH_ROWS rows, which also bounds memory, and written together;
+a partition gets one file per flush. Incremental runs add files to the partitions they touch, so a dataset
+fed by frequent small runs fragments over time; ``--full`` rewrites it with one file per partition and flush.
+
+Each table keeps a watermark, the highest exported id, in ``<output>/_export_state.json``; a later run only
+exports rows inserted since. The watermark is saved after every flush and file names are derived from the
+flush's first id, so an interrupted export simply continues and rewrites at most the rows it was buffering.
+Rows are never re-exported when they are updated in place, and a row committed by a transaction that was
+still running during an export may carry an id below the watermark; ``--full`` deletes the exported tables
+and exports them again.
+
+    python -m app.models_module.parquet_export --output ./export [--tables videos comments] [--full]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import ARRAY, BigInteger, Boolean, Date, DateTime, Float, Integer, func, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 50000))
+EXPORT_FLUSH_ROWS = int(os.getenv("EXPORT_FLUSH_ROWS", 1000000))
+EXPORT_STATE_FILE = '_export_state.json'
+
+EXPORT_TABLES = {
+    'videos': db_architecture.Video,
+    'comments': db_architecture.Comment,
+}
+PARTITION_COLUMNS = ['channelId', 'month']
+
+
+def _arrow_type(column_type) -> pa.DataType:
+    if isinstance(column_type, ARRAY):
+        return pa.list_(_arrow_type(column_type.item_type))
+    if isinstance(column_type, (BigInteger, Integer)):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _export_columns(table: str) -> list:
+    # Search vectors are derived from the text columns and meaningless outside Postgres
+    return [column for column in EXPORT_TABLES[table].__table__.columns if not isinstance(column.type, TSVECTOR)]
+
+
+def _export_query(table: str, since_id: int, chunk_size: int):
+    model = EXPORT_TABLES[table]
+    columns = _export_columns(table)
+    query = select(*columns)
+    if model is db_architecture.Comment:
+        # Comments are stored without the channel they were posted to; it is the channel of their video
+        video = db_architecture.Video
+        columns = [func.coalesce(model.channelId, video.channelId).label('channelId') if column.name == 'channelId'
+                   else column for column in columns]
+        query = select(*columns).select_from(model).outerjoin(video, video.videoId == model.videoId)
+    return query.where(model.id > since_id).order_by(model.id).execution_options(yield_per=chunk_size)
+
+
+def table_schema(table: str) -> pa.Schema:
+    return pa.schema([pa.field(column.name, _arrow_type(column.type), nullable=column.nullable)
+                      for column in _export_columns(table)])
+
+
+def load_state(output: Path) -> dict[str, int]:
+    path = output / EXPORT_STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _save_state(output: Path, state: dict[str, int]):
+    path = output / EXPORT_STATE_FILE
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(state, indent=2, sort_keys=True))
+    temporary.replace(path)
+
+
+def _to_arrow(rows: list, schema: pa.Schema) -> pa.Table:
+    columns = list(zip(*rows))
+    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+    batch = pa.Table.from_arrays(arrays, schema=schema)
+    month = pc.strftime(batch['publishedAt'], format='%Y-%m')
+    return batch.append_column('month', month)
+
+
+def _write_partitions(batches: list[pa.Table], table: str, output: Path, first_id: int):
+    pq.write_to_dataset(pa.concat_tables(batches), root_path=str(output / table), partition_cols=PARTITION_COLUMNS,
+                        basename_template=f'part-{first_id}-{{i}}.parquet',
+                        existing_data_behavior='overwrite_or_ignore')
+
+
+def export_table(table: str, output: Path, since_id: int = 0, chunk_size: int = EXPORT_CHUNK_SIZE,
+                 flush_rows: int = EXPORT_FLUSH_ROWS) -> tuple[int, int]:
+    """
+    Streams the rows of ``table`` with an id above ``since_id`` into the dataset under ``output``.
+
+    Returns:
+        Number of exported rows and the new watermark.
+    """
+    schema = table_schema(table)
+    state = load_state(output)
+    exported = 0
+    batches, buffered, first_id = [], 0, None
+
+    def flush(last_id: int):
+        nonlocal exported, since_id, batches, buffered, first_id
+        _write_partitions(batches, table, output, first_id)
+        exported += buffered
+        since_id = state[table] = last_id
+        _save_state(output, state)
+        logger.info('Exported {count} {table} rows up to id {last_id}'.format(
+            count=exported, table=table, last_id=last_id))
+        batches, buffered, first_id = [], 0, None
+
+    query = _export_query(table, since_id, chunk_size)
+    with db_sessions.session_scope() as session:
+        for rows in session.execute(query).partitions(chunk_size):
+            if first_id is None:
+                first_id = rows[0].id
+            batches.append(_to_arrow(rows, schema))
+            buffered += len(rows)
+            last_id = rows[-1].id
+            if buffered >= flush_rows:
+                flush(last_id)
+        if batches:
+            flush(last_id)
+    return exported, since_id
+
+
+def export(output: str | Path, tables: list[str] | None = None, full: bool = False,
+           chunk_size: int = EXPORT_CHUNK_SIZE, flush_rows: int = EXPORT_FLUSH_ROWS) -> dict[str, int]:
+    """
+    Exports ``tables`` (all of EXPORT_TABLES by default), incrementally unless ``full`` is set.
+
+    Returns:
+        Number of exported rows per table.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    tables = tables or list(EXPORT_TABLES)
+    for table in tables:
+        if table not in EXPORT_TABLES:
+            raise ValueError(f'Unknown export table: {table}')
+    state = load_state(output)
+    if full:
+        # Flush boundaries shift on a full export, so old files would not be overwritten but duplicated
+        for table in tables:
+            shutil.rmtree(output / table, ignore_errors=True)
+            state.pop(table, None)
+        _save_state(output, state)
+    exported = {}
+    for table in tables:
+        exported[table], _ = export_table(table, output, state.get(table, 0), chunk_size, flush_rows)
+    return exported
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--tables', nargs='+', choices=list(EXPORT_TABLES), default=list(EXPORT_TABLES))
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument('--flush-rows', type=int, default=EXPORT_FLUSH_ROWS,
+                        help='rows buffered before a write; each write adds one file per channel and month')
+    parser.add_argument('--full', action='store_true', help='delete the exported tables and export everything again')
+    args = parser.parse_args()
+    logger.info('Exported rows: {exported}'.format(exported=export(args.output, args.tables, args.full,
+                                                                     args.chunk_size, args.flush_rows)))
@@ -0,0 +1,123 @@
+"""
+Opt-in conversion of the comments table into a table hash-partitioned by videoId.
+
+Every per-video access (crawls, analytics, reply lookups) then touches a single partition, and vacuum and
+index builds work on partitions a fraction of the table's size. Postgres only enforces uniqueness together
+with the partition key, so the partitioned table is unique on (videoId, commentId) and the reply foreign
+key becomes (videoId, parentId); comment upserts pick the matching conflict target automatically.
+
+Rows are copied in id ranges while ingestion keeps running. Ids are assigned before commit, so a range can
+miss rows whose transaction committed after it was copied; catch-up passes therefore copy every row not yet
+present, once while ingestion continues and once more, with the table swap, under a lock that blocks writes,
+but not reads, for one anti-join over the table. Comments updated in place by an incremental sync during the
+copy keep their old values, so pause crawl workers for an exact copy.
+The original table is kept as comments_unpartitioned. Restart running API and worker processes afterwards,
+they cache the conflict target they detected at first use.
+
+    python -m app.models_module.partition_comments [--partitions 16]
+"""
+import argparse
+import logging
+import os
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from ..models_module import db_sessions
+from ..models_module import migrations
+
+logger = logging.getLogger(__name__)
+
+COMMENT_PARTITIONS = int(os.getenv("COMMENT_PARTITIONS", 16))
+PARTITION_COPY_BATCH = int(os.getenv("PARTITION_COPY_BATCH", 100000))
+
+
+def is_partitioned(connection: Connection) -> bool:
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('comments'))")).scalar()
+
+
+def _indexes() -> dict[str, str]:
+    return {**migrations.COMMENT_INDEXES, **migrations.SEARCH_INDEXES['comments']}
+
+
+def _copy_range(connection: Connection, after_id: int, up_to_id: int) -> int:
+    return connection.execute(text(
+        'INSERT INTO comments_partitioned SELECT * FROM comments WHERE id > :after_id AND id <= :up_to_id'),
+        {'after_id': after_id, 'up_to_id': up_to_id}).rowcount
+
+
+def _copy_missing(connection: Connection) -> int:
+    # Matches on the partitioned primary key, so each probe is an index lookup in one partition
+    return connection.execute(text(
+        'INSERT INTO comments_partitioned SELECT * FROM comments c WHERE NOT EXISTS ('
+        'SELECT 1 FROM comments_partitioned p WHERE p."videoId" = c."videoId" AND p.id = c.id)')).rowcount
+
+
+def partition_comments(partitions: int = COMMENT_PARTITIONS, batch_size: int = PARTITION_COPY_BATCH,
+                       engine: Engine = db_sessions.engine):
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if is_partitioned(connection):
+            logger.info('comments is already partitioned')
+            return
+
+        connection.execute(text('DROP TABLE IF EXISTS comments_partitioned'))
+        # INCLUDING DEFAULTS keeps id on comments_id_seq, so ids continue seamlessly after the swap
+        connection.execute(text('CREATE TABLE comments_partitioned (LIKE comments INCLUDING DEFAULTS) '
+                                'PARTITION BY HASH ("videoId")'))
+        for remainder in range(partitions):
+            connection.execute(text(
+                f'CREATE TABLE comments_p{remainder:03d} PARTITION OF comments_partitioned '
+                f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'))
+
+        # Bulk copy before any index exists; each range commits on its own
+        copied_up_to = 0
+        max_id = connection.execute(text('SELECT COALESCE(max(id), 0) FROM comments')).scalar()
+        while copied_up_to < max_id:
+            copied = _copy_range(connection, copied_up_to, copied_up_to + batch_size)
+            copied_up_to += batch_size
+            logger.info('Copied {copied} comments up to id {id}'.format(copied=copied, id=copied_up_to))
+
+        logger.info('Building constraints and indexes on comments_partitioned')
+        connection.execute(text('ALTER TABLE comments_partitioned ADD PRIMARY KEY ("videoId", id)'))
+        connection.execute(text('ALTER TABLE comments_partitioned ADD CONSTRAINT "comments_partitioned_commentId_key" '
+                                'UNIQUE ("videoId", "commentId")'))
+        connection.execute(text('ALTER TABLE comments_partitioned ADD FOREIGN KEY ("videoId") '
+                                'REFERENCES videos ("videoId")'))
+        connection.execute(text('ALTER TABLE comments_partitioned ADD FOREIGN KEY ("channelId") '
+                                'REFERENCES channels ("channelId")'))
+        # A reply lives in its parent's partition, so the self reference can include videoId
+        connection.execute(text('ALTER TABLE comments_partitioned ADD FOREIGN KEY ("videoId", "parentId") '
+                                'REFERENCES comments_partitioned ("videoId", "commentId")'))
+        for name, definition in _indexes().items():
+            connection.execute(text(f'CREATE INDEX "{name}_partitioned" '
+                                    f'{definition.format(table="comments_partitioned")}'))
+        # Rows copied so far carry their search vector; new ones get it from the trigger
+        migrations.create_search_trigger(connection, 'comments', on_table='comments_partitioned')
+
+        # Rows written during the copy, including late commits with ids inside already copied ranges; this
+        # leaves the locked pass below only what arrives meanwhile
+        logger.info('Caught up {count} comments before locking'.format(count=_copy_missing(connection)))
+
+    with engine.begin() as transaction:
+        # EXCLUSIVE blocks writers but not readers while the rows written since the copy are moved over
+        transaction.execute(text('LOCK TABLE comments IN EXCLUSIVE MODE'))
+        logger.info('Caught up {count} comments under lock'.format(count=_copy_missing(transaction)))
+        transaction.execute(text('ALTER TABLE comments RENAME TO comments_unpartitioned'))
+        transaction.execute(text('ALTER TABLE comments_partitioned RENAME TO comments'))
+        for name in _indexes():
+            transaction.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"'))
+            transaction.execute(text(f'ALTER INDEX "{name}_partitioned" RENAME TO "{name}"'))
+        # Otherwise dropping the old table would take the id sequence with it
+        transaction.execute(text('ALTER SEQUENCE comments_id_seq OWNED BY comments.id'))
+    logger.info('comments is now hash-partitioned by videoId into {partitions} partitions'.format(
+        partitions=partitions))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partitions', type=int, default=COMMENT_PARTITIONS)
+    parser.add_argument('--batch-size', type=int, default=PARTITION_COPY_BATCH)
+    args = parser.parse_args()
+    partition_comments(args.partitions, args.batch_size)
@@ -0,0 +1,122 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, cast, func, literal, or_, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+from ..models_module import migrations
+
+SEARCH_SCOPES = ('comments', 'videos', 'subtitles')
+SEARCH_ORDERS = ('relevance', 'newest')
+SEARCH_MAX_LIMIT = 100
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor was not produced by this search for the same order."""
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, order: str) -> tuple:
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if order == 'newest':
+            # Rows without publishedAt sort last and carry a null sort value
+            sort_value = None if sort_value is None else datetime.fromisoformat(sort_value)
+        return float(sort_value) if order == 'relevance' else sort_value, int(row_id)
+    except (ValueError, TypeError) as error:
+        raise InvalidCursorError(f'Invalid cursor: {cursor}') from error
+
+
+def _tsquery(query: str):
+    # Lexemes are stored for every configuration, so a query matches in either language
+    queries = [func.websearch_to_tsquery(cast(literal(config), REGCONFIG), query)
+               for config in migrations.SEARCH_CONFIGS]
+    combined = queries[0]
+    for other in queries[1:]:
+        combined = combined.op('||')(other)
+    return combined
+
+
+def _scope_columns(scope: str, tsquery, query: str):
+    """Returns (row id, match condition, rank, publishedAt, videoId, output columns) for a scope."""
+    video = db_architecture.Video
+    if scope == 'comments':
+        comment = db_architecture.Comment
+        return (comment.id, comment.searchVector.op('@@')(tsquery), func.ts_rank_cd(comment.searchVector, tsquery),
+                comment.publishedAt, comment.videoId,
+                [comment.commentId, comment.videoId, comment.authorDisplayName, comment.textOriginal,
+                 comment.likeCount, comment.parentId])
+    if scope == 'videos':
+        # Trigram similarity (`%`, served by the title trigram index) also catches misspelt titles
+        rank = func.ts_rank_cd(video.searchVector, tsquery) + func.similarity(video.title, query)
+        match = or_(video.searchVector.op('@@')(tsquery), video.title.op('%')(query))
+        return (video.id, match, rank, video.publishedAt, video.videoId,
+                [video.videoId, video.channelId, video.title, video.viewsCount])
+    subtitle = db_architecture.Subtitle
+    return (subtitle.id, subtitle.searchVector.op('@@')(tsquery), func.ts_rank_cd(subtitle.searchVector, tsquery),
+            video.publishedAt, subtitle.videoId, [subtitle.videoId, subtitle.text, subtitle.start, subtitle.duration])
+
+
+def search(query: str, scope: str = 'comments', channel_id: str | None = None, video_id: str | None = None,
+           published_after: datetime | None = None, published_before: datetime | None = None,
+           order: str = 'relevance', limit: int = 20, cursor: str | None = None) -> dict:
+    """
+    Ranked full-text search over comments, videos (title, tags, description) or transcripts.
+
+    Pages are keyset-paginated on (rank, id) or (publishedAt, id), rows without publishedAt last: pass back
+    ``next_cursor`` to get the next page. 'newest' walks the per-video and time indexes and stays fast however
+    many rows match; 'relevance' has to rank every match before the first page, so narrow broad queries with
+    filters.
+
+    Returns:
+        {'results': [...], 'next_cursor': str | None}
+    """
+    if scope not in SEARCH_SCOPES:
+        raise ValueError(f'Unknown scope {scope}, expected one of {SEARCH_SCOPES}')
+    if order not in SEARCH_ORDERS:
+        raise ValueError(f'Unknown order {order}, expected one of {SEARCH_ORDERS}')
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    tsquery = _tsquery(query)
+    row_id, match, rank, published_at, row_video_id, columns = _scope_columns(scope, tsquery, query)
+    video = db_architecture.Video
+    sort_value = rank if order == 'relevance' else published_at
+
+    with db_sessions.session_scope() as session:
+        statement = session.query(row_id.label('id'), sort_value.label('sort_value'),
+                                  published_at.label('publishedAt'), *columns).filter(match)
+        if scope != 'videos':
+            statement = statement.join(video, video.videoId == row_video_id)
+        if channel_id is not None:
+            statement = statement.filter(video.channelId == channel_id)
+        if video_id is not None:
+            statement = statement.filter(row_video_id == video_id)
+        if published_after is not None:
+            statement = statement.filter(published_at >= published_after)
+        if published_before is not None:
+            statement = statement.filter(published_at < published_before)
+        if cursor is not None:
+            cursor_value, cursor_id = decode_cursor(cursor, order)
+            if order == 'newest' and cursor_value is None:
+                statement = statement.filter(published_at.is_(None), row_id < cursor_id)
+            elif order == 'newest':
+                statement = statement.filter(or_(tuple_(published_at, row_id) < tuple_(cursor_value, cursor_id),
+                                                 published_at.is_(None)))
+            else:
+                statement = statement.filter(or_(rank < cursor_value, and_(rank == cursor_value, row_id < cursor_id)))
+        statement = statement.order_by(sort_value.desc().nulls_last(), row_id.desc()).limit(limit)
+        rows = [row._asdict() for row in statement]
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1]['sort_value'], rows[-1]['id'])
+    for row in rows:
+        row['rank' if order == 'relevance' else 'publishedAt'] = row.pop('sort_value')
+    return {'results': rows, 'next_cursor': next_cursor}
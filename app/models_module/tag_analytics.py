@@ -0,0 +1,168 @@
+"""
+Tag frequency, co-occurrence and per-category trends, pre-aggregated from the stored Video.tags arrays.
+
+The aggregate tables are maintained incrementally: `refresh` adds the videos not yet counted (tracked in
+tag_analytics_videos) to the running totals. It only looks at videos above its pipeline_watermarks entry,
+minus a lookback, so its cost depends on what was ingested since the last call, not on the size of the
+videos table. Readers only ever touch the small aggregate tables.
+"""
+import logging
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+logger = logging.getLogger(__name__)
+
+TAG_REFRESH_BATCH = int(os.getenv("TAG_REFRESH_BATCH", 10000))
+# Serialises refreshes across processes; a concurrent caller skips, the running refresh covers its videos
+TAG_REFRESH_LOCK_ID = 7_018_001
+WATERMARK_NAME = 'tag_analytics'
+# Ids are drawn at insert, not at commit: a slow transaction can commit videos below the watermark. Every
+# refresh re-checks this many ids under it and skips what is already counted.
+TAG_REFRESH_LOOKBACK = int(os.getenv("TAG_REFRESH_LOOKBACK", 10000))
+
+# Tags lower-cased and de-duplicated per video, for videos not counted yet
+_STAGE_BATCH = text('''
+    CREATE TEMP TABLE tag_batch ON COMMIT DROP AS
+    SELECT v.id, v."videoId", COALESCE(v."categoryId", '') AS "categoryId", v."publishedAt",
+           ARRAY(SELECT DISTINCT lower(btrim(tag)) FROM unnest(v.tags) AS tag WHERE btrim(tag) <> '') AS tags
+    FROM videos v
+    WHERE v.id > :after_id AND NOT EXISTS (SELECT 1 FROM tag_analytics_videos t WHERE t."videoId" = v."videoId")
+    ORDER BY v.id
+    LIMIT :batch_size
+''')
+
+_ADD_TAG_STATS = text('''
+    INSERT INTO tag_stats (tag, "videoCount", "lastPublishedAt")
+    SELECT tag, count(*), max(b."publishedAt") FROM tag_batch b, unnest(b.tags) AS tag GROUP BY tag
+    ON CONFLICT (tag) DO UPDATE SET
+        "videoCount" = tag_stats."videoCount" + excluded."videoCount",
+        "lastPublishedAt" = GREATEST(tag_stats."lastPublishedAt", excluded."lastPublishedAt")
+''')
+
+_ADD_TAG_PAIRS = text('''
+    INSERT INTO tag_pairs ("tagA", "tagB", "videoCount")
+    SELECT a, b, count(*) FROM tag_batch t, unnest(t.tags) AS a, unnest(t.tags) AS b WHERE a < b GROUP BY a, b
+    ON CONFLICT ("tagA", "tagB") DO UPDATE SET "videoCount" = tag_pairs."videoCount" + excluded."videoCount"
+''')
+
+_ADD_TAG_CATEGORY_DAILY = text('''
+    INSERT INTO tag_category_daily (tag, "categoryId", day, "videoCount")
+    SELECT tag, b."categoryId", b."publishedAt"::date, count(*) FROM tag_batch b, unnest(b.tags) AS tag
+    WHERE b."publishedAt" IS NOT NULL GROUP BY tag, b."categoryId", b."publishedAt"::date
+    ON CONFLICT (tag, "categoryId", day) DO UPDATE SET
+        "videoCount" = tag_category_daily."videoCount" + excluded."videoCount"
+''')
+
+_MARK_COUNTED = text('INSERT INTO tag_analytics_videos ("videoId") SELECT "videoId" FROM tag_batch')
+
+
+def get_watermark(session=None) -> int:
+    with db_sessions.session_scope(session) as session:
+        return session.query(db_architecture.PipelineWatermark.lastId).filter(
+            db_architecture.PipelineWatermark.name == WATERMARK_NAME).scalar() or 0
+
+
+def _save_watermark(session, last_id: int):
+    watermark = insert(db_architecture.PipelineWatermark).values(name=WATERMARK_NAME, lastId=last_id)
+    session.execute(watermark.on_conflict_do_update(index_elements=['name'], set_={
+        'lastId': func.greatest(db_architecture.PipelineWatermark.lastId, watermark.excluded.lastId),
+        'updatedAt': func.now()}))
+
+
+def refresh(batch_size: int = TAG_REFRESH_BATCH) -> int:
+    """
+    Adds every video that is not counted yet to the aggregates, one transaction per batch.
+
+    Returns:
+        Number of videos added; 0 also when another process is refreshing right now.
+    """
+    added = 0
+    after_id = max(get_watermark() - TAG_REFRESH_LOOKBACK, 0)
+    while True:
+        with db_sessions.session_scope() as session:
+            if not session.execute(text('SELECT pg_try_advisory_xact_lock(:lock_id)'),
+                                   {'lock_id': TAG_REFRESH_LOCK_ID}).scalar():
+                return added
+            session.execute(_STAGE_BATCH, {'after_id': after_id, 'batch_size': batch_size})
+            batch, last_id = session.execute(text('SELECT count(*), max(id) FROM tag_batch')).one()
+            if batch:
+                for statement in (_ADD_TAG_STATS, _ADD_TAG_PAIRS, _ADD_TAG_CATEGORY_DAILY, _MARK_COUNTED):
+                    session.execute(statement)
+                _save_watermark(session, last_id)
+                after_id = last_id
+        added += batch
+        if batch < batch_size:
+            if added:
+                logger.info('Tag aggregates refreshed with {count} videos'.format(count=added))
+            return added
+
+
+def rebuild(batch_size: int = TAG_REFRESH_BATCH) -> int:
+    """Recomputes the aggregates from scratch, e.g. after changing how tags are normalised."""
+    with db_sessions.session_scope() as session:
+        session.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': TAG_REFRESH_LOCK_ID})
+        session.execute(text('TRUNCATE tag_stats, tag_pairs, tag_category_daily, tag_analytics_videos'))
+        session.query(db_architecture.PipelineWatermark).filter(
+            db_architecture.PipelineWatermark.name == WATERMARK_NAME).delete()
+    return refresh(batch_size)
+
+
+def get_top_tags(limit: int = 20, min_videos: int = 1) -> list[dict]:
+    tag_stats = db_architecture.TagStats
+    with db_sessions.session_scope() as session:
+        rows = session.query(tag_stats.tag, tag_stats.videoCount, tag_stats.lastPublishedAt).filter(
+            tag_stats.videoCount >= min_videos).order_by(tag_stats.videoCount.desc()).limit(limit)
+        return [row._asdict() for row in rows]
+
+
+def get_co_occurring_tags(tag: str, limit: int = 20) -> list[dict]:
+    """
+    Tags most often seen together with ``tag``.
+
+    Returns:
+        Dicts with the other tag, the shared video count and the share of ``tag``'s videos that carry it.
+    """
+    tag = tag.lower().strip()
+    pair = db_architecture.TagPair
+    tag_stats = db_architecture.TagStats
+    with db_sessions.session_scope() as session:
+        total = session.query(tag_stats.videoCount).filter(tag_stats.tag == tag).scalar() or 0
+        other = func.coalesce(func.nullif(pair.tagA, tag), pair.tagB)
+        rows = session.query(other.label('tag'), pair.videoCount).filter(
+            or_(pair.tagA == tag, pair.tagB == tag)).order_by(pair.videoCount.desc()).limit(limit)
+        return [dict(row._asdict(), share=row.videoCount / total if total else 0.0) for row in rows]
+
+
+def get_category_trends(category_id: str | None = None, tags: list[str] | None = None, days: int = 90,
+                        limit: int = 10) -> list[dict]:
+    """
+    Daily video counts per tag over the last ``days`` days, for the given tags or else the window's top tags.
+
+    Args:
+        category_id: restrict to one video category; all categories are summed when None.
+    """
+    daily = db_architecture.TagCategoryDaily
+    since = date.today() - timedelta(days=days)
+    with db_sessions.session_scope() as session:
+        base = session.query(daily).filter(daily.day >= since)
+        if category_id is not None:
+            base = base.filter(daily.categoryId == category_id)
+        if tags is None:
+            tags = [tag for (tag,) in base.with_entities(daily.tag).group_by(daily.tag).order_by(
+                func.sum(daily.videoCount).desc()).limit(limit)]
+        else:
+            tags = [tag.lower().strip() for tag in tags]
+        rows = base.with_entities(daily.tag, daily.day, func.sum(daily.videoCount).label('videoCount')).filter(
+            daily.tag.in_(tags)).group_by(daily.tag, daily.day).order_by(daily.tag, daily.day)
+        return [row._asdict() for row in rows]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    refresh()
@@ -1,124 +1,472 @@
-from sqlalchemy import exists
+from datetime import datetime
+from functools import cache
+
+from sqlalchemy import BigInteger, bindparam, delete, func, literal, literal_column, or_, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
 
 from ..models_module import db_architecture
 from ..models_module import db_sessions
+from ..models_module import existence_cache
+from ..monitoring_module import metrics
+
+# Keeps a multi-row INSERT well below the 65535 bind parameters Postgres accepts per statement
+BULK_INSERT_CHUNK_SIZE = 1000
+
+
+def map_channel(channel_info: dict, channel_id: str) -> dict:
+    return dict(
+        channelId=channel_id,
+        title=channel_info.get('snippet', {}).get('title'),
+        description=channel_info.get('snippet', {}).get('description', None),
+        customUrl=channel_info.get('snippet', {}).get('customUrl', None),
+        publishedAt=channel_info.get('snippet', {}).get('publishedAt', None),
+        thumbnail=channel_info.get('snippet', {}).get('thumbnails', {}).get('default', {}).get('url', None),
+        localizedTitle=channel_info.get('snippet', {}).get('localized', {}).get('title', None),
+        localizedDescription=channel_info.get('snippet', {}).get('localized', {}).get('description', None),
+        country=channel_info.get('snippet', {}).get('country', None),
+        relatedPlaylistsLikes=channel_info.get('contentDetails', {}).get('relatedPlaylists', {}).get('likes', None),
+        relatedPlaylistsUploads=channel_info.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads', None),
+        viewCount=channel_info.get('statistics', {}).get('viewCount', None),
+        subscribersCount=channel_info.get('statistics', {}).get('subscriberCount', None),
+        hiddenSubscriberCount=channel_info.get('statistics', {}).get('hiddenSubscriberCount', None),
+        videoCount=channel_info.get('statistics', {}).get('videoCount', None),
+        topicCategories=channel_info.get('topicDetails', {}).get('topicCategories', None),
+        privacyStatus=channel_info.get('status', {}).get('privacyStatus', None),
+        isLinked=channel_info.get('status', {}).get('isLinked', None),
+        longUploadsStatus=channel_info.get('status', {}).get('longUploadsStatus', None),
+        madeForKids=channel_info.get('status', {}).get('madeForKids', None),
+        brandingSettingsChannelTitle=channel_info.get('brandingSettings', {}).get('channel', {}).get('title', None),
+        brandingSettingsChannelDescription=channel_info.get('brandingSettings', {}).get('channel', {}).get(
+            'description', None),
+        brandingSettingsChannelKeywords=channel_info.get('brandingSettings', {}).get('channel', {}).get(
+            'keywords', None),
+        brandingSettingsChannelUnsubscribedTrailer=channel_info.get('brandingSettings', {}).get('channel', {}).get(
+            'unsubscribedTrailer', None))
+
+
+@metrics.timed_write('channel')
+def save_channel_info(channel_info: dict, channel_id: str, session=None):
+    if not check_exists_channel_by_id(channel_id, session):
+        # ON CONFLICT covers rows written by other processes that this process' existence cache has not seen
+        with db_sessions.session_scope(session) as session:
+            session.execute(insert(db_architecture.Channel).values(
+                map_channel(channel_info, channel_id)).on_conflict_do_nothing(index_elements=['channelId']))
+            save_channel_stats([map_channel_stats(channel_info, channel_id)], session)
+        existence_cache.channels.add(channel_id)
+
+
+def map_video(video_info: dict, channel_id: str, video_id: str) -> dict:
+    # likesFromApi, dislikesFromApi and ratingFromApi are filled in later by dislike_enrichment
+    return dict(
+        channelId=channel_id,
+        videoId=video_id,
+        publishedAt=video_info.get('snippet', {}).get('publishedAt'),
+        title=video_info.get('snippet', {}).get('title'),
+        description=video_info.get('snippet', {}).get('description'),
+        thumbnail=video_info.get('snippet', {}).get('thumbnails', {}).get('default', {}).get('url', None),
+        channelTitle=video_info.get('snippet', {}).get('channelTitle', None),
+        tags=video_info.get('snippet', {}).get('tags', None),
+        liveBroadcastContent=video_info.get('snippet', {}).get('liveBroadcastContent', None),
+        defaultLanguage=video_info.get('snippet', {}).get('defaultLanguage', None),
+        defaultAudioLanguage=video_info.get('snippet', {}).get('defaultAudioLanguage', None),
+        categoryId=video_info.get('snippet', {}).get('categoryId', None),
+        duration=video_info.get('contentDetails', {}).get('duration', None),
+        dimension=video_info.get('contentDetails', {}).get('dimension', None),
+        definition=video_info.get('contentDetails', {}).get('definition', None),
+        caption=video_info.get('contentDetails', {}).get('caption', None),
+        licensedContent=video_info.get('contentDetails', {}).get('licensedContent', None),
+        uploadStatus=video_info.get('status', {}).get('uploadStatus', None),
+        privacyStatus=video_info.get('status', {}).get('privacyStatus', None),
+        license=video_info.get('status', {}).get('license', None),
+        embeddable=video_info.get('status', {}).get('embeddable', None),
+        publicStatsViewable=video_info.get('status', {}).get('publicStatsViewable', None),
+        madeForKids=video_info.get('status', {}).get('madeForKids', None),
+        viewsCount=video_info.get('statistics', {}).get('viewCount', None),
+        likesCount=video_info.get('statistics', {}).get('likeCount', None),
+        favoriteCount=video_info.get('statistics', {}).get('favoriteCount', None),
+        commentCount=video_info.get('statistics', {}).get('commentCount', None))
+
+
+@metrics.timed_write('video')
+def save_video_info(video_info: dict, channel_id: str, video_id: str, session=None):
+    """Stores a new video; a known one is left as is, but the statistics fetched with it are recorded."""
+    exists = check_exists_video_by_id(video_id, session)
+    with db_sessions.session_scope(session) as session:
+        if not exists:
+            session.execute(insert(db_architecture.Video).values(
+                map_video(video_info, channel_id, video_id)).on_conflict_do_nothing(
+                index_elements=['videoId']))
+        # A re-crawl's statistics are a point of the time series as much as a refresher poll
+        if 'statistics' in video_info:
+            save_video_stats([map_video_stats(video_info, video_id)], session)
+    if not exists:
+        existence_cache.videos.add(video_id)
+
+
+def map_comment(comment: dict, comment_id: str) -> dict:
+    return dict(
+        commentId=comment_id,
+        videoId=comment.get('videoId', None),
+        authorDisplayName=comment.get('authorDisplayName', None),
+        authorProfileImageUrl=comment.get('authorProfileImageUrl', None),
+        authorChannelUrl=comment.get('authorChannelUrl', None),
+        authorChannelId=comment.get('authorChannelId', {}).get('value', None),
+        textDisplay=comment.get('textDisplay', None),
+        textOriginal=comment.get('textOriginal', None),
+        parentId=comment.get('parentId', None),
+        canRate=comment.get('canRate', None),
+        viewerRating=comment.get('viewerRating', None),
+        likeCount=comment.get('likeCount', None),
+        publishedAt=comment.get('publishedAt', None),
+        updatedAt=comment.get('updatedAt', None))
+
+
+@cache
+def comment_conflict_columns() -> tuple[str, ...]:
+    """
+    Unique key that comment upserts conflict on. A hash-partitioned comments table (see partition_comments)
+    can only enforce uniqueness together with its partition key, videoId.
+    """
+    with db_sessions.session_scope() as session:
+        partitioned = session.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('comments'))")).scalar()
+    return ('videoId', 'commentId') if partitioned else ('commentId',)
+
+
+def save_comments(comment: dict, comment_id: str, session=None):
+    save_comments_bulk([(comment, comment_id)], session=session)
+
+
+@metrics.timed_write('comments', batch='comments')
+def save_comments_bulk(comments: list[tuple[dict, str]], update_existing: bool = False,
+                       session=None) -> tuple[int, int]:
+    """
+    Writes a page of comments with one INSERT ... ON CONFLICT (commentId) per chunk and a single commit.
+
+    Args:
+        comments: (snippet, commentId) pairs as returned by commentThreads/comments; parents must precede replies.
+        update_existing: refresh mutable fields of already stored comments instead of skipping them.
+        session: session of an enclosing unit of work; by default the page is committed in its own.
+
+    Returns:
+        (inserted, skipped) row counts; updated rows are counted as skipped.
+    """
+    rows = {}
+    for comment, comment_id in comments:
+        rows[comment_id] = map_comment(comment, comment_id)
+    if not update_existing:
+        # Re-crawls mostly see stored comments; dropping them here keeps the INSERT payload small
+        for comment_id in existence_cache.comments.filter_existing(list(rows), session):
+            del rows[comment_id]
+    if not rows:
+        return 0, len(comments)
+
+    inserted = 0
+    rows = list(rows.values())
+    with db_sessions.session_scope(session) as session:
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            stmt = insert(db_architecture.Comment).values(rows[start:start + BULK_INSERT_CHUNK_SIZE])
+            if update_existing:
+                comment_table = db_architecture.Comment
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=comment_conflict_columns(),
+                    set_={'textDisplay': stmt.excluded.textDisplay,
+                          'textOriginal': stmt.excluded.textOriginal,
+                          'likeCount': stmt.excluded.likeCount,
+                          'updatedAt': stmt.excluded.updatedAt},
+                    # Unchanged comments are left alone so re-syncs do not churn dead tuples
+                    where=or_(comment_table.likeCount.is_distinct_from(stmt.excluded.likeCount),
+                              comment_table.updatedAt.is_distinct_from(stmt.excluded.updatedAt),
+                              comment_table.textDisplay.is_distinct_from(stmt.excluded.textDisplay)))
+                # xmax is 0 only for freshly inserted tuples, which separates inserts from updates
+                stmt = stmt.returning(literal_column('(xmax = 0)'))
+                inserted += sum(1 for (is_insert,) in session.execute(stmt) if is_insert)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=comment_conflict_columns())
+                stmt = stmt.returning(db_architecture.Comment.commentId)
+                inserted += len(session.execute(stmt).all())
+    existence_cache.comments.add_many(row['commentId'] for row in rows)
+    metrics.comments_ingested.inc(inserted)
+    return inserted, len(comments) - inserted
+
+
+def count_stored_replies(parent_ids: list[str], video_id: str, session=None) -> dict[str, int]:
+    """Stored replies per thread; videoId lets a partitioned comments table prune to one partition."""
+    comment_table = db_architecture.Comment
+    with db_sessions.session_scope(session) as session:
+        return dict(session.query(comment_table.parentId, func.count(comment_table.id)).filter(
+            comment_table.videoId == video_id, comment_table.parentId.in_(parent_ids)).group_by(
+            comment_table.parentId).all())
+
+
+def get_comment_high_water_mark(video_id: str, session=None) -> datetime | None:
+    with db_sessions.session_scope(session) as session:
+        return session.query(db_architecture.CommentSyncState.highWaterMark).filter(
+            db_architecture.CommentSyncState.videoId == video_id).scalar()
+
+
+@metrics.timed_write('comment_high_water_mark')
+def save_comment_high_water_mark(video_id: str, high_water_mark: datetime | None, session=None):
+    stmt = insert(db_architecture.CommentSyncState).values(
+        videoId=video_id, highWaterMark=high_water_mark, lastSyncedAt=datetime.utcnow())
+    table = db_architecture.CommentSyncState.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['videoId'],
+        set_={'highWaterMark': func.greatest(table.c.highWaterMark, stmt.excluded.highWaterMark),
+              'lastSyncedAt': stmt.excluded.lastSyncedAt})
+    with db_sessions.session_scope(session) as session:
+        session.execute(stmt)
+
+
+def get_videos_needing_transcripts(video_ids: list[str] | None = None, retry_unavailable: bool = False,
+                                   limit: int | None = None, after: str | None = None, session=None) -> list[str]:
+    """
+    Stored videos whose transcript was never fetched or whose last fetch failed transiently.
+
+    Args:
+        video_ids: restrict to these videos; all stored videos when None.
+        retry_unavailable: also return videos previously found to have no transcript.
+        limit: maximum number of ids returned, in videoId order.
+        after: only ids sorting after this one, for keyset pagination.
+    """
+    video_table = db_architecture.Video
+    state_table = db_architecture.TranscriptState
+    retry_statuses = ['failed', 'unavailable'] if retry_unavailable else ['failed']
+    with db_sessions.session_scope(session) as session:
+        query = session.query(video_table.videoId).outerjoin(
+            state_table, state_table.videoId == video_table.videoId).filter(
+            or_(state_table.id.is_(None), state_table.status.in_(retry_statuses)))
+        if video_ids is not None:
+            query = query.filter(video_table.videoId.in_(video_ids))
+        if after is not None:
+            query = query.filter(video_table.videoId > after)
+        if limit is not None:
+            query = query.order_by(video_table.videoId).limit(limit)
+        return [video_id for (video_id,) in query]
+
+
+def count_subtitle_segments(video_ids: list[str], session=None) -> dict[str, int]:
+    subtitle_table = db_architecture.Subtitle
+    with db_sessions.session_scope(session) as session:
+        return dict(session.query(subtitle_table.videoId, func.count(subtitle_table.id)).filter(
+            subtitle_table.videoId.in_(video_ids)).group_by(subtitle_table.videoId).all())
+
+
+def delete_subtitles(video_ids: list[str], session=None):
+    if not video_ids:
+        return
+    with db_sessions.session_scope(session) as session:
+        session.execute(delete(db_architecture.Subtitle).where(db_architecture.Subtitle.videoId.in_(video_ids)))
+
+
+@metrics.timed_write('transcript_states', batch='states')
+def save_transcript_states(states: list[dict], session=None):
+    if not states:
+        return
+    stmt = insert(db_architecture.TranscriptState).values(states)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['videoId'],
+        set_={column: stmt.excluded[column]
+              for column in ('status', 'language', 'isGenerated', 'segmentCount', 'error', 'fetchedAt')})
+    with db_sessions.session_scope(session) as session:
+        session.execute(stmt)
+
+
+def map_video_stats(video_info: dict, video_id: str, captured_at: datetime | None = None) -> dict:
+    return dict(
+        videoId=video_id,
+        capturedAt=captured_at or datetime.utcnow(),
+        viewsCount=video_info.get('statistics', {}).get('viewCount', None),
+        likesCount=video_info.get('statistics', {}).get('likeCount', None),
+        commentCount=video_info.get('statistics', {}).get('commentCount', None))
+
+
+def map_channel_stats(channel_info: dict, channel_id: str, captured_at: datetime | None = None) -> dict:
+    return dict(
+        channelId=channel_id,
+        capturedAt=captured_at or datetime.utcnow(),
+        viewCount=channel_info.get('statistics', {}).get('viewCount', None),
+        subscribersCount=channel_info.get('statistics', {}).get('subscriberCount', None),
+        videoCount=channel_info.get('statistics', {}).get('videoCount', None))
+
+
+def _save_stats(snapshot_model, entity_model, key: str, columns: tuple[str, ...], snapshots: list[dict], session):
+    if not snapshots:
+        return
+    entity_table = entity_model.__table__
+    # The entity row keeps mirroring the latest values, so existing readers see fresh counters
+    refresh_latest = update(entity_table).where(entity_table.c[key] == bindparam('b_key')).values(
+        {column: bindparam(f'b_{column}') for column in columns})
+    with db_sessions.session_scope(session) as session:
+        for start in range(0, len(snapshots), BULK_INSERT_CHUNK_SIZE):
+            chunk = snapshots[start:start + BULK_INSERT_CHUNK_SIZE]
+            session.execute(insert(snapshot_model).values(chunk).on_conflict_do_nothing())
+        session.connection().execute(refresh_latest, [
+            dict({'b_key': snapshot[key]}, **{f'b_{column}': snapshot[column] for column in columns})
+            for snapshot in snapshots])
+
+
+@metrics.timed_write('video_stats', batch='snapshots')
+def save_video_stats(snapshots: list[dict], session=None):
+    _save_stats(db_architecture.VideoStatsSnapshot, db_architecture.Video, 'videoId',
+                ('viewsCount', 'likesCount', 'commentCount'), snapshots, session)
+
+
+@metrics.timed_write('channel_stats', batch='snapshots')
+def save_channel_stats(snapshots: list[dict], session=None):
+    _save_stats(db_architecture.ChannelStatsSnapshot, db_architecture.Channel, 'channelId',
+                ('viewCount', 'subscribersCount', 'videoCount'), snapshots, session)
+
+
+def seed_stats_refresh_state(session=None) -> int:
+    """Schedules an immediate refresh for every stored video and channel that has no refresh state yet."""
+    state_table = db_architecture.StatsRefreshState
+    seeded = 0
+    with db_sessions.session_scope(session) as session:
+        for kind, model, key in (('video', db_architecture.Video, 'videoId'),
+                                 ('channel', db_architecture.Channel, 'channelId')):
+            target = getattr(model, key)
+            missing = session.query(
+                literal(kind), target, model.publishedAt, literal(datetime.utcnow())).filter(
+                ~session.query(state_table).filter(
+                    state_table.kind == kind, state_table.targetId == target).exists())
+            stmt = insert(state_table).from_select(
+                ['kind', 'targetId', 'publishedAt', 'nextRefreshAt'], missing).on_conflict_do_nothing()
+            seeded += session.execute(stmt).rowcount
+    return seeded
+
+
+def get_due_stats_targets(kind: str, limit: int, session=None) -> list[tuple[str, datetime | None]]:
+    state_table = db_architecture.StatsRefreshState
+    with db_sessions.session_scope(session) as session:
+        return [tuple(row) for row in session.query(state_table.targetId, state_table.publishedAt).filter(
+            state_table.kind == kind, state_table.nextRefreshAt <= datetime.utcnow()).order_by(
+            state_table.nextRefreshAt).limit(limit)]
+
+
+@metrics.timed_write('stats_refresh_schedule', batch='schedule')
+def reschedule_stats_refresh(kind: str, schedule: dict[str, datetime], refreshed: bool = True, session=None):
+    """
+    Sets when every target in ``schedule`` is due next and, unless ``refreshed`` is False (a retry after a
+    failed call), records that it was just refreshed.
+    """
+    if not schedule:
+        return
+    state_table = db_architecture.StatsRefreshState.__table__
+    values = {'nextRefreshAt': bindparam('b_next')}
+    if refreshed:
+        values['lastRefreshedAt'] = datetime.utcnow()
+    stmt = update(state_table).where(
+        state_table.c.kind == kind, state_table.c.targetId == bindparam('b_target')).values(values)
+    with db_sessions.session_scope(session) as session:
+        session.connection().execute(stmt, [{'b_target': target, 'b_next': next_refresh}
+                                            for target, next_refresh in schedule.items()])
+
+
+def get_videos_needing_votes(limit: int, refreshed_before: datetime | None = None, session=None) -> list[str]:
+    """
+    Videos whose dislike counts were never fetched, then, when ``refreshed_before`` is given, those last
+    fetched before it, stalest first.
+    """
+    video_table = db_architecture.Video
+    due = video_table.votesFetchedAt.is_(None)
+    if refreshed_before is not None:
+        due = or_(due, video_table.votesFetchedAt < refreshed_before)
+    with db_sessions.session_scope(session) as session:
+        return [video_id for (video_id,) in session.query(video_table.videoId).filter(due).order_by(
+            video_table.votesFetchedAt.nulls_first()).limit(limit)]
+
+
+@metrics.timed_write('video_votes', batch='votes')
+def save_video_votes(votes: dict[str, dict | None], session=None):
+    """
+    Stores Return YouTube Dislike answers; a None answer (video unknown to the API) only marks the video
+    as fetched, so it is not asked about again before its next refresh.
+    """
+    if not votes:
+        return
+    video_table = db_architecture.Video.__table__
+    stmt = update(video_table).where(video_table.c.videoId == bindparam('b_video')).values(
+        likesFromApi=func.coalesce(bindparam('b_likes'), video_table.c.likesFromApi),
+        dislikesFromApi=func.coalesce(bindparam('b_dislikes'), video_table.c.dislikesFromApi),
+        ratingFromApi=func.coalesce(bindparam('b_rating'), video_table.c.ratingFromApi),
+        votesFetchedAt=datetime.utcnow())
+    with db_sessions.session_scope(session) as session:
+        session.connection().execute(stmt, [
+            {'b_video': video_id, 'b_likes': (info or {}).get('likes'), 'b_dislikes': (info or {}).get('dislikes'),
+             'b_rating': (info or {}).get('rating')} for video_id, info in votes.items()])
+
+
+def get_latest_video_stats(video_ids: list[str], session=None) -> dict[str, dict]:
+    snapshot = db_architecture.VideoStatsSnapshot
+    with db_sessions.session_scope(session) as session:
+        # DISTINCT ON walks the (videoId, capturedAt) primary key backwards, one index probe per video
+        rows = session.query(snapshot).filter(snapshot.videoId.in_(video_ids)).order_by(
+            snapshot.videoId, snapshot.capturedAt.desc()).distinct(snapshot.videoId).all()
+    return {row.videoId: dict(capturedAt=row.capturedAt, viewsCount=row.viewsCount, likesCount=row.likesCount,
+                              commentCount=row.commentCount) for row in rows}
+
+
+def get_video_stats_delta(start: datetime, end: datetime | None = None, video_ids: list[str] | None = None,
+                          channel_id: str | None = None, limit: int | None = None, session=None) -> list[dict]:
+    """
+    Growth of each video's counters between its first and last snapshot inside [start, end].
+
+    Without ``video_ids`` the time range alone restricts the scan, which the BRIN index on capturedAt serves.
+
+    Returns:
+        One dict per video with at least one snapshot in the window, largest view growth first.
+    """
+    snapshot = db_architecture.VideoStatsSnapshot
+    end = end or datetime.utcnow()
+
+    def first(column):
+        return func.array_agg(aggregate_order_by(column, snapshot.capturedAt.asc()), type_=ARRAY(BigInteger))[1]
+
+    def last(column):
+        return func.array_agg(aggregate_order_by(column, snapshot.capturedAt.desc()), type_=ARRAY(BigInteger))[1]
+
+    views_delta = (last(snapshot.viewsCount) - first(snapshot.viewsCount)).label('viewsDelta')
+    with db_sessions.session_scope(session) as session:
+        query = session.query(
+            snapshot.videoId,
+            func.min(snapshot.capturedAt).label('firstCapturedAt'),
+            func.max(snapshot.capturedAt).label('lastCapturedAt'),
+            last(snapshot.viewsCount).label('viewsCount'),
+            views_delta,
+            (last(snapshot.likesCount) - first(snapshot.likesCount)).label('likesDelta'),
+            (last(snapshot.commentCount) - first(snapshot.commentCount)).label('commentsDelta'),
+        ).filter(snapshot.capturedAt.between(start, end)).group_by(snapshot.videoId)
+        if video_ids is not None:
+            query = query.filter(snapshot.videoId.in_(video_ids))
+        if channel_id is not None:
+            query = query.join(db_architecture.Video, db_architecture.Video.videoId == snapshot.videoId).filter(
+                db_architecture.Video.channelId == channel_id)
+        query = query.order_by(views_delta.desc().nulls_last())
+        if limit is not None:
+            query = query.limit(limit)
+        return [row._asdict() for row in query]
+
+
+def get_uploads_playlist_id(channel_id: str, session=None) -> str | None:
+    with db_sessions.session_scope(session) as session:
+        return session.query(db_architecture.Channel.relatedPlaylistsUploads).filter(
+            db_architecture.Channel.channelId == channel_id).scalar()
+
+
+def filter_existing_video_ids(video_ids: list[str]) -> set[str]:
+    if not video_ids:
+        return set()
+    return existence_cache.videos.filter_existing(video_ids)
+
+
+def check_exists_video_by_id(video_id: str, session=None):
+    return existence_cache.videos.contains(video_id, session)
+
+
+def check_exists_channel_by_id(channel_id: str, session=None):
+    return existence_cache.channels.contains(channel_id, session)
 
 
-def save_channel_info(channel_info: dict, channel_id: str):
-    if not check_exists_channel_by_id(channel_id):
-        channel_imp = db_architecture.Channel(
-            channelId=channel_id,
-            title=channel_info.get('snippet', {}).get('title'),
-            description=channel_info.get('snippet', {}).get('description', None),
-            customUrl=channel_info.get('snippet', {}).get('customUrl', None),
-            publishedAt=channel_info.get('snippet', {}).get('publishedAt', None),
-            thumbnail=channel_info.get('snippet', {}).get('thumbnails', {}).get('default', {}).get('url', None),
-            localizedTitle=channel_info.get('snippet', {}).get('localized', {}).get('title', None),
-            localizedDescription=channel_info.get('snippet', {}).get('localized', {}).get('description', None),
-            country=channel_info.get('snippet', {}).get('country', None),
-            relatedPlaylistsLikes=channel_info.get('contentDetails', {}).get('relatedPlaylists', {}).get('likes', None),
-            relatedPlaylistsUploads=channel_info.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads',
-                                                                                                             None),
-            viewCount=channel_info.get('statistics', {}).get('viewCount', None),
-            subscribersCount=channel_info.get('statistics', {}).get('subscriberCount', None),
-            hiddenSubscriberCount=channel_info.get('statistics', {}).get('hiddenSubscriberCount', None),
-            videoCount=channel_info.get('statistics', {}).get('videoCount', None),
-            topicCategories=channel_info.get('topicDetails', {}).get('topicCategories', None),
-            privacyStatus=channel_info.get('status', {}).get('privacyStatus', None),
-            isLinked=channel_info.get('status', {}).get('isLinked', None),
-            longUploadsStatus=channel_info.get('status', {}).get('longUploadsStatus', None),
-            madeForKids=channel_info.get('status', {}).get('madeForKids', None),
-            brandingSettingsChannelTitle=channel_info.get('brandingSettings', {}).get('channel', {}).get('title', None),
-            brandingSettingsChannelDescription=channel_info.get('brandingSettings', {}).get('channel', {}).get(
-                'description', None),
-            brandingSettingsChannelKeywords=channel_info.get('brandingSettings', {}).get('channel', {}).get('keywords',
-                                                                                                               None),
-            brandingSettingsChannelUnsubscribedTrailer=channel_info.get('brandingSettings', {}).get('channel', {}).get(
-                'unsubscribedTrailer', None))
-        db_sessions.session.add(channel_imp)
-        db_sessions.session.commit()
-
-
-def save_video_info(video_info: dict, video_api_info: dict, channel_id: str, video_id: str):
-    if not check_exists_video_by_id(video_id):
-        video_imp = db_architecture.Video(
-            channelId=channel_id,
-            videoId=video_id,
-            publishedAt=video_info.get('snippet', {}).get('publishedAt'),
-            title=video_info.get('snippet', {}).get('title'),
-            description=video_info.get('snippet', {}).get('description'),
-            thumbnail=video_info.get('snippet', {}).get('thumbnails', {}).get('default', {}).get('url', None),
-            channelTitle=video_info.get('snippet', {}).get('channelTitle', None),
-            tags=video_info.get('snippet', {}).get('tags', None),
-            liveBroadcastContent=video_info.get('snippet', {}).get('liveBroadcastContent', None),
-            defaultLanguage=video_info.get('snippet', {}).get('defaultLanguage', None),
-            defaultAudioLanguage=video_info.get('snippet', {}).get('defaultAudioLanguage', None),
-            categoryId=video_info.get('snippet', {}).get('categoryId', None),
-            duration=video_info.get('contentDetails', {}).get('duration', None),
-            dimension=video_info.get('contentDetails', {}).get('dimension', None),
-            definition=video_info.get('contentDetails', {}).get('definition', None),
-            caption=video_info.get('contentDetails', {}).get('caption', None),
-            licensedContent=video_info.get('contentDetails', {}).get('licensedContent', None),
-            uploadStatus=video_info.get('status', {}).get('uploadStatus', None),
-            privacyStatus=video_info.get('status', {}).get('privacyStatus', None),
-            license=video_info.get('status', {}).get('license', None),
-            embeddable=video_info.get('status', {}).get('embeddable', None),
-            publicStatsViewable=video_info.get('status', {}).get('publicStatsViewable', None),
-            madeForKids=video_info.get('status', {}).get('madeForKids', None),
-            viewsCount=video_info.get('statistics', {}).get('viewCount', None),
-            likesCount=video_info.get('statistics', {}).get('likeCount', None),
-            likesFromApi=video_api_info.get('likes', None),
-            dislikesFromApi=video_api_info.get('dislikes', None),
-            ratingFromApi=video_api_info.get('rating', None),
-            favoriteCount=video_info.get('statistics', {}).get('favoriteCount', None),
-            commentCount=video_info.get('statistics', {}).get('commentCount', None))
-        db_sessions.session.add(video_imp)
-        db_sessions.session.commit()
-
-
-def save_comments(comment: dict, comment_id: str):
-    if not check_exists_comment_by_id(comment_id):
-        comment_imp = db_architecture.Comment(
-            commentId=comment_id,
-            videoId=comment.get('videoId', None),
-            authorDisplayName=comment.get('authorDisplayName', None),
-            authorProfileImageUrl=comment.get('authorProfileImageUrl', None),
-            authorChannelUrl=comment.get('authorChannelUrl', None),
-            authorChannelId=comment.get('authorChannelId', {}).get('value', None),
-            textDisplay=comment.get('textDisplay', None),
-            textOriginal=comment.get('textOriginal', None),
-            parentId=comment.get('parentId', None),
-            canRate=comment.get('canRate', None),
-            viewerRating=comment.get('viewerRating', None),
-            likeCount=comment.get('likeCount', None),
-            publishedAt=comment.get('publishedAt', None),
-            updatedAt=comment.get('updatedAt', None))
-        db_sessions.session.add(comment_imp)
-        db_sessions.session.commit()
-
-
-def check_exists_video_by_id(video_id: str):
-    exists_query = db_sessions.session.query(exists().where(db_architecture.Video.videoId == video_id)).scalar()
-
-    if exists_query:
-        return True
-    else:
-        return False
-
-
-def check_exists_channel_by_id(channel_id: str):
-    exists_query = db_sessions.session.query(exists().where(db_architecture.Channel.channelId == channel_id)).scalar()
-
-    if exists_query:
-        return True
-    else:
-        return False
-
-
-def check_exists_comment_by_id(comment_id: str):
-    exists_query = db_sessions.session.query(exists().where(db_architecture.Comment.commentId == comment_id)).scalar()
-
-    if exists_query:
-        return True
-    else:
-        return False
+def check_exists_comment_by_id(comment_id: str, session=None):
+    return existence_cache.comments.contains(comment_id, session)
@@ -0,0 +1,107 @@
+"""
+Prometheus metrics of the crawl pipeline.
+
+Collectors live in prometheus_client's default registry. The API serves them on /metrics; standalone
+processes (crawl_worker, stats_refresher, dislike_enrichment) serve their own on METRICS_PORT when it is set.
+Recording is an in-memory increment under a lock, cheap enough to leave on under production load; the crawl
+queue depth is only counted when the API is scraped.
+"""
+import functools
+import inspect
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+
+from ..models_module import job_queue
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# 0 leaves standalone processes without a metrics endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BATCH_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+youtube_api_latency = Histogram(
+    'youtube_api_request_seconds', 'YouTube Data API request latency by endpoint and HTTP status',
+    ['endpoint', 'status'], buckets=LATENCY_BUCKETS)
+youtube_quota_units = Counter('youtube_quota_units', 'YouTube Data API quota units consumed', ['endpoint'])
+youtube_quota_waiters = Gauge('youtube_quota_waiters', 'Calls queued in the quota scheduler for an API key')
+dislike_api_latency = Histogram(
+    'dislike_api_request_seconds', 'Return YouTube Dislike API request latency by HTTP status',
+    ['status'], buckets=LATENCY_BUCKETS)
+db_write_latency = Histogram('db_write_seconds', 'Duration of database writes', ['operation'],
+                             buckets=LATENCY_BUCKETS)
+db_write_batch_size = Histogram('db_write_batch_rows', 'Rows passed to a database write', ['operation'],
+                                buckets=BATCH_BUCKETS)
+comments_ingested = Counter('comments_ingested', 'New comment rows stored')
+
+
+def observe_request(histogram: Histogram, started: float, *labels):
+    """Records a request that began at ``started`` (time.perf_counter) under ``labels``."""
+    histogram.labels(*labels).observe(time.perf_counter() - started)
+
+
+def timed_write(operation: str, batch: str | None = None):
+    """
+    Decorator recording a write's duration under ``operation``. The length of the argument named ``batch``
+    is recorded as its batch size; without one the write counts as a single row.
+    """
+    latency = db_write_latency.labels(operation)
+    batch_size = db_write_batch_size.labels(operation)
+
+    def decorator(func):
+        position = list(inspect.signature(func).parameters).index(batch) if batch is not None else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latency.observe(time.perf_counter() - started)
+                if position is None:
+                    batch_size.observe(1)
+                else:
+                    batch_size.observe(len(kwargs[batch] if batch in kwargs else args[position]))
+        return wrapper
+    return decorator
+
+
+class CrawlQueueCollector:
+    """Reports pending and running crawl jobs at scrape time, so idle processes issue no queries."""
+
+    def _family(self) -> GaugeMetricFamily:
+        return GaugeMetricFamily('crawl_jobs', 'Crawl jobs waiting or in progress', labels=['status'])
+
+    def describe(self):
+        # Without it the registry calls collect() at registration to learn the metric names, querying the database
+        yield self._family()
+
+    def collect(self):
+        family = self._family()
+        try:
+            counts = job_queue.count_active_jobs()
+        except Exception:
+            logger.exception('Could not count crawl jobs')
+            return
+        for status, count in counts.items():
+            family.add_metric([status], count)
+        yield family
+
+
+def register_queue_depth():
+    """Adds the crawl queue gauge; only one process per deployment should, the API does."""
+    REGISTRY.register(CrawlQueueCollector())
+
+
+def serve(port: int = METRICS_PORT):
+    """Exposes this process' metrics over HTTP when ``port`` is set."""
+    if port:
+        start_http_server(port)
+        logger.info('Metrics served on :{port}/metrics'.format(port=port))
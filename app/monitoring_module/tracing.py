@@ -0,0 +1,45 @@
+"""
+Optional OpenTelemetry spans around the crawl stages.
+
+With TRACING_ENABLED set and opentelemetry-api installed, functions decorated with @span run inside a span;
+otherwise the decorator returns them untouched, so tracing costs nothing when it is off. Exporters are set up
+the standard OpenTelemetry way, e.g. by running under ``opentelemetry-instrument`` with OTEL_* variables.
+"""
+import functools
+import logging
+import os
+
+from dotenv import load_dotenv
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+if TRACING_ENABLED and trace is None:
+    logger.warning('TRACING_ENABLED is set but opentelemetry-api is not installed, spans are disabled')
+_tracer = trace.get_tracer('youtube_parser') if TRACING_ENABLED and trace is not None else None
+
+
+def span(name: str, attribute: str | None = None):
+    """
+    Decorator running the function inside a span called ``name``; ``attribute`` records the first argument,
+    e.g. the video id, under that span attribute.
+    """
+    def decorator(func):
+        if _tracer is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_as_current_span(name) as current:
+                if attribute is not None and args:
+                    current.set_attribute(attribute, str(args[0]))
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,203 @@
+"""
+Backfills likesFromApi, dislikesFromApi and ratingFromApi from the Return YouTube Dislike API.
+
+Videos are stored without waiting for this third party. This stage picks up videos whose counts were never
+fetched, or were fetched more than DISLIKE_REFRESH_DAYS ago, and asks for them under its own limits:
+at most DISLIKE_CONCURRENCY requests in flight, DISLIKE_REQUESTS_PER_SECOND on average, and retries with
+exponential backoff and jitter on timeouts, 429 and 5xx answers. Answers are kept in a TTL cache, so a video
+reached twice within DISLIKE_CACHE_TTL costs one request. Videos whose requests keep failing stay due and
+are retried on the next round.
+
+    python -m app.parsing_module.dislike_enrichment [--follow]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httpx
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from ..models_module import ingest_events
+from ..models_module import work_with_models
+from ..monitoring_module import metrics
+from ..parsing_module import quota_scheduler
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DISLIKE_API_URL = os.getenv("DISLIKE_API_URL", 'https://returnyoutubedislikeapi.com/votes')
+DISLIKE_CONCURRENCY = int(os.getenv("DISLIKE_CONCURRENCY", 4))
+DISLIKE_REQUESTS_PER_SECOND = float(os.getenv("DISLIKE_REQUESTS_PER_SECOND", 5))
+DISLIKE_MAX_RETRIES = int(os.getenv("DISLIKE_MAX_RETRIES", 4))
+DISLIKE_BACKOFF_SECONDS = float(os.getenv("DISLIKE_BACKOFF_SECONDS", 1))
+DISLIKE_MAX_BACKOFF_SECONDS = 60
+DISLIKE_CACHE_TTL = int(os.getenv("DISLIKE_CACHE_TTL", 6 * 3600))
+DISLIKE_CACHE_SIZE = 100_000
+# Counts older than this are fetched again; 0 only fills in videos that never had them
+DISLIKE_REFRESH_DAYS = float(os.getenv("DISLIKE_REFRESH_DAYS", 30))
+DISLIKE_BATCH = int(os.getenv("DISLIKE_BATCH", 500))
+DISLIKE_POLL_INTERVAL = float(os.getenv("DISLIKE_POLL_INTERVAL", 60))
+HTTP_TIMEOUT = 15
+
+_cache = TTLCache(maxsize=DISLIKE_CACHE_SIZE, ttl=DISLIKE_CACHE_TTL)
+_MISSING = object()
+
+
+class DislikeApiError(Exception):
+    """The API kept failing for a video after every retry."""
+
+
+class RateLimiter:
+    """Serialises callers on a quota_scheduler.TokenBucket, sleeping until a request may be sent."""
+
+    def __init__(self, requests_per_second: float):
+        self._bucket = quota_scheduler.TokenBucket(requests_per_second, max(requests_per_second, 1))
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._bucket.wait_time(1)
+            if delay:
+                await asyncio.sleep(delay)
+            self._bucket.take(1)
+
+
+def _backoff(attempt: int, retry_after: str | None) -> float:
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), DISLIKE_MAX_BACKOFF_SECONDS)
+    return min(DISLIKE_BACKOFF_SECONDS * 2 ** attempt, DISLIKE_MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.5)
+
+
+class DislikeFetcher:
+    """
+    Fetches votes for many videos concurrently within this stage's limits.
+
+    Attributes:
+        stats (Counter): 'requests', 'retries', 'cache_hits' and 'failed' so far.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int = DISLIKE_CONCURRENCY,
+                 requests_per_second: float = DISLIKE_REQUESTS_PER_SECOND):
+        self.client = client
+        self.stats = Counter()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(requests_per_second)
+
+    async def fetch(self, video_id: str) -> dict | None:
+        """
+        Returns:
+            The API's answer, or None when the API does not know the video.
+
+        Raises:
+            DislikeApiError: every attempt failed with a timeout, 429 or a server error.
+        """
+        cached = _cache.get(video_id, _MISSING)
+        if cached is not _MISSING:
+            self.stats['cache_hits'] += 1
+            return cached
+        for attempt in range(DISLIKE_MAX_RETRIES + 1):
+            if attempt:
+                self.stats['retries'] += 1
+            retry_after = None
+            async with self._semaphore:
+                await self._limiter.wait()
+                self.stats['requests'] += 1
+                started = time.perf_counter()
+                try:
+                    response = await self.client.get(DISLIKE_API_URL, params={'videoId': video_id})
+                except httpx.HTTPError as error:
+                    logger.info('Dislike API request for {video_id} failed: {error!r}'.format(
+                        video_id=video_id, error=error))
+                    response = None
+                metrics.observe_request(metrics.dislike_api_latency, started,
+                                        'error' if response is None else response.status_code)
+            if response is not None:
+                if response.status_code == 200:
+                    _cache[video_id] = response.json()
+                    return _cache[video_id]
+                if response.status_code != 429 and response.status_code < 500:
+                    # 400 for malformed ids, 404 for videos the API has never seen: asking again will not help
+                    _cache[video_id] = None
+                    return None
+                retry_after = response.headers.get('Retry-After')
+            if attempt < DISLIKE_MAX_RETRIES:
+                await asyncio.sleep(_backoff(attempt, retry_after))
+        self.stats['failed'] += 1
+        raise DislikeApiError(video_id)
+
+    async def fetch_many(self, video_ids: list[str]) -> dict[str, dict | None]:
+        """Answers for every video that did not fail; failed ones are logged and left out."""
+        results = await asyncio.gather(*(self.fetch(video_id) for video_id in video_ids), return_exceptions=True)
+        votes = {}
+        for video_id, result in zip(video_ids, results):
+            if isinstance(result, Exception):
+                logger.warning('No dislike counts for {video_id}: {error!r}'.format(video_id=video_id, error=result))
+            else:
+                votes[video_id] = result
+        return votes
+
+
+def create_client(concurrency: int = DISLIKE_CONCURRENCY) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        headers={"Accept": "application/json"},
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency))
+
+
+async def enrich_due(batch_size: int = DISLIKE_BATCH, concurrency: int = DISLIKE_CONCURRENCY) -> dict:
+    """
+    Fetches and stores votes for every due video, batch by batch.
+
+    Returns:
+        Number of videos updated and the fetcher's counters.
+    """
+    refreshed_before = None
+    if DISLIKE_REFRESH_DAYS > 0:
+        refreshed_before = datetime.utcnow() - timedelta(days=DISLIKE_REFRESH_DAYS)
+    updated = 0
+    async with create_client(concurrency) as client:
+        fetcher = DislikeFetcher(client, concurrency)
+        while True:
+            video_ids = await asyncio.to_thread(work_with_models.get_videos_needing_votes, batch_size,
+                                                refreshed_before)
+            if not video_ids:
+                break
+            votes = await fetcher.fetch_many(video_ids)
+            await asyncio.to_thread(work_with_models.save_video_votes, votes)
+            updated += len(votes)
+            # Failed videos stay due; when a whole batch fails the API is down and the next round retries
+            if len(video_ids) < batch_size or not votes:
+                break
+    return {'updated': updated, **fetcher.stats}
+
+
+def run_dislike_enrichment(stop_event: threading.Event | None = None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            result = asyncio.run(enrich_due())
+            if result['updated']:
+                logger.info('Dislike counts backfilled: {result}'.format(result=result))
+                ingest_events.notify('votes')
+        except Exception:
+            logger.exception('Dislike enrichment failed')
+        stop_event.wait(DISLIKE_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--follow', action='store_true', help='keep backfilling newly stored videos')
+    args = parser.parse_args()
+    if args.follow:
+        metrics.serve()
+        run_dislike_enrichment()
+    else:
+        logger.info('Dislike enrichment: {result}'.format(result=asyncio.run(enrich_due())))
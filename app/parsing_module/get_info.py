@@ -1,96 +1,250 @@
-import requests
 import os
 import logging
-from googleapiclient.discovery import build
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi
 from ..models_module import work_with_models
+from ..monitoring_module import tracing
+from ..parsing_module import quota_scheduler
+from ..parsing_module import transcripts
+from ..parsing_module import youtube_client
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 API_KEY = os.getenv("API_KEY")
-YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/'
-youtube = build('youtube', 'v3', developerKey=API_KEY)
+YOUTUBE_API_URL = youtube_client.YOUTUBE_API_URL
 
+# videos.list accepts up to 50 comma-separated ids for the same 1-unit cost
+VIDEOS_PER_REQUEST = 50
+VIDEO_PARTS = 'snippet,contentDetails,status,statistics,paidProductPlacementDetails'
+REPLY_WORKERS = int(os.getenv("REPLY_WORKERS", 8))
 
-def get_video_details(video_id: str):
+
+def chunked(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fetch_videos_details(video_ids: Iterable[str], part: str = VIDEO_PARTS,
+                         skip_failed: bool = False) -> dict[str, dict | None]:
+    """
+    Looks videos up with one videos.list call per VIDEOS_PER_REQUEST ids.
+
+    Returns:
+        Mapping of every requested id to its resource, or None when the video is missing, private or
+        its chunk failed. With ``skip_failed`` the ids of failed chunks are left out instead, so callers can
+        tell an unanswered video from a deleted one.
+    """
     url = f'{YOUTUBE_API_URL}videos'
-    params = {
-        'part': 'snippet,contentDetails,status,statistics,paidProductPlacementDetails',
-        'id': video_id,
-        'key': API_KEY
-    }
+    videos = {}
+    for chunk in chunked(video_ids, VIDEOS_PER_REQUEST):
+        params = {
+            'part': part,
+            'id': ','.join(chunk)
+        }
+        response = quota_scheduler.get('videos.list', url, params)
+        found = {}
+        if response.status_code == 200:
+            found = {item['id']: item for item in response.json().get('items', [])}
+        else:
+            print(f'Error: {response.status_code}')
+            if skip_failed:
+                continue
+        for video_id in chunk:
+            videos[video_id] = found.get(video_id)
+            if video_id not in found:
+                logger.info('Video {video_id} is unavailable'.format(video_id=video_id))
+    return videos
+
 
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        video_info = response.json()['items'][0]
+@tracing.span('get_videos_details')
+def get_videos_details(video_ids: Iterable[str]) -> list[str]:
+    saved = []
+    for video_id, video_info in fetch_videos_details(video_ids).items():
+        if video_info is None:
+            continue
         channel_id = video_info['snippet']['channelId']
         if not work_with_models.check_exists_channel_by_id(channel_id):
             get_channel_info(channel_id)
+        # Dislike counts and rating are backfilled by dislike_enrichment, a slow third party must not drop videos
+        work_with_models.save_video_info(video_info, channel_id, video_id)
+        saved.append(video_id)
+    return saved
 
-        urlApi = 'https://returnyoutubedislikeapi.com/votes'
-        params = {
-            'videoId': video_id,
-        }
-        response2 = requests.get(urlApi, params=params, headers={
-             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
-             "Pragma": "no-cache", "Cache-Control": "no-cache",
-             "Connection": "keep-alive"})
 
-        if response2.status_code == 200:
-            videoApi = response2.json()
-            work_with_models.save_video_info(video_info, videoApi, channel_id, video_id)
-    else:
-        print(f'Error: {response.status_code}')
+@tracing.span('get_video_details', attribute='video_id')
+def get_video_details(video_id: str):
+    get_videos_details([video_id])
 
 
-def get_channel_info(channel_id):
-    request = youtube.channels().list(
+def fetch_channel_details(channel_id: str) -> dict:
+    # auditDetails - doesn't have permission;
+    # defaultLanguage, selfDeclaredMadeForKids, trackingAnalyticsAccountId, contentOwner, timeLinked - None
+    response = youtube_client.call(
+        'channels.list',
         part='snippet,contentDetails,statistics,topicDetails,status,brandingSettings,contentOwnerDetails,localizations',
         id=channel_id)
+    return response['items'][0]
 
-    # auditDetails - doesn't have permission;
-    # defaultLanguage, selfDeclaredMadeForKids, trackingAnalyticsAccountId, contentOwner, timeLinked - None
 
-    response = request.execute()
-    channel_info = response['items'][0]
+def fetch_channels_statistics(channel_ids: Iterable[str]) -> dict[str, dict]:
+    """Looks up channel statistics with one channels.list call per 50 ids; missing channels are omitted."""
+    url = f'{YOUTUBE_API_URL}channels'
+    channels = {}
+    for chunk in chunked(channel_ids, VIDEOS_PER_REQUEST):
+        response = quota_scheduler.get('channels.list', url, {'part': 'statistics', 'id': ','.join(chunk)})
+        if response.status_code == 200:
+            channels.update({item['id']: item for item in response.json().get('items', [])})
+        else:
+            logger.warning('channels.list failed with {status}'.format(status=response.status_code))
+    return channels
+
+
+@tracing.span('get_channel_info', attribute='channel_id')
+def get_channel_info(channel_id):
+    channel_info = fetch_channel_details(channel_id)
     work_with_models.save_channel_info(channel_info, channel_id)
 
 
-def fetch_comments(video_id: str):
+def map_comment_page(response: dict) -> list[tuple[dict, str]]:
+    comments = []
+    for item in response['items']:
+        comments.append((item['snippet']['topLevelComment']['snippet'], item['snippet']['topLevelComment']['id']))
+        if 'replies' in item:
+            for reply in item['replies']['comments']:
+                comments.append((reply['snippet'], reply['id']))
+    return comments
+
+
+def parse_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def latest_thread_timestamp(response: dict) -> datetime | None:
+    timestamps = []
+    for item in response['items']:
+        snippet = item['snippet']['topLevelComment']['snippet']
+        timestamps += [parse_timestamp(snippet.get('publishedAt')), parse_timestamp(snippet.get('updatedAt'))]
+    return max(filter(None, timestamps), default=None)
+
+
+def iter_comment_pages(video_id: str, order: str | None = None, page_token: str | None = None):
+    while True:
+        response = youtube_client.call(
+            'commentThreads.list',
+            part='snippet,replies',
+            videoId=video_id,
+            textFormat='plainText',
+            maxResults=100,
+            order=order,
+            pageToken=page_token
+        )
+        yield response
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def incomplete_threads(response: dict, stored_replies: dict[str, int] | None = None) -> list[str]:
+    """
+    Ids of threads whose inline replies, capped by the API at about 5, miss some of snippet.totalReplyCount.
+
+    Threads whose ``stored_replies`` already reach that count are left out, so re-syncs do not page through
+    replies they have.
+    """
+    stored_replies = stored_replies or {}
+    threads = []
+    for item in response['items']:
+        received = len(item.get('replies', {}).get('comments', []))
+        if item['snippet'].get('totalReplyCount', 0) > max(received, stored_replies.get(item['id'], 0)):
+            threads.append(item['id'])
+    return threads
+
+
+def fetch_replies(parent_id: str, video_id: str) -> list[tuple[dict, str]]:
+    url = f'{YOUTUBE_API_URL}comments'
+    params = {
+        'part': 'snippet',
+        'parentId': parent_id,
+        'textFormat': 'plainText',
+        'maxResults': 100
+    }
+    replies = []
+    while True:
+        response = quota_scheduler.get('comments.list', url, params)
+        if response.status_code != 200:
+            print(f'Error: {response.status_code}')
+            break
+        data = response.json()
+        for reply in data.get('items', []):
+            reply['snippet'].setdefault('videoId', video_id)
+            replies.append((reply['snippet'], reply['id']))
+        if 'nextPageToken' not in data:
+            break
+        params['pageToken'] = data['nextPageToken']
+    return replies
+
+
+def expand_replies(response: dict, video_id: str, max_workers: int = REPLY_WORKERS) -> list[tuple[dict, str]]:
+    threads = incomplete_threads(response)
+    if threads:
+        threads = incomplete_threads(response, work_with_models.count_stored_replies(threads, video_id))
+    if not threads:
+        return []
+    # Worker threads do not inherit context variables, so the caller's quota priority and usage are passed on
+    fetch_thread = quota_scheduler.propagate(lambda thread_id: fetch_replies(thread_id, video_id))
+    replies = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(threads))) as executor:
+        for thread_replies in executor.map(fetch_thread, threads):
+            replies += thread_replies
+    return replies
+
+
+@tracing.span('fetch_comments', attribute='video_id')
+def fetch_comments(video_id: str, incremental: bool = False, page_token: str | None = None, on_page=None):
+    """
+    Stores the video's comment threads and advances its high-water mark.
+
+    In incremental mode threads are requested newest first, stored comments get their likeCount,
+    textDisplay and updatedAt refreshed, and paging stops after the first page that is entirely
+    older than the mark recorded by the previous sync.
+
+    Paging starts at ``page_token`` when given. ``on_page(next_page_token, inserted)`` is called once
+    each page is committed, which lets crawl jobs checkpoint their position.
+    """
     counter = 0
-    response = youtube.commentThreads().list(
-        part='snippet, replies',
-        videoId=video_id,
-        textFormat='plainText',
-        maxResults=100
-    ).execute()
-    while response:
-        for item in response['items']:
-            comment_id = item['snippet']['topLevelComment']['id']
-            comment = item['snippet']['topLevelComment']['snippet']
-            work_with_models.save_comments(comment, comment_id)
-            counter += 1
-            if 'replies' in item:
-                for reply in item['replies']['comments']:
-                    reply_comment_id = reply['id']
-                    reply_comment = reply['snippet']
-                    work_with_models.save_comments(reply_comment, reply_comment_id)
-                    counter += 1
-        logger.info(' Parsing successfully {counter} comments for video_id - {video_id}'.format(
-            counter=counter, video_id=video_id))
-        if 'nextPageToken' in response:
-            response = youtube.commentThreads().list(
-                part='snippet',
-                videoId=video_id,
-                textFormat='plainText',
-                maxResults=100,
-                pageToken=response['nextPageToken']
-            ).execute()
-        else:
+    inserted_total = 0
+    high_water_mark = work_with_models.get_comment_high_water_mark(video_id) if incremental else None
+    latest = None
+    for response in iter_comment_pages(video_id, order='time' if incremental else None, page_token=page_token):
+        comments = map_comment_page(response) + expand_replies(response, video_id)
+        inserted, skipped = work_with_models.save_comments_bulk(comments, update_existing=incremental)
+        counter += len(comments)
+        inserted_total += inserted
+        logger.info(' Parsing successfully {counter} comments ({inserted} new) for video_id - {video_id}'.format(
+            counter=counter, inserted=inserted_total, video_id=video_id))
+
+        if on_page is not None:
+            on_page(response.get('nextPageToken'), inserted)
+
+        page_latest = latest_thread_timestamp(response)
+        latest = max(filter(None, [latest, page_latest]), default=None)
+        if high_water_mark is not None and page_latest is not None and page_latest <= high_water_mark:
             break
+    work_with_models.save_comment_high_water_mark(video_id, latest)
+    return inserted_total
 
 
 def get_transcript(video_id: str) -> list[dict]:
-    transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=transcripts.TRANSCRIPT_LANGUAGES)
     return transcript
@@ -1,13 +1,14 @@
-import requests
 import os
 import logging
 from dotenv import load_dotenv
 from ai_analyzer.app.parsing_module import get_info
+from ai_analyzer.app.parsing_module import quota_scheduler
+from ai_analyzer.app.parsing_module import youtube_client
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
-YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/'
+YOUTUBE_API_URL = youtube_client.YOUTUBE_API_URL
 logger = logging.getLogger(__name__)
 
 
@@ -18,11 +19,10 @@ def search_last_videos_by_category(category_id: int, max_results: int) -> dict |
         'type': 'video',
         'videoCategoryId': str(category_id),
         'maxResults': max_results,
-        'order': 'date',
-        'key': API_KEY
+        'order': 'date'
     }
 
-    response = requests.get(url, params=params)
+    response = quota_scheduler.get('search.list', url, params)
     if response.status_code == 200:
         return response.json()
     else:
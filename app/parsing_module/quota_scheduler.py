@@ -0,0 +1,425 @@
+import contextvars
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import requests
+from dotenv import load_dotenv
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+from ..monitoring_module import metrics
+from ..parsing_module import response_cache
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+API_KEYS = [key.strip() for key in (os.getenv("API_KEYS") or os.getenv("API_KEY") or "").split(",") if key.strip()]
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000))
+REQUESTS_PER_SECOND = float(os.getenv("YOUTUBE_REQUESTS_PER_SECOND", 10))
+# Daily units a process reserves from api_key_usage at a time; a process that exits forfeits what is left
+QUOTA_RESERVE_UNITS = int(os.getenv("QUOTA_RESERVE_UNITS", 100))
+# Longest a call waits for a key before QuotaWaitTimeout; None waits for as long as it takes
+QUOTA_WAIT_TIMEOUT = float(os.getenv("QUOTA_WAIT_TIMEOUT", 300)) or None
+
+# Quota units charged per call, see https://developers.google.com/youtube/v3/determine_quota_cost
+ENDPOINT_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'commentThreads.list': 1,
+    'comments.list': 1,
+}
+
+# Daily quotas reset at midnight Pacific time
+QUOTA_RESET_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class QuotaWaitTimeout(Exception):
+    """
+    No API key could serve a call within the wait timeout, typically because every key's daily quota is spent.
+
+    Attributes:
+        endpoint (str): API method that was waiting.
+        wait (float | None): Seconds until a key would have been free, None when the call was still queued
+            behind others.
+    """
+
+    def __init__(self, endpoint: str, wait: float | None):
+        detail = f'next key free in {wait:.0f}s' if wait is not None else 'still queued behind other calls'
+        super().__init__(f'No API key for {endpoint} within the wait timeout, {detail}')
+        self.endpoint = endpoint
+        self.wait = wait
+
+
+_priority = contextvars.ContextVar('quota_priority', default=PRIORITY_BACKGROUND)
+_usage = contextvars.ContextVar('quota_usage', default=None)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def priority(value: int):
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaUsage:
+    """Quota units charged to one unit of work, e.g. a crawl job, across all the threads it uses."""
+
+    def __init__(self):
+        self.units = 0
+        self._reported = 0
+        self._lock = threading.Lock()
+
+    def add(self, units: int):
+        with self._lock:
+            self.units += units
+
+    def take_unreported(self) -> int:
+        with self._lock:
+            delta = self.units - self._reported
+            self._reported = self.units
+            return delta
+
+
+@contextmanager
+def track_usage():
+    usage = QuotaUsage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def propagate(func):
+    """Wraps ``func`` so that it runs with the caller's priority and usage tracker in a worker thread."""
+    caller_priority = _priority.get()
+    caller_usage = _usage.get()
+
+    def wrapper(*args, **kwargs):
+        priority_token = _priority.set(caller_priority)
+        usage_token = _usage.set(caller_usage)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _usage.reset(usage_token)
+            _priority.reset(priority_token)
+    return wrapper
+
+
+class TokenBucket:
+    """
+    Classic token bucket; not thread-safe on its own, the scheduler serialises access.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of stored tokens.
+        tokens (float): Tokens currently available.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, tokens: float) -> float:
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def take(self, tokens: float):
+        self._refill()
+        self.tokens -= tokens
+
+    def drain(self):
+        self._refill()
+        self.tokens = 0
+
+
+def next_quota_reset(now: datetime | None = None) -> datetime:
+    now = now or datetime.now(QUOTA_RESET_TIMEZONE)
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=QUOTA_RESET_TIMEZONE)
+
+
+def key_id(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def reserve_units(key: str, day: date, units: int, quota: int) -> int:
+    """Reserves up to ``units`` of the key's quota for ``day`` in api_key_usage; returns the units granted."""
+    usage = db_architecture.ApiKeyUsage
+    row = (usage.keyId == key_id(key)) & (usage.quotaDay == day)
+    with db_sessions.session_scope() as session:
+        session.execute(insert(usage).values(keyId=key_id(key), quotaDay=day, unitsReserved=0)
+                        .on_conflict_do_nothing(index_elements=['keyId', 'quotaDay']))
+        # The row lock serialises every process reserving from this key
+        reserved = session.execute(select(usage.unitsReserved).where(row).with_for_update()).scalar_one()
+        granted = max(min(units, quota - reserved), 0)
+        if granted:
+            session.execute(update(usage).where(row).values(unitsReserved=reserved + granted, updatedAt=func.now()))
+    return granted
+
+
+def exhaust_units(key: str, day: date, quota: int):
+    """Marks the key's quota for ``day`` as fully reserved, so no process reserves from it until the reset."""
+    statement = insert(db_architecture.ApiKeyUsage).values(keyId=key_id(key), quotaDay=day, unitsReserved=quota)
+    with db_sessions.session_scope() as session:
+        session.execute(statement.on_conflict_do_update(index_elements=['keyId', 'quotaDay'], set_={
+            'unitsReserved': statement.excluded.unitsReserved, 'updatedAt': func.now()}))
+
+
+class DailyQuota:
+    """
+    A key's daily quota units, shared by every process and host using the key.
+
+    Units are reserved from the key's api_key_usage row for the Pacific day, QUOTA_RESERVE_UNITS at a time, and
+    spent locally, so the database sees one reservation per block rather than one write per call. Restarts and
+    extra workers draw on the same daily total; a process that exits forfeits the rest of its block, which errs
+    on the safe side. Nothing comes back during the day: the full quota returns at the next midnight Pacific,
+    which is also when a key that YouTube reported as exhausted may be used again.
+
+    Attributes:
+        key (str): The API key.
+        quota (int): Units granted per day across all processes.
+        tokens (int): Units reserved by this process and not spent yet.
+        exhausted (bool): The day's quota is fully reserved; only ``tokens`` are left until the reset.
+        resets_at (datetime): Next reset, timezone-aware.
+    """
+
+    def __init__(self, key: str, quota: int, reserve_units: int = QUOTA_RESERVE_UNITS):
+        self.key = key
+        self.quota = quota
+        self.reserve_units = reserve_units
+        self.tokens = 0
+        self.exhausted = False
+        self.resets_at = next_quota_reset()
+
+    @property
+    def quota_day(self) -> date:
+        return (self.resets_at - timedelta(days=1)).date()
+
+    def _reset_if_due(self):
+        now = datetime.now(QUOTA_RESET_TIMEZONE)
+        if now >= self.resets_at:
+            # Units reserved yesterday were counted against yesterday's row
+            self.tokens = 0
+            self.exhausted = False
+            self.resets_at = next_quota_reset(now)
+
+    def wait_time(self, tokens: float) -> float:
+        self._reset_if_due()
+        if self.tokens < tokens and not self.exhausted:
+            self.tokens += reserve_units(self.key, self.quota_day, max(self.reserve_units, tokens - self.tokens),
+                                         self.quota)
+            self.exhausted = self.tokens < tokens
+        if self.tokens >= tokens:
+            return 0.0
+        # Same-zone datetime subtraction ignores DST shifts, epoch seconds do not
+        return self.resets_at.timestamp() - time.time()
+
+    def take(self, tokens: float):
+        self._reset_if_due()
+        self.tokens -= tokens
+
+    def drain(self):
+        self._reset_if_due()
+        self.tokens = 0
+        self.exhausted = True
+        exhaust_units(self.key, self.quota_day, self.quota)
+
+
+class ApiKeyState:
+    def __init__(self, key: str, daily_quota: int, requests_per_second: float):
+        self.key = key
+        self.daily = DailyQuota(key, daily_quota)
+        self.per_second = TokenBucket(requests_per_second, max(requests_per_second, 1))
+
+    def wait_time(self, cost: int) -> float:
+        return max(self.daily.wait_time(cost), self.per_second.wait_time(1))
+
+    def take(self, cost: int):
+        self.daily.take(cost)
+        self.per_second.take(1)
+
+
+class QuotaScheduler:
+    """
+    Hands out API keys to YouTube Data API calls according to per-key token buckets.
+
+    Each key has a daily quota in units, reset at midnight Pacific and shared with other processes through
+    the database, and a per-second request bucket of this process. Callers queue by priority (lower runs
+    first, then FIFO) and sleep only until the head of the queue can be served by some key, or until their
+    wait timeout makes them give up.
+
+    Attributes:
+        units_spent (Counter): Quota units consumed per endpoint.
+        requests_made (Counter): Calls made per endpoint.
+    """
+
+    def __init__(self, api_keys: list[str], daily_quota: int = DAILY_QUOTA,
+                 requests_per_second: float = REQUESTS_PER_SECOND):
+        self.units_spent = Counter()
+        self.requests_made = Counter()
+        self._keys = [ApiKeyState(key, daily_quota, requests_per_second) for key in api_keys]
+        self._next_key = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _take_key(self, cost: int) -> tuple[str | None, float]:
+        shortest_wait = float('inf')
+        for offset in range(len(self._keys)):
+            state = self._keys[(self._next_key + offset) % len(self._keys)]
+            wait = state.wait_time(cost)
+            if wait == 0:
+                state.take(cost)
+                self._next_key = (self._next_key + offset + 1) % len(self._keys)
+                return state.key, 0.0
+            shortest_wait = min(shortest_wait, wait)
+        return None, shortest_wait
+
+    def _enqueue(self, priority_value: int | None) -> tuple[int, int]:
+        if not self._keys:
+            raise RuntimeError('No YouTube API key configured, set API_KEY or API_KEYS')
+        ticket = (current_priority() if priority_value is None else priority_value, next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _try_grant(self, ticket: tuple[int, int], endpoint: str, cost: int) -> tuple[str | None, float | None]:
+        """Called under the condition: a key when ``ticket`` heads the queue and a key can serve it, else the wait."""
+        if self._waiters[0] != ticket:
+            return None, None
+        key, wait = self._take_key(cost)
+        if key is None:
+            if wait > 60:
+                logger.info('Quota exhausted for all keys, next {endpoint} call in {wait:.0f}s'.format(
+                    endpoint=endpoint, wait=wait))
+            return None, wait
+        heapq.heappop(self._waiters)
+        self.units_spent[endpoint] += cost
+        self.requests_made[endpoint] += 1
+        metrics.youtube_quota_units.labels(endpoint).inc(cost)
+        if _usage.get() is not None:
+            _usage.get().add(cost)
+        return key, 0.0
+
+    def _leave(self, ticket: tuple[int, int]):
+        """Called under the condition once a waiter is done, granted or not, and wakes the others."""
+        if ticket in self._waiters:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+        self._condition.notify_all()
+
+    def acquire(self, endpoint: str, priority_value: int | None = None,
+                timeout: float | None = QUOTA_WAIT_TIMEOUT) -> str:
+        """
+        Waits for a key that can pay for one ``endpoint`` call and charges it.
+
+        Raises:
+            QuotaWaitTimeout: no key within ``timeout`` seconds. A key that will not be free before the
+                deadline, e.g. until the midnight Pacific reset, fails the call at once.
+        """
+        cost = ENDPOINT_COSTS.get(endpoint, 1)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            ticket = self._enqueue(priority_value)
+            try:
+                while True:
+                    key, wait = self._try_grant(ticket, endpoint, cost)
+                    if key is not None:
+                        return key
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or (wait is not None and wait > remaining):
+                            raise QuotaWaitTimeout(endpoint, wait)
+                        wait = remaining if wait is None else wait
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._leave(ticket)
+
+    def report_quota_exceeded(self, key: str):
+        with self._condition:
+            for state in self._keys:
+                if state.key == key:
+                    state.daily.drain()
+            self._condition.notify_all()
+        logger.warning('API key ...{suffix} reported quotaExceeded'.format(suffix=key[-4:]))
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {'units_spent': dict(self.units_spent),
+                    'requests_made': dict(self.requests_made),
+                    'queued': len(self._waiters),
+                    'keys': [{'key': '...' + state.key[-4:], 'reserved_units_left': int(state.daily.tokens),
+                              'exhausted': state.daily.exhausted} for state in self._keys]}
+
+
+scheduler = QuotaScheduler(API_KEYS)
+metrics.youtube_quota_waiters.set_function(lambda: len(scheduler._waiters))
+
+# A key whose quota was reported as exceeded is retried with the next one at most this many times
+MAX_KEY_RETRIES = max(len(API_KEYS), 1)
+
+
+def _is_quota_exceeded(status: int, body: str) -> bool:
+    return status == 403 and ('quotaExceeded' in body or 'dailyLimitExceeded' in body)
+
+
+def get(endpoint: str, url: str, params: dict, **kwargs) -> requests.Response:
+    """
+    Runs a GET under the scheduler, signing it with the key it was granted.
+
+    Repeated requests are made conditional through response_cache; a 304 comes back as a 200 carrying the
+    cached body.
+
+    Raises:
+        QuotaWaitTimeout: no key could serve the call within QUOTA_WAIT_TIMEOUT.
+    """
+    cache_key = response_cache.cache.key(endpoint, url, params)
+    cached = response_cache.cache.lookup(endpoint, cache_key)
+    kwargs['headers'] = dict(kwargs.get('headers') or {}, **response_cache.cache.conditional_headers(cached))
+    for attempt in range(MAX_KEY_RETRIES):
+        key = scheduler.acquire(endpoint)
+        started = time.perf_counter()
+        try:
+            response = requests.get(url, params=dict(params, key=key), **kwargs)
+        except requests.RequestException:
+            metrics.observe_request(metrics.youtube_api_latency, started, endpoint, 'error')
+            raise
+        metrics.observe_request(metrics.youtube_api_latency, started, endpoint, response.status_code)
+        if attempt + 1 < MAX_KEY_RETRIES and _is_quota_exceeded(response.status_code, response.text):
+            scheduler.report_quota_exceeded(key)
+            continue
+        status, body = response_cache.cache.resolve(endpoint, cache_key, cached, response.status_code,
+                                                    response.headers.get('ETag'), response.content)
+        if status != response.status_code:
+            response.status_code, response._content = status, body
+        return response
@@ -0,0 +1,268 @@
+"""
+Conditional-request cache for YouTube Data API responses.
+
+Response bodies are stored together with their ETag. A repeated request is sent with If-None-Match and a 304
+answer is served from the stored body, so re-crawling unchanged channels, videos and comment pages transfers
+headers instead of full payloads. The quota scheduler still charges every call; the cache saves bandwidth,
+latency and JSON transfer, not quota units.
+
+Entries expire after their endpoint's TTL (endpoints without one are never cached) and are evicted least
+recently used beyond RESPONSE_CACHE_MAX_ENTRIES or RESPONSE_CACHE_MAX_BYTES. Bodies live on disk by default;
+set RESPONSE_CACHE_BACKEND=postgres to share them between API and worker processes, or none to disable.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlsplit
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models_module import db_architecture
+from ..models_module import db_sessions
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "disk")
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", ".cache/youtube")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 200_000))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# Postgres entries are pruned to the bounds after this many writes rather than on every one
+RESPONSE_CACHE_PRUNE_EVERY = 1000
+
+# Seconds an entry may be revalidated after it was last confirmed by the API. search.list is left out:
+# its results depend on time and are never repeated verbatim.
+RESPONSE_CACHE_TTLS = {
+    'channels.list': 7 * 24 * 3600,
+    'playlistItems.list': 24 * 3600,
+    'videos.list': 24 * 3600,
+    'commentThreads.list': 24 * 3600,
+    'comments.list': 24 * 3600,
+}
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    stored_at: float
+
+
+def cache_key(endpoint: str, url: str, params: dict | None = None) -> str:
+    """Identifies a request independently of the API key it is signed with and of parameter order."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + [(name, str(value))
+                                                              for name, value in (params or {}).items()]
+    canonical = '&'.join(f'{name}={value}' for name, value in sorted(query) if name != 'key')
+    return hashlib.sha256(f'{endpoint} {parts.netloc}{parts.path}?{canonical}'.encode()).hexdigest()
+
+
+class DiskStore:
+    """
+    One file per entry: the ETag on the first line, then the body. The file's mtime is the time the entry was
+    last confirmed by the API. The LRU order is kept in memory and rebuilt from the mtimes on first use; with
+    several processes on one directory each evicts by its own view, use the postgres backend there.
+    """
+
+    def __init__(self, directory: str = RESPONSE_CACHE_DIR, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._index = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load(self):
+        if self._index is not None:
+            return
+        files = sorted((path.stat().st_mtime, path.name, path.stat().st_size)
+                       for path in self.directory.glob('*/*') if not path.name.endswith('.tmp'))
+        self._index = OrderedDict((name, size) for _, name, size in files)
+        self._bytes = sum(self._index.values())
+
+    def get(self, key: str) -> CachedResponse | None:
+        path = self._path(key)
+        try:
+            with path.open('rb') as file:
+                etag = file.readline().decode().rstrip('\n')
+                body = file.read()
+            stored_at = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._load()
+            if key in self._index:
+                self._index.move_to_end(key)
+        return CachedResponse(etag, body, stored_at)
+
+    def put(self, key: str, etag: str, body: bytes, endpoint: str = ''):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f'{key}.{threading.get_ident()}.tmp')
+        temporary.write_bytes(etag.encode() + b'\n' + body)
+        temporary.replace(path)
+        size = path.stat().st_size
+        with self._lock:
+            self._load()
+            self._bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self._index and (len(self._index) > self.max_entries or self._bytes > self.max_bytes):
+                evicted, evicted_size = self._index.popitem(last=False)
+                self._bytes -= evicted_size
+                self._path(evicted).unlink(missing_ok=True)
+
+    def touch(self, key: str):
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._bytes -= self._index.pop(key)
+
+
+class PostgresStore:
+    """Entries in api_response_cache, shared by every process; accessedAt drives the LRU pruning."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        cache = db_architecture.ApiResponseCache
+        with db_sessions.session_scope() as session:
+            # Age computed by Postgres, so the TTL does not depend on the database and host clocks agreeing
+            row = session.execute(update(cache).where(cache.key == key).values(accessedAt=func.now()).returning(
+                cache.etag, cache.body, func.extract('epoch', func.localtimestamp() - cache.storedAt))).first()
+        return CachedResponse(row[0], row[1], time.time() - float(row[2])) if row else None
+
+    def put(self, key: str, etag: str, body: bytes, endpoint: str = ''):
+        statement = insert(db_architecture.ApiResponseCache).values(key=key, endpoint=endpoint, etag=etag, body=body,
+                                                                    size=len(body))
+        with db_sessions.session_scope() as session:
+            session.execute(statement.on_conflict_do_update(index_elements=['key'], set_={
+                'etag': statement.excluded.etag, 'body': statement.excluded.body, 'size': statement.excluded.size,
+                'storedAt': func.now(), 'accessedAt': func.now()}))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % RESPONSE_CACHE_PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        with db_sessions.session_scope() as session:
+            return session.execute(text('''
+                DELETE FROM api_response_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, row_number() OVER recent AS entries, sum(size) OVER recent AS bytes
+                        FROM api_response_cache WINDOW recent AS (ORDER BY "accessedAt" DESC)
+                    ) ranked WHERE entries > :max_entries OR bytes > :max_bytes)
+            '''), {'max_entries': self.max_entries, 'max_bytes': self.max_bytes}).rowcount
+
+    def touch(self, key: str):
+        cache = db_architecture.ApiResponseCache
+        with db_sessions.session_scope() as session:
+            session.execute(update(cache).where(cache.key == key).values(storedAt=func.now()))
+
+    def delete(self, key: str):
+        with db_sessions.session_scope() as session:
+            session.execute(delete(db_architecture.ApiResponseCache).where(
+                db_architecture.ApiResponseCache.key == key))
+
+
+class ResponseCache:
+    """
+    Decides which requests are conditional and turns 304 answers back into the stored bodies.
+
+    Store failures are logged and treated as misses: the cache must never fail a crawl.
+
+    Attributes:
+        stats (dict[str, Counter]): Per endpoint: 'hits' (304 served from the cache), 'misses' (full bodies
+            received), 'bytes_saved' (body bytes a 304 did not transfer).
+    """
+
+    def __init__(self, store=None, ttls: dict[str, int] | None = None):
+        self.store = store
+        self.ttls = RESPONSE_CACHE_TTLS if ttls is None else ttls
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, endpoint: str, **increments):
+        with self._lock:
+            self.stats.setdefault(endpoint, Counter()).update(increments)
+
+    def key(self, endpoint: str, url: str, params: dict | None = None) -> str | None:
+        if self.store is None or not self.ttls.get(endpoint):
+            return None
+        return cache_key(endpoint, url, params)
+
+    def lookup(self, endpoint: str, key: str | None) -> CachedResponse | None:
+        if key is None:
+            return None
+        try:
+            cached = self.store.get(key)
+            if cached is not None and time.time() - cached.stored_at > self.ttls[endpoint]:
+                self.store.delete(key)
+                return None
+            return cached
+        except Exception:
+            logger.exception('Response cache lookup failed')
+            return None
+
+    @staticmethod
+    def conditional_headers(cached: CachedResponse | None) -> dict:
+        return {'If-None-Match': cached.etag} if cached is not None else {}
+
+    def resolve(self, endpoint: str, key: str | None, cached: CachedResponse | None, status: int,
+                etag: str | None, body: bytes) -> tuple[int, bytes]:
+        """
+        Serves a 304 from ``cached`` and stores a fresh 200 body.
+
+        Returns:
+            Status and body to hand to the caller: 200 with the cached body for a 304, else unchanged.
+        """
+        if key is None:
+            return status, body
+        try:
+            if status == 304 and cached is not None:
+                self._count(endpoint, hits=1, bytes_saved=len(cached.body))
+                self.store.touch(key)
+                return 200, cached.body
+            if status == 200:
+                self._count(endpoint, misses=1)
+                if etag:
+                    self.store.put(key, etag, body, endpoint)
+        except Exception:
+            logger.exception('Response cache update failed')
+        return status, body
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {endpoint: dict(counter, hit_ratio=round(counter['hits'] / total, 4) if (
+                total := counter['hits'] + counter['misses']) else None) for endpoint, counter in self.stats.items()}
+
+
+def _create_store():
+    if RESPONSE_CACHE_BACKEND == 'postgres':
+        return PostgresStore()
+    if RESPONSE_CACHE_BACKEND == 'disk':
+        return DiskStore()
+    return None
+
+
+cache = ResponseCache(_create_store())
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from ..models_module import db_sessions
+from ..models_module import ingest_events
+from ..models_module import work_with_models
+from ..monitoring_module import metrics
+from ..parsing_module import get_info
+from ..parsing_module import quota_scheduler
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# A video is re-polled once it has aged by this fraction since the last poll: hourly on its first day,
+# roughly daily after a week, capped at STATS_REFRESH_MAX_HOURS for old videos
+STATS_REFRESH_AGE_RATIO = float(os.getenv("STATS_REFRESH_AGE_RATIO", 0.1))
+STATS_REFRESH_MIN_HOURS = float(os.getenv("STATS_REFRESH_MIN_HOURS", 1))
+STATS_REFRESH_MAX_HOURS = float(os.getenv("STATS_REFRESH_MAX_HOURS", 24 * 30))
+STATS_CHANNEL_REFRESH_HOURS = float(os.getenv("STATS_CHANNEL_REFRESH_HOURS", 24))
+# Targets refreshed per round; every 50 of them cost one quota unit
+STATS_REFRESH_BATCH = int(os.getenv("STATS_REFRESH_BATCH", 5000))
+STATS_REFRESH_POLL_INTERVAL = float(os.getenv("STATS_REFRESH_POLL_INTERVAL", 300))
+# Videos whose videos.list call failed (5xx, quota) are tried again this much later
+STATS_RETRY_MINUTES = float(os.getenv("STATS_RETRY_MINUTES", 15))
+
+
+def refresh_interval(published_at: datetime | None, now: datetime) -> timedelta:
+    if published_at is None:
+        return timedelta(hours=STATS_REFRESH_MAX_HOURS)
+    age_hours = max((now - published_at).total_seconds() / 3600, 0)
+    return timedelta(hours=min(max(age_hours * STATS_REFRESH_AGE_RATIO, STATS_REFRESH_MIN_HOURS),
+                               STATS_REFRESH_MAX_HOURS))
+
+
+def refresh_videos(batch_size: int = STATS_REFRESH_BATCH) -> int:
+    """Re-polls statistics of the videos that are due with batched videos.list(part=statistics) calls."""
+    due = work_with_models.get_due_stats_targets('video', batch_size)
+    if not due:
+        return 0
+    found = get_info.fetch_videos_details([video_id for video_id, _ in due], part='statistics', skip_failed=True)
+    now = datetime.utcnow()
+    snapshots = [work_with_models.map_video_stats(video_info, video_id, now)
+                 for video_id, video_info in found.items() if video_info is not None]
+    # Deleted or private videos are rescheduled as well; their series simply stops
+    schedule = {video_id: now + refresh_interval(published_at, now)
+                for video_id, published_at in due if video_id in found}
+    # Unanswered ones stay close to due instead of losing a data point until their next interval
+    retry_at = now + timedelta(minutes=STATS_RETRY_MINUTES)
+    retry = {video_id: retry_at for video_id, _ in due if video_id not in found}
+    if retry:
+        logger.warning('No statistics answer for {count} videos, retrying in {minutes:g} min'.format(
+            count=len(retry), minutes=STATS_RETRY_MINUTES))
+    with db_sessions.session_scope() as session:
+        work_with_models.save_video_stats(snapshots, session)
+        work_with_models.reschedule_stats_refresh('video', schedule, session=session)
+        work_with_models.reschedule_stats_refresh('video', retry, refreshed=False, session=session)
+    return len(due)
+
+
+def refresh_channels(batch_size: int = STATS_REFRESH_BATCH) -> int:
+    due = work_with_models.get_due_stats_targets('channel', batch_size)
+    if not due:
+        return 0
+    found = get_info.fetch_channels_statistics([channel_id for channel_id, _ in due])
+    now = datetime.utcnow()
+    snapshots = [work_with_models.map_channel_stats(channel_info, channel_id, now)
+                 for channel_id, channel_info in found.items()]
+    next_refresh = now + timedelta(hours=STATS_CHANNEL_REFRESH_HOURS)
+    with db_sessions.session_scope() as session:
+        work_with_models.save_channel_stats(snapshots, session)
+        work_with_models.reschedule_stats_refresh('channel', {channel_id: next_refresh for channel_id, _ in due},
+                                                  session=session)
+    return len(due)
+
+
+def refresh_due(batch_size: int = STATS_REFRESH_BATCH) -> dict:
+    """Schedules newly stored videos and channels, then refreshes everything that is due."""
+    refreshed = {'seeded': work_with_models.seed_stats_refresh_state(), 'videos': 0, 'channels': 0}
+    with quota_scheduler.priority(quota_scheduler.PRIORITY_BACKGROUND):
+        while True:
+            videos = refresh_videos(batch_size)
+            channels = refresh_channels(batch_size)
+            refreshed['videos'] += videos
+            refreshed['channels'] += channels
+            if videos < batch_size and channels < batch_size:
+                return refreshed
+
+
+def run_stats_refresher(stop_event: threading.Event | None = None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            refreshed = refresh_due()
+            if refreshed['videos'] or refreshed['channels']:
+                logger.info('Statistics refreshed: {refreshed}'.format(refreshed=refreshed))
+                ingest_events.notify('stats')
+        except Exception:
+            logger.exception('Statistics refresh failed')
+        stop_event.wait(STATS_REFRESH_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    metrics.serve()
+    run_stats_refresher()
@@ -0,0 +1,156 @@
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+from youtube_transcript_api import (
+    NoTranscriptAvailable, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, YouTubeTranscriptApi
+)
+from ..models_module import copy_loader
+from ..models_module import work_with_models
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Preferred transcript languages, best first; manual tracks win over automatic ones in the same language
+TRANSCRIPT_LANGUAGES = [code.strip() for code in os.getenv("TRANSCRIPT_LANGUAGES", "ru,en").split(",") if code.strip()]
+TRANSCRIPT_WORKERS = int(os.getenv("TRANSCRIPT_WORKERS", 8))
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", 500))
+
+# Permanent for practical purposes: recorded as 'unavailable' and not retried by default
+UNAVAILABLE_ERRORS = (TranscriptsDisabled, NoTranscriptFound, NoTranscriptAvailable, VideoUnavailable)
+
+# Transcript service speaking the benchmarks.fake_youtube protocol, used instead of youtube.com when set
+TRANSCRIPT_API_URL = os.getenv("TRANSCRIPT_API_URL")
+HTTP_TIMEOUT = 30
+
+
+def _fetch_from_service(video_id: str, languages: list[str], state: dict) -> tuple[dict, list[dict]]:
+    """GET {TRANSCRIPT_API_URL}{video_id}: 200 with language, isGenerated and segments, 404 when there is none."""
+    try:
+        response = requests.get(f'{TRANSCRIPT_API_URL.rstrip("/")}/{video_id}',
+                                params={'languages': ','.join(languages)}, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as error:
+        state.update(status='failed', error=repr(error))
+        return state, []
+    if response.status_code == 404:
+        state.update(status='unavailable', error='TranscriptsDisabled')
+        return state, []
+    if response.status_code != 200:
+        state.update(status='failed', error=f'HTTP {response.status_code}')
+        return state, []
+    transcript = response.json()
+    state.update(language=transcript['language'], isGenerated=transcript['isGenerated'],
+                 segmentCount=len(transcript['segments']))
+    return state, transcript['segments']
+
+
+def fetch_transcript(video_id: str, languages: list[str] | None = None) -> tuple[dict, list[dict]]:
+    """
+    Fetches the best transcript track for a video.
+
+    Returns:
+        (state, segments): a transcript_state row and the segments as returned by youtube-transcript-api.
+        Failures never raise; they are reported through state['status'] with no segments.
+    """
+    languages = languages or TRANSCRIPT_LANGUAGES
+    state = dict(videoId=video_id, status='available', language=None, isGenerated=None, segmentCount=0,
+                 error=None, fetchedAt=datetime.utcnow())
+    if TRANSCRIPT_API_URL:
+        return _fetch_from_service(video_id, languages, state)
+    try:
+        transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        try:
+            transcript = transcripts.find_transcript(languages)
+        except NoTranscriptFound:
+            # Any track beats none for analysis; the stored language tells the two cases apart
+            transcript = next(iter(transcripts))
+        segments = transcript.fetch()
+    except UNAVAILABLE_ERRORS as error:
+        state.update(status='unavailable', error=type(error).__name__)
+        return state, []
+    except Exception as error:
+        # Rate limiting and network errors; the video is picked up again by the next run
+        logger.warning('Transcript fetch failed for {video_id}: {error!r}'.format(video_id=video_id, error=error))
+        state.update(status='failed', error=repr(error))
+        return state, []
+    state.update(language=transcript.language_code, isGenerated=transcript.is_generated,
+                 segmentCount=len(segments))
+    return state, segments
+
+
+def fetch_transcripts(video_ids: Iterable[str], languages: list[str] | None = None,
+                      max_workers: int = TRANSCRIPT_WORKERS) -> Iterator[tuple[dict, list[dict]]]:
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='transcripts') as executor:
+        yield from executor.map(lambda video_id: fetch_transcript(video_id, languages), video_ids)
+
+
+def verify_stored_segments(states: list[dict]):
+    """
+    Downgrades to 'failed' every available transcript whose stored segments do not match what was fetched,
+    e.g. left partial by an earlier run, and deletes its segments so the retry can load it whole.
+    """
+    expected = {state['videoId']: state['segmentCount'] for state in states
+                if state['status'] == 'available' and state['segmentCount']}
+    if not expected:
+        return
+    stored = work_with_models.count_subtitle_segments(list(expected))
+    mismatched = [video_id for video_id, count in expected.items() if stored.get(video_id, 0) != count]
+    for state in states:
+        if state['videoId'] in mismatched:
+            state.update(status='failed', error='stored {stored} of {count} segments'.format(
+                stored=stored.get(state['videoId'], 0), count=state['segmentCount']))
+    work_with_models.delete_subtitles(mismatched)
+
+
+def ingest_transcripts(video_ids: list[str], languages: list[str] | None = None,
+                       retry_unavailable: bool = False) -> Counter:
+    """
+    Fetches transcripts for stored videos concurrently and loads the segments with COPY.
+
+    Videos that already have a transcript, or are known to have none, are skipped unless
+    ``retry_unavailable`` is set.
+
+    Returns:
+        Number of videos per resulting status.
+    """
+    pending = work_with_models.get_videos_needing_transcripts(video_ids, retry_unavailable)
+    statuses = Counter()
+    if not pending:
+        return statuses
+    states = []
+    with copy_loader.CopyLoader() as loader:
+        for state, segments in fetch_transcripts(pending, languages):
+            if segments:
+                loader.add_subtitles(state['videoId'], segments)
+            states.append(state)
+    verify_stored_segments(states)
+    statuses.update(state['status'] for state in states)
+    # Written only after the segments are merged and counted, so 'available' never points at missing rows
+    work_with_models.save_transcript_states(states)
+    logger.info('Transcripts for {count} videos: {statuses}'.format(count=len(pending), statuses=dict(statuses)))
+    return statuses
+
+
+def ingest_missing_transcripts(batch_size: int = TRANSCRIPT_BATCH_SIZE, languages: list[str] | None = None,
+                               retry_unavailable: bool = False) -> Counter:
+    """Runs ingest_transcripts over every stored video lacking a transcript, one batch at a time."""
+    statuses = Counter()
+    after = None
+    while True:
+        # Keyset pagination on videoId: failed videos stay selectable, but each is tried once per run
+        batch = work_with_models.get_videos_needing_transcripts(
+            retry_unavailable=retry_unavailable, limit=batch_size, after=after)
+        if not batch:
+            return statuses
+        after = batch[-1]
+        statuses += ingest_transcripts(batch, languages, retry_unavailable)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logger.info('Transcript ingestion finished: {statuses}'.format(statuses=dict(ingest_missing_transcripts())))
@@ -0,0 +1,52 @@
+"""
+Plain REST client for the YouTube Data API v3.
+
+Every call goes to YOUTUBE_API_URL through quota_scheduler.get, which signs it with the key it was granted
+and makes repeats conditional through response_cache. There is no discovery document to load, so importing
+this module costs nothing, and pointing YOUTUBE_API_URL at benchmarks.fake_youtube runs the whole crawler
+offline.
+"""
+import os
+
+from dotenv import load_dotenv
+
+from ..parsing_module import quota_scheduler
+
+load_dotenv()
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", 'https://www.googleapis.com/youtube/v3/').rstrip('/') + '/'
+HTTP_TIMEOUT = 30
+
+
+class YouTubeApiError(Exception):
+    """
+    A non-200 answer from the Data API.
+
+    Attributes:
+        endpoint (str): API method, e.g. 'playlistItems.list'.
+        status (int): HTTP status code.
+        content (str): Response body, usually a JSON error document.
+    """
+
+    def __init__(self, endpoint: str, status: int, content: str):
+        super().__init__(f'{endpoint} failed with {status}: {content[:200]}')
+        self.endpoint = endpoint
+        self.status = status
+        self.content = content
+
+
+def call(endpoint: str, **params) -> dict:
+    """
+    Calls an API method, e.g. ``call('channels.list', part='snippet', id=channel_id)``.
+
+    Parameters set to None are left out, as the discovery-based client did.
+
+    Raises:
+        YouTubeApiError: the API answered with anything but 200.
+    """
+    resource = endpoint.split('.')[0]
+    response = quota_scheduler.get(endpoint, f'{YOUTUBE_API_URL}{resource}',
+                                   {name: value for name, value in params.items() if value is not None},
+                                   timeout=HTTP_TIMEOUT)
+    if response.status_code != 200:
+        raise YouTubeApiError(endpoint, response.status_code, response.text)
+    return response.json()
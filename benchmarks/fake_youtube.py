@@ -0,0 +1,276 @@
+"""
+Local stand-in for the YouTube Data API, the Return YouTube Dislike API and a transcript service.
+
+Every response is generated deterministically from the requested ids and FAKE_YOUTUBE_SEED, so two runs
+against the same configuration see byte-identical data. Point the application at it with
+
+    YOUTUBE_API_URL=http://127.0.0.1:8765/youtube/v3/
+    DISLIKE_API_URL=http://127.0.0.1:8765/votes
+    TRANSCRIPT_API_URL=http://127.0.0.1:8765/transcripts/
+
+and start it with
+
+    python -m benchmarks.fake_youtube [--port 8765] [--videos 50] [--comments 200] [--replies 8]
+                                      [--latency-ms 0] [--error-rate 0]
+
+Any channel handle or id exists; a channel has FAKE_YOUTUBE_VIDEOS videos, a video FAKE_YOUTUBE_COMMENTS
+top-level comments with up to FAKE_YOUTUBE_REPLIES replies each (more than five forces comments.list calls,
+as on YouTube). Every response carries an ETag and honours If-None-Match. FAKE_YOUTUBE_ERROR_RATE of the
+requests fail with 503 to exercise retries; FAKE_YOUTUBE_LATENCY_MS delays every response.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request, Response
+
+FAKE_YOUTUBE_SEED = int(os.getenv("FAKE_YOUTUBE_SEED", 1))
+FAKE_YOUTUBE_VIDEOS = int(os.getenv("FAKE_YOUTUBE_VIDEOS", 50))
+FAKE_YOUTUBE_COMMENTS = int(os.getenv("FAKE_YOUTUBE_COMMENTS", 200))
+FAKE_YOUTUBE_REPLIES = int(os.getenv("FAKE_YOUTUBE_REPLIES", 8))
+FAKE_YOUTUBE_LATENCY_MS = float(os.getenv("FAKE_YOUTUBE_LATENCY_MS", 0))
+FAKE_YOUTUBE_ERROR_RATE = float(os.getenv("FAKE_YOUTUBE_ERROR_RATE", 0))
+
+INLINE_REPLIES = 5
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORDS = ['видео', 'спасибо', 'класс', 'интересно', 'автор', 'почему', 'great', 'video', 'thanks', 'love', 'bad',
+         'really', 'music', 'канал', 'подпишись', 'хорошо', 'плохо', 'idea', 'question', 'ответ']
+
+app = FastAPI()
+_errors = random.Random(FAKE_YOUTUBE_SEED)
+
+
+def _rng(*parts) -> random.Random:
+    return random.Random(f'{FAKE_YOUTUBE_SEED}:' + ':'.join(map(str, parts)))
+
+
+def _timestamp(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _suffix(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()[:6]
+
+
+def channel_id_for(handle: str) -> str:
+    return 'UC' + _suffix(handle.lstrip('@').lower()) + '0' * 16
+
+
+def _channel_key(channel_id: str) -> str:
+    return channel_id[2:8]
+
+
+def video_id_for(channel_id: str, index: int) -> str:
+    return _channel_key(channel_id) + f'{index:05d}'
+
+
+def _video_channel(video_id: str) -> str:
+    return 'UC' + video_id[:6] + '0' * 16
+
+
+def _video_index(video_id: str) -> int:
+    return int(video_id[6:]) if video_id[6:].isdigit() else 0
+
+
+def _page(items: list, request: Request, default_size: int = 50) -> tuple[list, str | None]:
+    size = min(int(request.query_params.get('maxResults', default_size)), 100)
+    token = request.query_params.get('pageToken')
+    start = int(token) if token and token.isdigit() else 0
+    next_token = str(start + size) if start + size < len(items) else None
+    return items[start:start + size], next_token
+
+
+def _list_response(kind: str, items: list, next_token: str | None = None) -> dict:
+    body = {'kind': f'youtube#{kind}ListResponse', 'items': items,
+            'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}}
+    if next_token:
+        body['nextPageToken'] = next_token
+    return body
+
+
+async def _respond(request: Request, body: dict, status: int = 200) -> Response:
+    if FAKE_YOUTUBE_LATENCY_MS:
+        await asyncio.sleep(FAKE_YOUTUBE_LATENCY_MS / 1000)
+    if FAKE_YOUTUBE_ERROR_RATE and _errors.random() < FAKE_YOUTUBE_ERROR_RATE:
+        return Response(json.dumps({'error': {'code': 503, 'message': 'Injected failure'}}), status_code=503,
+                        media_type='application/json', headers={'Retry-After': '0'})
+    content = json.dumps(body, ensure_ascii=False).encode()
+    etag = '"' + hashlib.md5(content).hexdigest() + '"'
+    if status == 200 and request.headers.get('If-None-Match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(content, status_code=status, media_type='application/json', headers={'ETag': etag})
+
+
+def make_channel(channel_id: str) -> dict:
+    rng = _rng('channel', channel_id)
+    title = f'Channel {_channel_key(channel_id)}'
+    return {
+        'kind': 'youtube#channel', 'id': channel_id,
+        'snippet': {'title': title, 'description': _text(rng, 20), 'customUrl': f'@{_channel_key(channel_id)}',
+                    'publishedAt': _timestamp(EPOCH - timedelta(days=rng.randint(100, 3000))),
+                    'thumbnails': {'default': {'url': f'https://example.invalid/{channel_id}.jpg'}},
+                    'localized': {'title': title, 'description': ''}, 'country': 'RU'},
+        'contentDetails': {'relatedPlaylists': {'likes': '', 'uploads': 'UU' + channel_id[2:]}},
+        'statistics': {'viewCount': str(rng.randint(10 ** 4, 10 ** 8)),
+                       'subscriberCount': str(rng.randint(10 ** 2, 10 ** 6)),
+                       'hiddenSubscriberCount': False, 'videoCount': str(FAKE_YOUTUBE_VIDEOS)},
+        'topicDetails': {'topicCategories': ['https://en.wikipedia.org/wiki/Knowledge']},
+        'status': {'privacyStatus': 'public', 'isLinked': True, 'longUploadsStatus': 'allowed',
+                   'madeForKids': False},
+        'brandingSettings': {'channel': {'title': title, 'description': '', 'keywords': 'fake benchmark'}},
+    }
+
+
+def make_video(video_id: str) -> dict:
+    rng = _rng('video', video_id)
+    channel_id = _video_channel(video_id)
+    # Index 0 is the newest upload
+    published = EPOCH - timedelta(hours=6 * _video_index(video_id) + rng.randint(0, 5))
+    return {
+        'kind': 'youtube#video', 'id': video_id,
+        'snippet': {'publishedAt': _timestamp(published), 'channelId': channel_id, 'title': _text(rng, 6),
+                    'description': _text(rng, 40),
+                    'thumbnails': {'default': {'url': f'https://example.invalid/{video_id}.jpg'}},
+                    'channelTitle': f'Channel {_channel_key(channel_id)}',
+                    'tags': rng.sample(WORDS, rng.randint(0, 6)), 'categoryId': str(rng.choice([10, 22, 27, 28])),
+                    'liveBroadcastContent': 'none', 'defaultAudioLanguage': 'ru'},
+        'contentDetails': {'duration': f'PT{rng.randint(1, 59)}M{rng.randint(0, 59)}S', 'dimension': '2d',
+                           'definition': 'hd', 'caption': 'false', 'licensedContent': True},
+        'status': {'uploadStatus': 'processed', 'privacyStatus': 'public', 'license': 'youtube',
+                   'embeddable': True, 'publicStatsViewable': True, 'madeForKids': False},
+        'statistics': {'viewCount': str(rng.randint(10 ** 3, 10 ** 7)), 'likeCount': str(rng.randint(10, 10 ** 5)),
+                       'favoriteCount': '0', 'commentCount': str(FAKE_YOUTUBE_COMMENTS)},
+    }
+
+
+def _reply_count(thread_id: str) -> int:
+    return _rng('replies', thread_id).randint(0, FAKE_YOUTUBE_REPLIES)
+
+
+def make_comment(comment_id: str, video_id: str, parent_id: str | None, published: datetime) -> dict:
+    rng = _rng('comment', comment_id)
+    author = ''.join(rng.choice(string.ascii_letters) for _ in range(22))
+    text = _text(rng, rng.randint(3, 30))
+    snippet = {'videoId': video_id, 'channelId': _video_channel(video_id), 'authorDisplayName': f'@user{author[:8]}',
+               'authorProfileImageUrl': f'https://example.invalid/{author}.jpg',
+               'authorChannelUrl': f'https://www.youtube.com/channel/UC{author}',
+               'authorChannelId': {'value': f'UC{author}'}, 'textDisplay': text, 'textOriginal': text,
+               'canRate': True, 'viewerRating': 'none', 'likeCount': rng.randint(0, 500),
+               'publishedAt': _timestamp(published), 'updatedAt': _timestamp(published)}
+    if parent_id is not None:
+        snippet['parentId'] = parent_id
+    return {'kind': 'youtube#comment', 'id': comment_id, 'snippet': snippet}
+
+
+def _thread_published(video_id: str, index: int) -> datetime:
+    # Newest thread first, matching order=time
+    return EPOCH + timedelta(days=30) - timedelta(minutes=7 * index)
+
+
+def make_replies(thread_id: str, video_id: str, published: datetime) -> list[dict]:
+    return [make_comment(f'{thread_id}.r{number}', video_id, thread_id, published + timedelta(minutes=number + 1))
+            for number in range(_reply_count(thread_id))]
+
+
+def make_thread(video_id: str, index: int) -> dict:
+    thread_id = f'Ug{video_id}.t{index}'
+    published = _thread_published(video_id, index)
+    replies = make_replies(thread_id, video_id, published)
+    thread = {'kind': 'youtube#commentThread', 'id': thread_id,
+              'snippet': {'videoId': video_id, 'channelId': _video_channel(video_id), 'canReply': True,
+                          'totalReplyCount': len(replies), 'isPublic': True,
+                          'topLevelComment': make_comment(thread_id, video_id, None, published)}}
+    if replies:
+        thread['replies'] = {'comments': replies[:INLINE_REPLIES]}
+    return thread
+
+
+@app.get('/youtube/v3/channels')
+async def channels(request: Request, id: str | None = None, forHandle: str | None = None):
+    channel_ids = [channel_id_for(forHandle)] if forHandle else [value for value in (id or '').split(',') if value]
+    return await _respond(request, _list_response('channel', [make_channel(value) for value in channel_ids]))
+
+
+@app.get('/youtube/v3/playlistItems')
+async def playlist_items(request: Request, playlistId: str):
+    channel_id = 'UC' + playlistId[2:]
+    items = [{'kind': 'youtube#playlistItem', 'id': f'{playlistId}.{index}',
+              'contentDetails': {'videoId': video_id_for(channel_id, index)}} for index in range(FAKE_YOUTUBE_VIDEOS)]
+    page, next_token = _page(items, request)
+    return await _respond(request, _list_response('playlistItem', page, next_token))
+
+
+@app.get('/youtube/v3/videos')
+async def videos(request: Request, id: str = ''):
+    return await _respond(request, _list_response('video', [make_video(value) for value in id.split(',') if value]))
+
+
+@app.get('/youtube/v3/search')
+async def search(request: Request):
+    channel_id = channel_id_for('search')
+    items = [{'kind': 'youtube#searchResult',
+              'id': {'kind': 'youtube#video', 'videoId': video_id_for(channel_id, index)}}
+             for index in range(FAKE_YOUTUBE_VIDEOS)]
+    page, next_token = _page(items, request, default_size=5)
+    return await _respond(request, _list_response('search', page, next_token))
+
+
+@app.get('/youtube/v3/commentThreads')
+async def comment_threads(request: Request, videoId: str):
+    threads = [make_thread(videoId, index) for index in range(FAKE_YOUTUBE_COMMENTS)]
+    page, next_token = _page(threads, request, default_size=20)
+    return await _respond(request, _list_response('commentThread', page, next_token))
+
+
+@app.get('/youtube/v3/comments')
+async def comments(request: Request, parentId: str):
+    video_id, _, index = parentId[2:].rpartition('.t')
+    replies = make_replies(parentId, video_id, _thread_published(video_id, int(index or 0)))
+    page, next_token = _page(replies, request, default_size=20)
+    return await _respond(request, _list_response('comment', page, next_token))
+
+
+@app.get('/votes')
+async def votes(request: Request, videoId: str):
+    rng = _rng('votes', videoId)
+    likes, dislikes = rng.randint(10, 10 ** 5), rng.randint(0, 10 ** 4)
+    return await _respond(request, {'id': videoId, 'likes': likes, 'dislikes': dislikes,
+                                    'rating': round(1 + 4 * likes / (likes + dislikes), 4),
+                                    'viewCount': rng.randint(10 ** 3, 10 ** 7), 'deleted': False})
+
+
+@app.get('/transcripts/{video_id}')
+async def transcript(request: Request, video_id: str):
+    rng = _rng('transcript', video_id)
+    # Roughly one video in seven has captions disabled
+    if rng.random() < 1 / 7:
+        return await _respond(request, {'error': 'TranscriptsDisabled'}, status=404)
+    segments = [{'text': _text(rng, rng.randint(4, 12)), 'start': 4.0 * number, 'duration': 4.0}
+                for number in range(rng.randint(50, 300))]
+    return await _respond(request, {'language': 'ru', 'isGenerated': True, 'segments': segments})
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--videos', type=int, default=FAKE_YOUTUBE_VIDEOS)
+    parser.add_argument('--comments', type=int, default=FAKE_YOUTUBE_COMMENTS)
+    parser.add_argument('--replies', type=int, default=FAKE_YOUTUBE_REPLIES)
+    parser.add_argument('--latency-ms', type=float, default=FAKE_YOUTUBE_LATENCY_MS)
+    parser.add_argument('--error-rate', type=float, default=FAKE_YOUTUBE_ERROR_RATE)
+    args = parser.parse_args()
+    FAKE_YOUTUBE_VIDEOS, FAKE_YOUTUBE_COMMENTS, FAKE_YOUTUBE_REPLIES = args.videos, args.comments, args.replies
+    FAKE_YOUTUBE_LATENCY_MS, FAKE_YOUTUBE_ERROR_RATE = args.latency_ms, args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
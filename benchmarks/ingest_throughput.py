@@ -0,0 +1,185 @@
+"""
+End-to-end ingestion benchmark of the /channel/ crawl path against benchmarks.fake_youtube.
+
+Starts the fake server, then, in a fresh interpreter pointed at it, enqueues a channel job exactly as
+GET /channel/ does and runs crawl workers until the job and every video job it spawned have finished.
+Reports videos/sec, comments/sec, database round trips (statements sent, executemany counted once) and the
+crawling process's peak RSS, and compares them with the stored baseline: throughput lower, or round trips
+and RSS higher, than the baseline by more than --tolerance fails the run.
+
+Needs a migrated, disposable Postgres database configured through the usual POSTGRES_* variables. Every run
+crawls a channel handle of its own, so nothing is skipped as already stored; no quota is spent.
+
+    python -m benchmarks.ingest_throughput [--videos 50] [--comments 200] [--replies 8] [--latency-ms 0]
+                                           [--workers 2] [--tolerance 0.2] [--update-baseline]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_FILE = Path(__file__).resolve().parent / 'ingest_baseline.json'
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", 0.2))
+SERVER_START_TIMEOUT = 30
+
+HIGHER_IS_BETTER = ['videos_per_second', 'comments_per_second']
+LOWER_IS_BETTER = ['db_round_trips_per_video', 'peak_rss_mb']
+CONFIG_KEYS = ['videos', 'comments', 'replies', 'latency_ms', 'workers']
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.fake_youtube', '--port', str(port),
+                               '--videos', str(args.videos), '--comments', str(args.comments),
+                               '--replies', str(args.replies), '--latency-ms', str(args.latency_ms)], cwd=ROOT)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/votes?videoId=ping', timeout=1)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('Fake YouTube server did not start')
+
+
+def crawl_environment(port: int) -> dict:
+    base = f'http://127.0.0.1:{port}'
+    return dict(
+        os.environ,
+        YOUTUBE_API_URL=f'{base}/youtube/v3/', DISLIKE_API_URL=f'{base}/votes',
+        TRANSCRIPT_API_URL=f'{base}/transcripts/',
+        # The fake server accepts any key; quota must not be what limits throughput
+        API_KEYS='benchmark', YOUTUBE_DAILY_QUOTA=str(10 ** 9), YOUTUBE_REQUESTS_PER_SECOND=str(10 ** 6),
+        # Every run crawls new ids, so a response cache would only add writes
+        RESPONSE_CACHE_BACKEND='none',
+        WORKER_POLL_INTERVAL='0.1', API_STATS_REFRESHER='false', API_DISLIKE_ENRICHMENT='false')
+
+
+def run_crawl(handle: str, workers: int) -> dict:
+    """Runs in the child process: crawls @handle through the job queue and measures it."""
+    import resource
+
+    from sqlalchemy import event
+
+    from app.handlers import crawl_worker
+    from app.models_module import db_sessions
+    from app.models_module import job_queue
+    from app.parsing_module import quota_scheduler
+
+    round_trips = [0]
+
+    @event.listens_for(db_sessions.engine, 'before_cursor_execute')
+    def count_round_trip(*_):
+        round_trips[0] += 1
+
+    stop_event = threading.Event()
+    started = time.perf_counter()
+    job_id = job_queue.enqueue_job('channel', f'https://www.youtube.com/@{handle}',
+                                   priority=quota_scheduler.PRIORITY_BACKGROUND, video_count=0)
+    threads = [threading.Thread(target=crawl_worker.run_worker, kwargs={'stop_event': stop_event}, daemon=True)
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    while True:
+        progress = job_queue.get_job_progress(job_id)
+        if progress['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    videos, comments = progress['videos_done'], progress['comments_ingested']
+    return {
+        'status': progress['status'],
+        'videos': videos,
+        'comments': comments,
+        'videos_failed': progress['videos_failed'],
+        'seconds': round(elapsed, 3),
+        'videos_per_second': round(videos / elapsed, 3),
+        'comments_per_second': round(comments / elapsed, 1),
+        'db_round_trips': round_trips[0],
+        'db_round_trips_per_video': round(round_trips[0] / max(videos, 1), 1),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for metric in HIGHER_IS_BETTER:
+        if result[metric] < baseline[metric] * (1 - tolerance):
+            regressions.append(f'{metric} {result[metric]} < baseline {baseline[metric]}')
+    for metric in LOWER_IS_BETTER:
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f'{metric} {result[metric]} > baseline {baseline[metric]}')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=50)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--replies', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--tolerance', type=float, default=BENCH_TOLERANCE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--child', metavar='HANDLE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_crawl(args.child, args.workers)))
+        return 0
+
+    port = _free_port()
+    server = start_fake_server(port, args)
+    try:
+        handle = f'bench{time.time_ns()}'
+        child = subprocess.run([sys.executable, '-m', 'benchmarks.ingest_throughput', '--child', handle,
+                                '--workers', str(args.workers)], env=crawl_environment(port), cwd=ROOT,
+                               check=True, stdout=subprocess.PIPE, text=True)
+    finally:
+        server.terminate()
+        server.wait()
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    print(json.dumps(dict(config=config, **result), indent=2))
+    if result['status'] != 'done' or result['videos'] != args.videos:
+        print(f'Crawl incomplete: {result["videos"]} of {args.videos} videos, status {result["status"]}')
+        return 1
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(dict(config=config, **result), indent=2) + '\n')
+        print(f'Baseline written to {BASELINE_FILE.relative_to(ROOT)}')
+        return 0
+    if not BASELINE_FILE.exists():
+        print('No baseline stored yet, run with --update-baseline on the reference machine')
+        return 0
+    baseline = json.loads(BASELINE_FILE.read_text())
+    if baseline['config'] != config:
+        print(f'Baseline was recorded with {baseline["config"]}, not comparable')
+        return 0
+    regressions = compare(result, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
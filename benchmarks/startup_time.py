@@ -0,0 +1,50 @@
+"""
+Measures how long a fresh interpreter needs to import the API and worker entry points, and fails when the
+median exceeds the budget. Imports must not touch the network or the database; the child processes run
+with the proxy pointed at a closed port so a regression shows up as a slow or failing import.
+
+    python -m benchmarks.startup_time [--runs 5] [--budget 2.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ['app.main', 'app.handlers.crawl_worker']
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 2.0))
+
+# Any connection attempt made during import fails fast instead of succeeding on a developer machine
+OFFLINE_ENV = {'HTTP_PROXY': 'http://127.0.0.1:9', 'HTTPS_PROXY': 'http://127.0.0.1:9',
+               'POSTGRES_HOST': '127.0.0.1', 'POSTGRES_PORT': '9'}
+
+
+def measure(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True, env=dict(os.environ, **OFFLINE_ENV),
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_SECONDS)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        # The first run also pays for writing .pyc files
+        measure(module)
+        timings = [measure(module) for _ in range(args.runs)]
+        median = statistics.median(timings)
+        status = 'ok' if median <= args.budget else 'OVER BUDGET'
+        print(f'{module}: median {median * 1000:.0f} ms, min {min(timings) * 1000:.0f} ms, '
+              f'max {max(timings) * 1000:.0f} ms ({status}, budget {args.budget * 1000:.0f} ms)')
+        failed |= median > args.budget
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
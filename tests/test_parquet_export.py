@@ -0,0 +1,49 @@
+import contextlib
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('pyarrow')
+pytest.importorskip('sqlalchemy')
+
+from app.models_module import parquet_export  # noqa: E402
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(query)
+        return FakeResult(self.rows)
+
+
+def test_comments_are_partitioned_by_the_channel_of_their_video(tmp_path, monkeypatch):
+    names = [column.name for column in parquet_export._export_columns('comments')]
+    row = namedtuple('Row', names)
+
+    def comment(row_id: int, video_id: str, channel_id: str):
+        values = dict.fromkeys(names)
+        values.update(id=row_id, commentId=f'comment-{row_id}', videoId=video_id, channelId=channel_id,
+                      publishedAt=datetime(2024, 5, 1))
+        return row(**values)
+
+    # channelId as the export query returns it, taken from the joined video
+    session = FakeSession([comment(1, 'video-1', 'UC1'), comment(2, 'video-2', 'UC2'), comment(3, 'video-1', 'UC1')])
+    monkeypatch.setattr(parquet_export.db_sessions, 'session_scope',
+                        lambda session_=None: contextlib.nullcontext(session))
+
+    assert parquet_export.export_table('comments', tmp_path, chunk_size=2) == (3, 3)
+    assert 'JOIN videos' in str(session.queries[0])
+    assert sorted(path.name for path in (tmp_path / 'comments').iterdir()) == ['channelId=UC1', 'channelId=UC2']